@@ -1,7 +1,10 @@
 # contar_tokens_arvore.py – VERSÃO REFINADA (Tree /a /f Style)
+import os
 import sys
+import argparse
+import threading
 from pathlib import Path
-import tiktoken
+from typing import Optional
 
 # Força UTF-8 no Windows (100% funcional)
 # Isso é crucial para que os caracteres de linha e a acentuação sejam exibidos corretamente
@@ -10,9 +13,15 @@ if sys.platform.startswith("win"):
     _locale._getdefaultlocale = (lambda *args: ['en_US', 'utf-8'])
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Motor compartilhado com o Token Counter Pro: walk em passagem única, leitura e
+# tokenização em pools paralelos e cache persistente por arquivo (token_counter_pro/core)
+sys.path.insert(0, str(Path(__file__).resolve().parent / "token_counter_pro"))
+from core import scan_directory, ScanProfile
+
 # --- CONFIGURAÇÃO ---
-# Modelo usado para contagem
-enc = tiktoken.encoding_for_model("gpt-4o")
+# Modelo usado para contagem (gpt-4o usa o encoder o200k_base do registro do core)
+MODELO = "gpt-4o"
+ENCODER = "o200k_base"
 
 # Extensões que queremos contar
 EXTENSOES_VALIDAS = {
@@ -23,96 +32,97 @@ EXTENSOES_VALIDAS = {
     ".log"
 }
 
+# Itens ignorados (pastas ou arquivos, sem diferenciar maiúsculas), além dos ocultos
+NOMES_IGNORADOS = {"__pycache__", ".git", "node_modules", "vendor", "dist", "build"}
+
+# Regras deste script para o scanner: só as extensões acima são lidas (sem checagem
+# de binário nem limite de tamanho), bytes inválidos são descartados como em
+# read_text(errors="ignore") e links de pasta são seguidos como em Path.is_dir()
+PERFIL = ScanProfile(
+    text_extensions=frozenset(EXTENSOES_VALIDAS),
+    ignored_dirs=frozenset(NOMES_IGNORADOS),
+    ignored_files=frozenset(NOMES_IGNORADOS),
+    casefold_names=True,
+    skip_hidden_files=True,
+    follow_dir_links=True,
+    decode_errors="ignore",
+    max_file_size=None,
+)
+
 # --- CONSTANTES DE FORMATAÇÃO DA ÁRVORE (Padrão tree /a /f) ---
 V_BAR = "│   "     # Conector de continuação de ramo
 L_T = "├── "      # Conector de item intermediário
 L_END = "└── "    # Conector de último item
 INDENT = "    "   # Indentação para último item (continuação de ramo)
-TOKEN_PLACEHOLDER = "<TOKENS:" # Placeholder temporário para tokens
-TOKEN_DELIMITER = ">" 
-
-# --- FUNÇÃO PRINCIPAL RECURSIVA ---
 
-def contar_tokens_em_pasta(caminho: Path, prefixo: str = "") -> tuple[int, list[str]]:
-    """
-    Conta os tokens recursivamente e retorna o total e as linhas de saída.
-    A impressão é adiada para garantir a ordem correta e o alinhamento.
-    """
-    total_tokens = 0
-    linhas_de_saida = []
+# --- CONTAGEM (motor do core) E MONTAGEM DAS LINHAS ---
 
-    # 1. Obter e ordenar itens: Pastas antes dos arquivos, depois alfabeticamente.
+def _listar(caminho: Path) -> list[Path]:
+    """Itens da pasta na ordem do 'tree' nativo (pastas primeiro), sem ocultos/ignorados."""
     try:
         itens = list(caminho.iterdir())
     except Exception:
-        # Ignora pastas sem permissão
+        return []
+    itens_filtrados = [item for item in itens
+                       if not item.name.startswith(".") and item.name.lower() not in NOMES_IGNORADOS]
+    itens_filtrados.sort(key=lambda x: (x.is_file(), x.name.lower()))
+    return itens_filtrados
+
+def contar_tokens_em_pasta(caminho: Path, workers: Optional[int] = None, usar_cache: bool = True) -> tuple[int, list[tuple[str, int]]]:
+    """
+    Conta os tokens da pasta com o scanner do core (paralelo e com cache) e
+    retorna o total e as linhas de saída como (texto antes dos tokens, tokens).
+    Pastas sem tokens são omitidas; os conectores seguem a listagem completa de
+    cada pasta exibida, como na versão recursiva original.
+    """
+    resultados = scan_directory([str(caminho)], threading.Event(), lambda *args: None,
+                                token_workers=workers, use_cache=usar_cache,
+                                keep_contents=False, encoders=[ENCODER], profile=PERFIL)
+    raiz = resultados["root_node"]
+    if raiz is None:
         return 0, []
-        
-    itens_filtrados = []
-    for item in itens:
-        # Filtra itens indesejados (ocultos, node_modules, .git etc.)
-        nome_lower = item.name.lower()
-        if item.name.startswith(".") or nome_lower in {"__pycache__", ".git", "node_modules", "vendor", "dist", "build"}:
+    node_map = resultados["node_map"]
+    linhas_de_saida: list[tuple[str, int]] = []
+
+    # Pilha de (pasta, itens listados, próximo índice, prefixo)
+    pilha = [(Path(raiz.full_path), _listar(Path(raiz.full_path)), 0, "")]
+    while pilha:
+        pasta, itens, indice, prefixo = pilha.pop()
+        if indice >= len(itens):
             continue
-        itens_filtrados.append(item)
+        pilha.append((pasta, itens, indice + 1, prefixo))
 
-    # Ordena os itens para ter o mesmo estilo do 'tree' nativo: Pastas primeiro
-    itens_filtrados.sort(key=lambda x: (x.is_file(), x.name.lower()))
+        item = itens[indice]
+        eh_ultimo = (indice == len(itens) - 1)
+        conector = L_END if eh_ultimo else L_T
+        node = node_map.get(os.path.join(pasta, item.name))
+        if node is None:
+            continue
 
+        if node.is_dir:
+            # Pasta vazia (após a filtragem) não aparece
+            if node.total_recursive_tokens > 0:
+                linhas_de_saida.append((f"{prefixo}{conector}{item.name}/ ", node.total_recursive_tokens))
+                novo_prefixo = prefixo + (INDENT if eh_ultimo else V_BAR)
+                pilha.append((pasta / item.name, _listar(pasta / item.name), 0, novo_prefixo))
+        elif node.is_text:
+            linhas_de_saida.append((f"{prefixo}{conector}{item.name} ", node.token_count))
 
-    for i, item in enumerate(itens_filtrados):
-        eh_ultimo = (i == len(itens_filtrados) - 1)
-        conector = L_END if eh_ultimo else L_T
-        
-        # O novo prefixo é a continuação do ramo atual:
-        # Se for o último item da lista, o próximo nível é só indentação (sem a barra vertical)
-        # Se não for o último, o próximo nível continua com a barra vertical
-        novo_prefixo = prefixo + (INDENT if eh_ultimo else V_BAR)
-
-        if item.is_dir():
-            # 2. Chamada recursiva para pastas
-            sub_total, sub_linhas = contar_tokens_em_pasta(item, novo_prefixo)
-            
-            if sub_total > 0:
-                # Se a pasta não estiver vazia (após a filtragem), a incluímos
-                
-                # Linha da Pasta: Usa o placeholder para facilitar o alinhamento posterior
-                folder_line = f"{prefixo}{conector}{item.name}/ {TOKEN_PLACEHOLDER}{sub_total}{TOKEN_DELIMITER}"
-                linhas_de_saida.append(folder_line)
-                
-                # Adiciona o conteúdo da subpasta
-                linhas_de_saida.extend(sub_linhas)
-                total_tokens += sub_total
-        
-        elif item.is_file():
-            # 3. Processamento de Arquivos
-            if item.suffix.lower() in EXTENSOES_VALIDAS:
-                try:
-                    conteudo = item.read_text(encoding="utf-8", errors="ignore")
-                    tokens = len(enc.encode(conteudo))
-                    
-                    # Linha do Arquivo: Usa o placeholder
-                    file_line = f"{prefixo}{conector}{item.name} {TOKEN_PLACEHOLDER}{tokens}{TOKEN_DELIMITER}"
-                    linhas_de_saida.append(file_line)
-                    total_tokens += tokens
-                except Exception:
-                    # Ignora silenciosamente arquivos que não puderam ser lidos
-                    pass
-    
-    return total_tokens, linhas_de_saida
+    return raiz.total_recursive_tokens, linhas_de_saida
 
 
 # --- EXECUÇÃO E IMPRESSÃO FINAL (Alinhamento) ---
 
 if __name__ == "__main__":
-    
+    parser = argparse.ArgumentParser(description="Árvore de arquivos (estilo tree /a /f) com a contagem de tokens.")
+    # Sem argumento, usa a pasta atual como padrão
+    parser.add_argument("pasta", nargs="?", default=".", help="Pasta a processar (padrão: pasta atual).")
+    parser.add_argument("--workers", type=int, default=None, help="Threads de tokenização (1 = sequencial).")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache persistente de contagens.")
+    args = parser.parse_args()
+
     # 1. Configuração do Path
-    try:
-        # Tenta usar o primeiro argumento da linha de comando.
-        # Se não houver argumento, usa a pasta atual (Path('.')) como padrão.
-        pasta = Path(sys.argv[1])
-    except IndexError:
-        pasta = Path(".") # <<< MUDANÇA AQUI: Define a pasta atual como padrão.
+    pasta = Path(args.pasta)
 
     if not pasta.is_dir():
         print(f"Erro: '{pasta}' não é um diretório válido.")
@@ -123,44 +133,23 @@ if __name__ == "__main__":
     # A resolução do caminho completo ajuda a contextualizar a execução.
     print(f"Processando árvore de arquivos em: {pasta.resolve()}")
     print("-" * 50)
-    total_geral, linhas = contar_tokens_em_pasta(pasta)
-    
+    total_geral, linhas = contar_tokens_em_pasta(pasta, args.workers, not args.sem_cache)
+
     # 3. Processamento Final para Alinhamento
-    
-    # a) Encontra o tamanho máximo da string de tokens formatada (ex: "123.456")
-    max_token_str_len = 0
-    for linha in linhas:
-        if TOKEN_PLACEHOLDER in linha:
-            _, parte_token = linha.split(TOKEN_PLACEHOLDER, 1)
-            token_valor_str = parte_token.removesuffix(TOKEN_DELIMITER)
-            
-            try:
-                tokens = int(token_valor_str)
-                max_token_str_len = max(max_token_str_len, len(f"{tokens:,}"))
-            except ValueError:
-                pass
-
-    # Define a largura mínima de alinhamento
+
+    # a) Define a largura mínima de alinhamento pelo maior valor formatado (ex: "123,456")
+    max_token_str_len = max((len(f"{tokens:,}") for _, tokens in linhas), default=0)
     ALIGN_WIDTH = max(10, max_token_str_len)
-    
-    # b) Imprime a raiz da árvore 
+
+    # b) Imprime a raiz da árvore
     print(f"{pasta.name or pasta.resolve().name}/") # Usa o nome da pasta ou o último segmento do caminho resolvido
-    
+
     # c) Imprime a árvore final, alinhando a contagem de tokens
-    for linha in linhas:
-        
-        if TOKEN_PLACEHOLDER in linha:
-            
-            parte_nome, parte_token = linha.split(TOKEN_PLACEHOLDER, 1)
-            tokens = int(parte_token.removesuffix(TOKEN_DELIMITER))
-            
-            tokens_formatado = f"{tokens:,}"
-            padding = " " * (ALIGN_WIDTH - len(tokens_formatado))
-
-            linha_final = f"{parte_nome}{padding} → {tokens_formatado} tokens"
-            
-            print(linha_final)
-        
+    for parte_nome, tokens in linhas:
+        tokens_formatado = f"{tokens:,}"
+        padding = " " * (ALIGN_WIDTH - len(tokens_formatado))
+        print(f"{parte_nome}{padding} → {tokens_formatado} tokens")
+
     # 4. Imprime o Total Geral
     print("-" * 50)
-    print(f"Total Geral de Tokens (gpt-4o): {total_geral:,} tokens")
\ No newline at end of file
+    print(f"Total Geral de Tokens ({MODELO}): {total_geral:,} tokens")
@@ -1,45 +1,117 @@
-from bs4 import BeautifulSoup
 import os
+import argparse
+from lxml import etree
 
 arquivo_html = "Suplementos_ comprar suplementos alimentares é na Growth!.html"
 pasta_saida = "secoes"
-os.makedirs(pasta_saida, exist_ok=True)
-
-with open(arquivo_html, "r", encoding="utf-8") as f:
-    soup = BeautifulSoup(f, "lxml")
 
 # Guia da árvore: extraia seções principais identificadas
+# Seletor: "tag", "#id" ou ".classe" (a primeira ocorrência no documento, como find/select_one)
 secoes = [
-    ("header.html", soup.find("header")),
-    ("menuBar.html", soup.find(id="menuBar")),
-    ("homeBannerPrincipal.html", soup.find(id="homeBannerPrincipal")),
-    ("pitchbarHome.html", soup.find(id="pitchbarHome")),
-    ("vitrine-home-black-kit.html", soup.select_one(".vitrine-home-black-kit")),
-    ("bannersDuplos.html", soup.select_one(".bannersDuplos")),
-    ("vitrine-home-black-outlet.html", soup.select_one(".vitrine-home-black-outlet")),
-    ("vitrineTop20.html", soup.select_one(".vitrineTop20")),
-    ("tabs-moda-acessorios.html", soup.select_one(".tabs-moda-acessorios")),
-    ("bannerEbit.html", soup.select_one(".bannerEbit")),
-    ("supCategoria.html", soup.select_one(".supCategoria")),
-    ("vitrineHome2.html", soup.find(id="vitrineHome2")),
-    ("depoimentosHome.html", soup.select_one(".depoimentosHome")),
-    ("vitrineHome3.html", soup.find(id="vitrineHome3")),
-    ("bannersBig.html", soup.select_one(".bannersBig")),
-    ("bannersEsporte.html", soup.find(id="escolha-por-esportes")),
-    ("bannerRodape.html", soup.select_one(".bannerRodape")),
-    ("newsletter__container.html", soup.find(id="newsletter__container")),
-    ("selosFinal.html", soup.select_one(".selosFinal")),
-    ("topoRodape.html", soup.select_one(".topoRodape")),
-    ("menuRodape.html", soup.find(id="menuRodape")),
-    ("formasPag.html", soup.select_one(".formasPag")),
-    ("infosRodape.html", soup.select_one(".infosRodape")),
-    ("finalRodape.html", soup.select_one(".finalRodape")),
-    ("uappiIcon.html", soup.select_one(".uappiIcon"))
+    ("header.html", "header"),
+    ("menuBar.html", "#menuBar"),
+    ("homeBannerPrincipal.html", "#homeBannerPrincipal"),
+    ("pitchbarHome.html", "#pitchbarHome"),
+    ("vitrine-home-black-kit.html", ".vitrine-home-black-kit"),
+    ("bannersDuplos.html", ".bannersDuplos"),
+    ("vitrine-home-black-outlet.html", ".vitrine-home-black-outlet"),
+    ("vitrineTop20.html", ".vitrineTop20"),
+    ("tabs-moda-acessorios.html", ".tabs-moda-acessorios"),
+    ("bannerEbit.html", ".bannerEbit"),
+    ("supCategoria.html", ".supCategoria"),
+    ("vitrineHome2.html", "#vitrineHome2"),
+    ("depoimentosHome.html", ".depoimentosHome"),
+    ("vitrineHome3.html", "#vitrineHome3"),
+    ("bannersBig.html", ".bannersBig"),
+    ("bannersEsporte.html", "#escolha-por-esportes"),
+    ("bannerRodape.html", ".bannerRodape"),
+    ("newsletter__container.html", "#newsletter__container"),
+    ("selosFinal.html", ".selosFinal"),
+    ("topoRodape.html", ".topoRodape"),
+    ("menuRodape.html", "#menuRodape"),
+    ("formasPag.html", ".formasPag"),
+    ("infosRodape.html", ".infosRodape"),
+    ("finalRodape.html", ".finalRodape"),
+    ("uappiIcon.html", ".uappiIcon")
 ]
 
-for nome, elemento in secoes:
-    if elemento:
-        with open(os.path.join(pasta_saida, nome), "w", encoding="utf-8") as out:
-            out.write(str(elemento))
+def _chave_do_seletor(seletor):
+    if seletor.startswith("#"):
+        return "id", seletor[1:]
+    if seletor.startswith("."):
+        return "class", seletor[1:]
+    return "tag", seletor.lower()
+
+def compilar_seletores(secoes):
+    """Tabela única de busca: {'tag'|'id'|'class': {valor: [arquivos]}}, consultada uma vez por elemento."""
+    tabela = {"tag": {}, "id": {}, "class": {}}
+    for nome, seletor in secoes:
+        grupo, valor = _chave_do_seletor(seletor)
+        tabela[grupo].setdefault(valor, []).append(nome)
+    return tabela
+
+def _secoes_do_elemento(elemento, tabela):
+    nomes = list(tabela["tag"].get(elemento.tag, ()))
+    id_elemento = elemento.get("id")
+    if id_elemento:
+        nomes.extend(tabela["id"].get(id_elemento, ()))
+    for classe in (elemento.get("class") or "").split():
+        nomes.extend(tabela["class"].get(classe, ()))
+    return list(dict.fromkeys(nomes))
+
+def fragmentar(arquivo_html, pasta_saida, secoes):
+    """
+    Divide a página numa passada só (lxml iterparse, sem montar a árvore
+    inteira): cada elemento aberto é conferido na tabela de seletores e a
+    subárvore de uma seção é gravada em pasta_saida assim que a tag fecha.
+    Fora das seções abertas, os elementos já lidos são descartados, então a
+    memória acompanha a maior seção, e não a página.
+    Retorna os arquivos gravados.
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    tabela = compilar_seletores(secoes)
+    origem = {nome: _chave_do_seletor(seletor) for nome, seletor in secoes}
+    pendentes = len(secoes)
+    abertas = {}   # elemento -> arquivos das seções que ele abre
+    gravados = []
+
+    with open(arquivo_html, "rb") as f:
+        for evento, elemento in etree.iterparse(f, events=("start", "end"), html=True, encoding="utf-8"):
+            if not isinstance(elemento.tag, str):
+                continue  # Comentários e instruções de processamento
+            if evento == "start":
+                if pendentes:
+                    nomes = _secoes_do_elemento(elemento, tabela)
+                    if nomes:
+                        abertas[elemento] = nomes
+                        # Cada seletor vale só para a primeira ocorrência
+                        for nome in nomes:
+                            grupo, valor = origem[nome]
+                            tabela[grupo][valor].remove(nome)
+                            pendentes -= 1
+                continue
+
+            nomes = abertas.pop(elemento, None)
+            if nomes:
+                conteudo = etree.tostring(elemento, method="html", encoding="unicode", with_tail=False)
+                for nome in nomes:
+                    with open(os.path.join(pasta_saida, nome), "w", encoding="utf-8") as out:
+                        out.write(conteudo)
+                    gravados.append(nome)
+            if not abertas:
+                # Nenhuma seção aberta: o que já fechou não é mais necessário
+                elemento.clear(keep_tail=True)
+                pai = elemento.getparent()
+                if pai is not None:
+                    while elemento.getprevious() is not None:
+                        del pai[0]
+    return gravados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Divide a página HTML em um arquivo por seção.")
+    parser.add_argument("arquivo", nargs="?", default=arquivo_html, help="Página HTML de entrada.")
+    parser.add_argument("--saida", default=pasta_saida, help="Pasta dos arquivos das seções.")
+    args = parser.parse_args()
 
-print("Divisão concluída. Cada arquivo é legível individualmente.")
\ No newline at end of file
+    fragmentar(args.arquivo, args.saida, secoes)
+    print("Divisão concluída. Cada arquivo é legível individualmente.")
@@ -1,2 +1,2 @@
 # Exporta a função principal do CLI
-from .interface import cli_scan_only
\ No newline at end of file
+from .interface import cli_scan_only, cli_scan_stream, cli_search, cli_pack, cli_export
\ No newline at end of file
@@ -1,9 +1,12 @@
 import sys
 import os
-from typing import List, Any
+import json
+import threading
+import time
+from typing import Dict, List, Any, Optional
 # Importa as funcionalidades do core
 try:
-    from core import scan_directory, TreeNode, count_tokens
+    from core import scan_directory, iter_scan, rescan_incremental, TokenCache, estimate_error_band, find_duplicate_groups, search_files, SEARCH_FIELDS, plan_pack, write_pack, PackRules, export_bundle, export_to_file, EXPORT_FORMATS, TreeNode, DirectoryWatcher, ENCODERS, DEFAULT_ENCODER
     # natural_sort_key e TreeNode também são importados via core/__init__.py
 except ImportError as e:
     print(f"Erro ao importar módulos do core: {e}", file=sys.stderr)
@@ -23,14 +26,9 @@ def _print_node(node: TreeNode, prefix: str = "", is_root: bool = True):
         # Imprime o nó atual (diretório ou arquivo)
         line = f"{prefix}├── {node.name}"
         if not node.is_dir and node.is_text:
-            # Conta tokens (usando a função do core)
-            if node.content is not None:
-                token_count, _ = count_tokens(node.content)
-                line += f" (Tokens: {token_count:,} | Tamanho: {node.size_bytes:,} bytes)"
-                
-            # Adiciona a contagem de tokens ao nó para referência (o scanner não fazia isso)
-            node.token_count = token_count
-        elif not node.is_dir and node.is_scanned and not node.is_text:
+            # O scanner já grava a contagem de tokens no nó
+            line += f" (Tokens: {node.token_count:,} | Tamanho: {node.size_bytes:,} bytes)"
+        elif not node.is_dir and not node.is_text:
              line += f" (Ignorado/Binário: {node.size_bytes:,} bytes)"
 
         print(line)
@@ -57,15 +55,31 @@ def _print_node(node: TreeNode, prefix: str = "", is_root: bool = True):
         else:
             line = f"{child_line_prefix}{'└──' if is_last and is_root else '├──'} {child.name}"
             
-            if child.is_text and child.content is not None:
-                 token_count, _ = count_tokens(child.content)
-                 line += f" (Tokens: {token_count:,} | Tamanho: {child.size_bytes:,} bytes)"
+            if child.is_text:
+                 line += f" (Tokens: {child.token_count:,} | Tamanho: {child.size_bytes:,} bytes)"
                  
             print(line)
 
-def cli_scan_only(root_path: str):
+def _print_watch_update(affected: Dict[str, List[TreeNode]], root_node: TreeNode):
+    """Imprime as mudanças aplicadas por um rescan incremental do modo observação."""
+    for node in affected['added']:
+        print(f"[+] {node.full_path} ({node.token_count:,} tokens)")
+    for node in affected['changed']:
+        print(f"[~] {node.full_path} ({node.token_count:,} tokens)")
+    for node in affected['removed']:
+        print(f"[-] {node.full_path}")
+    print(f"Total de Tokens: {root_node.total_recursive_tokens:,}")
+    sys.stdout.flush()
+
+def cli_scan_only(root_path: str, watch: bool = False, interval: float = 1.5, encoders: Optional[List[str]] = None,
+                  estimate: bool = False, token_workers: Optional[int] = None, use_cache: bool = True):
     """
     Executa o escaneamento do diretório e imprime o resumo no console (Modo CLI).
+    Com watch=True, continua observando o diretório e imprime as mudanças
+    (rescan incremental) até Ctrl+C. encoders: chaves do registro de encoders
+    contadas na mesma leitura (o 1º é usado na árvore).
+    estimate=True imprime primeiro o total estimado (± banda de erro) e depois
+    faz a contagem exata dos arquivos estimados.
     """
     root_path = os.path.abspath(root_path)
     print(f"\n=== Token Counter Pro - Modo CLI ===\n")
@@ -74,27 +88,29 @@ def cli_scan_only(root_path: str):
     # 1. Escaneamento
     try:
         # Usa um callback simples para mostrar o progresso no console
-        def cli_progress_callback(file_name, current, total):
-            sys.stdout.write(f"\rProcessando... {file_name} ({current}/{total})")
+        def cli_progress_callback(current, total, file_path):
+            sys.stdout.write(f"\rProcessando... {os.path.basename(file_path)} ({current}/{total})")
             sys.stdout.flush()
 
-        results = scan_directory(
-            root_path, 
-            extensions_filter=None, # Sem filtro no CLI por padrão
-            progress_callback=cli_progress_callback
-        )
+        results = scan_directory([root_path], threading.Event(), cli_progress_callback, token_workers=token_workers,
+                                 use_cache=use_cache, encoders=encoders, estimate=estimate)
         sys.stdout.write("\r" + " " * 80 + "\r") # Limpa a linha de progresso
         sys.stdout.flush()
 
+        if results['estimated_paths']:
+            print(f"Total estimado: ~{results['root_node'].total_recursive_tokens:,} ± {estimate_error_band(results):,} tokens "
+                  f"({len(results['estimated_paths']):,} arquivos estimados). Contando tokens exatos...")
+            rescan_incremental(results, threading.Event(), cli_progress_callback, token_workers, use_cache)
+            sys.stdout.write("\r" + " " * 80 + "\r")
+            sys.stdout.flush()
+
         root_node: TreeNode = results['root_node']
+        if root_node is None:
+            raise FileNotFoundError(f"Nenhum arquivo encontrado em {root_path}")
         
-        # 2. Contagem Total (Agregação)
-        total_tokens = 0
-        total_bytes = 0
-        for path, content in results['file_contents'].items():
-            tokens, _ = count_tokens(content)
-            total_tokens += tokens
-            total_bytes += os.path.getsize(path) # Usa o tamanho real
+        # 2. Contagem Total (Agregação já feita pelo scanner)
+        total_tokens = root_node.total_recursive_tokens
+        total_bytes = sum(results['node_map'][path].size_bytes for path in results['text_file_paths'])
             
         text_files_count = len(results['text_file_paths'])
         total_extensions = len(results['all_extensions'])
@@ -110,13 +126,234 @@ def cli_scan_only(root_path: str):
         print(f"Diretório Raiz: {root_path}")
         print(f"Arquivos de Texto Encontrados: {text_files_count:,}")
         print(f"Total de Tokens (Estimativa Real): {total_tokens:,}")
+        if len(results['encoders']) > 1:
+            for key in results['encoders']:
+                key_total = sum((results['node_map'][path].token_counts or {}).get(key, 0) for path in results['text_file_paths'])
+                print(f"  - {ENCODERS[key].label}: {key_total:,} tokens")
         print(f"Tamanho Total do Conteúdo Lido: {total_bytes:,} bytes")
+        duplicate_groups = find_duplicate_groups(results)
+        if duplicate_groups:
+            wasted = sum((len(group) - 1) * group[0].token_count for group in duplicate_groups)
+            print(f"Conteúdo Duplicado: {sum(len(g) for g in duplicate_groups):,} arquivos em {len(duplicate_groups):,} grupos "
+                  f"({wasted:,} tokens repetidos)")
         print(f"Total de Extensões Únicas Descobertas: {total_extensions}")
         print(f"Lista de Extensões: {sorted(list(results['all_extensions']))}")
+
+        # 5. Modo Observação
+        if watch:
+            print(f"\nObservando alterações (a cada {interval}s). Ctrl+C para sair.")
+            watcher = DirectoryWatcher(results, lambda affected: _print_watch_update(affected, root_node),
+                                       interval=interval)
+            watcher.start()
+            try:
+                while watcher.running:
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                watcher.stop()
+                print("\nObservação encerrada.")
         
     except FileNotFoundError as e:
         print(f"\nERRO: {e}", file=sys.stderr)
     except Exception as e:
         print(f"\nERRO FATAL: {e}", file=sys.stderr)
 
+def cli_search(root_path: str, term: str, field: str = 'name', encoders: Optional[List[str]] = None,
+               token_workers: Optional[int] = None, use_cache: bool = True):
+    """
+    Escaneia o diretório e lista os arquivos cujo nome, caminho ou conteúdo
+    (field) contém o termo, com os tokens de cada um e o total encontrado.
+    """
+    if field not in SEARCH_FIELDS:
+        print(f"ERRO: campo de busca inválido '{field}' (use: {', '.join(SEARCH_FIELDS)})", file=sys.stderr)
+        return
+    root_path = os.path.abspath(root_path)
+    try:
+        results = scan_directory([root_path], threading.Event(), lambda *args: None, token_workers=token_workers,
+                                 use_cache=use_cache, encoders=encoders)
+        if results['root_node'] is None:
+            raise FileNotFoundError(f"Nenhum arquivo encontrado em {root_path}")
+
+        # Consulta única: sem índice de trigramas (montá-lo custaria mais que a busca linear nos textos)
+        start = time.perf_counter()
+        matches = search_files(results, term, field)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for node in matches:
+            status = f"{node.token_count:,} tokens" if node.is_text else f"ignorado, {node.size_bytes:,} bytes"
+            print(f"{node.full_path} ({status})")
+        total = sum(node.token_count for node in matches if node.is_text)
+        print(f"\n{len(matches):,} arquivo(s) com '{term}' em {field} | {total:,} tokens | busca em {elapsed_ms:.1f} ms")
+    except FileNotFoundError as e:
+        print(f"\nERRO: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"\nERRO FATAL: {e}", file=sys.stderr)
+
+def cli_pack(root_path: str, budget: int, rules: PackRules = PackRules(), output: Optional[str] = None,
+             encoders: Optional[List[str]] = None, token_workers: Optional[int] = None, use_cache: bool = True,
+             output_format: str = 'plain') -> int:
+    """
+    Escaneia o diretório, escolhe os arquivos que cabem no orçamento de tokens
+    (core.plan_pack) e escreve o pacote em output (ou na saída padrão), um
+    arquivo por vez. O resumo vai para stderr. Retorna o código de saída.
+    """
+    root_path = os.path.abspath(root_path)
+    try:
+        results = scan_directory([root_path], threading.Event(), lambda *args: None, token_workers=token_workers,
+                                 use_cache=use_cache, keep_contents=False, encoders=encoders)
+        if results['root_node'] is None:
+            raise FileNotFoundError(f"Nenhum arquivo encontrado em {root_path}")
+        plan = plan_pack(results, budget, rules, fmt=output_format)
+        if output:
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                write_pack(plan, f)
+        else:
+            write_pack(plan, sys.stdout)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        return 0
+    except (FileNotFoundError, OSError) as e:
+        print(f"ERRO: {e}", file=sys.stderr)
+        return 1
+    print(f"Pacote: {len(plan.items):,} de {plan.candidates:,} arquivo(s) | {plan.total_tokens:,} / {budget:,} tokens "
+          f"({plan.encoder})" + (f" -> {output}" if output else ""), file=sys.stderr)
+    return 0
+
+def cli_export(root_path: str, output: Optional[str] = None, output_format: str = 'markdown', include_tree: bool = True,
+               encoders: Optional[List[str]] = None, token_workers: Optional[int] = None, use_cache: bool = True) -> int:
+    """
+    Escaneia o diretório e exporta todos os arquivos de texto (com a árvore
+    ASCII) em Markdown, XML ou texto para output (ou a saída padrão). Os
+    arquivos são copiados do disco em streaming; o progresso, com o total de
+    tokens acumulado, vai para stderr. Retorna o código de saída.
+    """
+    if output_format not in EXPORT_FORMATS:
+        print(f"ERRO: formato inválido '{output_format}' (use: {', '.join(EXPORT_FORMATS)})", file=sys.stderr)
+        return 2
+    root_path = os.path.abspath(root_path)
+    cancel_flag = threading.Event()
+
+    last_report = [0.0]
+
+    def progress(done, total, tokens, path):
+        now = time.perf_counter()
+        if now - last_report[0] < 0.2 and done < total:
+            return
+        last_report[0] = now
+        sys.stderr.write(f"\rExportando... {done:,}/{total:,} arquivos | {tokens:,} tokens")
+        sys.stderr.flush()
+
+    try:
+        results = scan_directory([root_path], cancel_flag, lambda *args: None, token_workers=token_workers,
+                                 use_cache=use_cache, keep_contents=False, encoders=encoders)
+        if results['root_node'] is None:
+            raise FileNotFoundError(f"Nenhum arquivo encontrado em {root_path}")
+        options = dict(fmt=output_format, include_tree=include_tree, encoder_key=results['encoders'][0],
+                       cancel_flag=cancel_flag, progress_callback=progress)
+        if output:
+            stats = export_to_file(output, results['root_node'], **options)
+        else:
+            stats = export_bundle(sys.stdout, results['root_node'], **options)
+            sys.stdout.flush()
+    except BrokenPipeError:
+        return 0
+    except KeyboardInterrupt:
+        cancel_flag.set()
+        return 130
+    except (FileNotFoundError, OSError) as e:
+        print(f"\nERRO: {e}", file=sys.stderr)
+        return 1
+    rate = stats.characters / stats.elapsed_s / 1e6 if stats.elapsed_s else 0.0
+    print(f"\rExportados {stats.files:,} arquivo(s) | {stats.tokens:,} tokens | {stats.characters:,} caracteres "
+          f"em {stats.elapsed_s:.2f} s ({rate:.0f} M caracteres/s)" + (f" -> {output}" if output else ""), file=sys.stderr)
+    return 0
+
+def _record_json(record, encoders: List[str]) -> Dict[str, Any]:
+    """Registro por arquivo da saída JSON/NDJSON."""
+    data = {
+        'type': 'file',
+        'path': record.path,
+        'ext': record.ext,
+        'size': record.size,
+        'is_text': record.is_text,
+        'tokens': record.tokens if record.is_text else 0,
+    }
+    if len(encoders) > 1 and record.is_text:
+        data['tokens_by_encoder'] = {key: (record.token_counts or {}).get(key, 0) for key in encoders}
+    if record.digest is not None:
+        data['digest'] = record.digest
+    return data
+
+def cli_scan_stream(paths: List[str], output_format: str = 'ndjson', encoders: Optional[List[str]] = None,
+                    token_workers: Optional[int] = None, use_cache: bool = True, out=None) -> int:
+    """
+    Modo headless para jobs em lote: roda o pipeline de scan (core.iter_scan) e
+    escreve um registro JSON por arquivo assim que ele é contado, seguido de um
+    resumo ('ndjson'). O walk não é feito antes, então a saída começa de imediato
+    e pode ser encadeada em outras ferramentas. 'json' emite um documento único
+    ({"files": [...], "summary": {...}}) ao final. Retorna o código de saída.
+    """
+    out = out or sys.stdout
+    encoders = list(dict.fromkeys(encoders or [DEFAULT_ENCODER]))
+    cancel_flag = threading.Event()
+    cache = TokenCache() if use_cache else None
+    start = time.perf_counter()
+    totals = {key: 0 for key in encoders}
+    files = text_files = text_bytes = 0
+    extensions = set()
+    collected: List[Dict[str, Any]] = []
+    try:
+        for record in iter_scan(paths, cancel_flag, token_workers=token_workers, cache=cache, encoders=encoders):
+            files += 1
+            extensions.add(record.ext)
+            if record.is_text:
+                text_files += 1
+                text_bytes += record.size
+                counts = record.token_counts or {encoders[0]: record.tokens}
+                for key in encoders:
+                    totals[key] += counts.get(key, 0)
+            data = _record_json(record, encoders)
+            if output_format == 'ndjson':
+                out.write(json.dumps(data, ensure_ascii=False) + "\n")
+                out.flush()
+            else:
+                collected.append(data)
+    except BrokenPipeError:
+        # Consumidor fechou o pipe (ex: | head): encerra sem traceback
+        cancel_flag.set()
+        return 0
+    except KeyboardInterrupt:
+        cancel_flag.set()
+        return 130
+    finally:
+        cache_stats = None
+        if cache:
+            cache.flush()
+            cache_stats = cache.stats()
+            cache.close()
+
+    summary = {
+        'type': 'summary',
+        'paths': [os.path.abspath(p) for p in paths],
+        'files': files,
+        'text_files': text_files,
+        'text_bytes': text_bytes,
+        'tokens': totals[encoders[0]],
+        'encoder': encoders[0],
+        'extensions': sorted(extensions),
+        'elapsed_s': round(time.perf_counter() - start, 3),
+        'cache': cache_stats,
+    }
+    if len(encoders) > 1:
+        summary['tokens_by_encoder'] = totals
+    try:
+        if output_format == 'ndjson':
+            out.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        else:
+            json.dump({'files': collected, 'summary': summary}, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+        out.flush()
+    except BrokenPipeError:
+        pass
+    return 0
+
 # A função de teste __main__ foi removida daqui, pois o main.py a chama.
\ No newline at end of file
@@ -1,3 +1,11 @@
 from .tree import TreeNode
-from .scanner import scan_directory, natural_sort_key, TEXT_EXTENSIONS
-from .counter import TIKTOKEN_AVAILABLE, count_tokens, get_encoder_info, get_tokenization_details
\ No newline at end of file
+from .scanner import scan_directory, iter_scan, compute_rescan, apply_rescan, rescan_incremental, set_active_encoder, estimate_error_band, find_duplicate_groups, search_files, start_content_indexing, ScanRecord, ScanTreeBuilder, ScanProfile, natural_sort_key, read_text_file, TEXT_EXTENSIONS
+from .counter import TIKTOKEN_AVAILABLE, ENCODERS, DEFAULT_ENCODER, count_tokens, count_tokens_multi, list_encoders, register_encoder, get_encoder, get_encoder_info, get_encoder_name, get_tokenization_details, warm_up_encoder
+from .ascii_tree import AsciiTreeIndex, render_ascii_tree, iter_ascii_tree, display_name
+from .estimator import TokenEstimator, estimate_text_tokens
+from .incremental import IncrementalTokenCounter, CountWorker, split_stable_chunks
+from .search import SearchIndex, SearchWorker, SEARCH_FIELDS
+from .cache import TokenCache, ContentLRU
+from .watcher import DirectoryWatcher
+from .exporter import export_bundle, export_to_file, iter_selected_files, iter_tree_lines, ExportStats, EXPORT_FORMATS, EXPORT_EXTENSIONS
+from .packer import plan_pack, write_pack, PackRules, PackPlan, PackItem
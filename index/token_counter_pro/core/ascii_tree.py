@@ -0,0 +1,127 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .tree import TreeNode
+from .scanner import natural_sort_key
+
+# Largura da linha: o rótulo "[ N tokens ]" fica alinhado à direita nesta coluna
+TARGET_WIDTH = 100
+
+def format_tree_line(left_text: str, right_text: str) -> str:
+    """Cria uma linha com padding de espaços para alinhar os tokens à direita."""
+    padding_size = max(2, TARGET_WIDTH - len(left_text) - len(right_text))
+    return f"{left_text}{' ' * padding_size}{right_text}"
+
+def token_label(node: TreeNode) -> str:
+    t_val = node.total_recursive_tokens if node.is_dir else node.token_count
+    return f"[ {t_val:>6,} tokens ]"
+
+def display_name(node: TreeNode) -> str:
+    """Nome exibido na árvore; arquivos ignorados levam a marca [IGNORADO (tamanho)]."""
+    if not node.is_dir and not node.is_text:
+        return f"{node.name} [IGNORADO ({node.size_bytes:,} bytes)]"
+    return node.name
+
+def _sorted_children(node: TreeNode) -> List[TreeNode]:
+    return sorted(node.children, key=lambda n: (not n.is_dir, natural_sort_key(n.name)))
+
+def iter_ascii_tree(root_node: TreeNode) -> Iterator[Tuple[TreeNode, str]]:
+    """
+    Gera (nó, parte esquerda da linha) da árvore no estilo tree /a /f
+    (conectores +--- e \\---), começando pela raiz; a linha final é
+    format_tree_line(esquerda, token_label(nó)). Iterativo, numa passada só.
+    """
+    yield root_node, f"{os.path.basename(root_node.full_path)}:."
+
+    # Pilha de (nó pai, filhos ordenados, próximo índice, prefixo)
+    stack = [(root_node, _sorted_children(root_node), 0, "")]
+    while stack:
+        node, children, index, prefix = stack.pop()
+        if index >= len(children):
+            continue
+        stack.append((node, children, index + 1, prefix))
+
+        child = children[index]
+        is_last = index == len(children) - 1
+        if child.is_dir:
+            connector = "\\---" if is_last else "+---"
+            yield child, f"{prefix}{connector}{child.name}"
+            child_prefix = prefix + ("    " if is_last else "|   ")
+            stack.append((child, _sorted_children(child), 0, child_prefix))
+        else:
+            # Arquivos não têm conector; na raiz, a guia vertical continua até o último item
+            if node.parent is None:
+                marker = "|   " if not is_last else "    "
+                yield child, f"{marker}{display_name(child)}"
+            else:
+                yield child, f"{prefix}    {display_name(child)}"
+
+
+class AsciiTreeIndex:
+    """
+    Texto da árvore ASCII com índice caminho -> linha e offsets de início de
+    cada linha: o destaque de um nó é um lookup O(1) por full_path (sem busca
+    no texto, sem confundir arquivos de mesmo nome). update_lines() reformata
+    só as linhas de nós cujos tokens mudaram e devolve as edições a aplicar no
+    controle, mantendo os offsets válidos.
+    """
+    def __init__(self, root_node: TreeNode):
+        self.nodes: List[TreeNode] = []
+        self.lefts: List[str] = []
+        self.lines: List[str] = []
+        for node, left in iter_ascii_tree(root_node):
+            self.nodes.append(node)
+            self.lefts.append(left)
+            self.lines.append(format_tree_line(left, token_label(node)))
+        self.rows: Dict[str, int] = {node.full_path: i for i, node in enumerate(self.nodes)}
+        self.starts: List[int] = []
+        self._recompute_starts(0)
+
+    def _recompute_starts(self, first_row: int):
+        # Cada linha ocupa len(linha) + 1 posições (o "\n")
+        del self.starts[first_row:]
+        position = self.starts[-1] + len(self.lines[first_row - 1]) + 1 if first_row else 0
+        for line in self.lines[first_row:]:
+            self.starts.append(position)
+            position += len(line) + 1
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+    def line_range(self, path: str) -> Optional[Tuple[int, int]]:
+        """(início, fim) da linha do caminho no texto, sem o "\n"; None se não está na árvore."""
+        row = self.rows.get(path)
+        if row is None:
+            return None
+        start = self.starts[row]
+        return start, start + len(self.lines[row])
+
+    def update_lines(self, nodes: Iterable[TreeNode]) -> List[Tuple[int, int, str]]:
+        """
+        Reformata as linhas dos nós (ex: arquivo alterado e seus ancestrais).
+        Retorna [(início, fim, nova_linha)] com offsets do texto anterior, do fim
+        para o começo: aplicadas nessa ordem, uma edição não desloca as seguintes.
+        """
+        rows = sorted({self.rows[n.full_path] for n in nodes if n.full_path in self.rows}, reverse=True)
+        edits: List[Tuple[int, int, str]] = []
+        first_changed_len = None
+        for row in rows:
+            line = format_tree_line(self.lefts[row], token_label(self.nodes[row]))
+            old = self.lines[row]
+            if line == old:
+                continue
+            start = self.starts[row]
+            edits.append((start, start + len(old), line))
+            if len(line) != len(old):
+                first_changed_len = row
+            self.lines[row] = line
+        if first_changed_len is not None:
+            self._recompute_starts(first_changed_len + 1)
+        return edits
+
+
+def render_ascii_tree(root_node: TreeNode) -> Tuple[str, List[TreeNode]]:
+    """Texto completo da árvore (uma linha por nó) e os nós na ordem das linhas."""
+    index = AsciiTreeIndex(root_node)
+    return index.text, index.nodes
@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+CACHE_DIR_NAME = "token_counter_pro"
+CACHE_FILE_NAME = "token_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 200_000
+DEFAULT_CONTENT_LRU_BYTES = 32 * 1024 * 1024
+
+# (path, mtime_ns, size, encoder, is_text, text_size, tokens, digest, last_used)
+_Row = Tuple[str, int, int, str, int, int, int, Optional[str], int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT    NOT NULL,
+    encoder   TEXT    NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    is_text   INTEGER NOT NULL,
+    text_size INTEGER NOT NULL,
+    tokens    INTEGER NOT NULL,
+    digest    TEXT,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (path, encoder)
+);
+CREATE INDEX IF NOT EXISTS idx_files_digest ON files (digest, encoder);
+CREATE INDEX IF NOT EXISTS idx_files_last_used ON files (last_used);
+"""
+
+def get_default_cache_dir() -> str:
+    """Diretório de cache do usuário (LOCALAPPDATA no Windows, XDG_CACHE_HOME nos demais)."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, CACHE_DIR_NAME)
+
+
+class TokenCache:
+    """
+    Cache persistente (SQLite) de contagens de tokens por arquivo.
+
+    Chave principal: (caminho, mtime_ns, tamanho, encoder). Se os metadados
+    mudarem mas o conteúdo não (checkout, touch, cópia), o hash do conteúdo
+    ainda encontra a contagem. Eviction LRU limitada a max_entries linhas.
+    Qualquer erro de I/O/SQLite desativa o cache sem interromper o scan.
+    """
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path or os.path.join(get_default_cache_dir(), CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        # Um resultado por arquivo (não por encoder), registrado pelo scanner
+        self.hits = 0
+        self.hash_hits = 0
+        self.misses = 0
+        self.skipped = 0  # Nem consultaram o cache (binário pela extensão, grande demais, estimado)
+        self._lock = threading.Lock()
+        self._pending: List[_Row] = []
+        self._touched: List[Tuple[str, str]] = []
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        except (sqlite3.Error, OSError):
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _disable(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except sqlite3.Error:
+            pass
+        self._conn = None
+
+    def lookup(self, path: str, mtime_ns: int, size: int, encoder: str) -> Optional[Tuple[bool, int, int, Optional[str]]]:
+        """Retorna (is_text, text_size, tokens, digest) se o arquivo não mudou desde a última contagem."""
+        if not self._conn: return None
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT is_text, text_size, tokens, digest FROM files "
+                    "WHERE path = ? AND encoder = ? AND mtime_ns = ? AND size = ?",
+                    (path, encoder, mtime_ns, size)).fetchone()
+            except sqlite3.Error:
+                self._disable()
+                return None
+            if row is None:
+                return None
+            self._touched.append((path, encoder))
+            return bool(row[0]), row[1], row[2], row[3]
+
+    def lookup_digest(self, digest: str, encoder: str) -> Optional[Tuple[int, int]]:
+        """Fallback por hash do conteúdo: retorna (tokens, text_size) de qualquer arquivo com os mesmos bytes."""
+        if not self._conn: return None
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, text_size FROM files WHERE digest = ? AND encoder = ? AND is_text = 1 LIMIT 1",
+                    (digest, encoder)).fetchone()
+            except sqlite3.Error:
+                self._disable()
+                return None
+            if row is None:
+                return None
+            return row[0], row[1]
+
+    def store(self, path: str, mtime_ns: int, size: int, encoder: str,
+              is_text: bool, text_size: int, tokens: int, digest: Optional[str] = None):
+        """Enfileira uma entrada; a gravação acontece em lote no flush()."""
+        if not self._conn: return
+        with self._lock:
+            self._pending.append((path, mtime_ns, size, encoder, int(is_text), text_size, tokens, digest, 0))
+
+    def record_hit(self, count: int = 1):
+        """Arquivo servido por lookup em todos os encoders."""
+        with self._lock:
+            self.hits += count
+
+    def record_hash_hit(self, count: int = 1):
+        """Arquivo servido por lookup_digest (pelo menos em parte) em todos os encoders."""
+        with self._lock:
+            self.hash_hits += count
+
+    def record_skip(self, count: int = 1):
+        """Arquivo resolvido sem consultar o cache (hits + hash_hits + misses + skipped = arquivos)."""
+        with self._lock:
+            self.skipped += count
+
+    def record_miss(self, count: int = 1):
+        """Arquivo lido e classificado/tokenizado (faltou algum encoder no cache)."""
+        with self._lock:
+            self.misses += count
+
+    def flush(self):
+        """Grava entradas pendentes, atualiza o LRU e aplica a eviction."""
+        if not self._conn: return
+        with self._lock:
+            now = time.time_ns()
+            pending = [row[:-1] + (now,) for row in self._pending]
+            touched = [(now, path, encoder) for path, encoder in self._touched]
+            self._pending = []
+            self._touched = []
+            try:
+                with self._conn:
+                    if pending:
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO files "
+                            "(path, mtime_ns, size, encoder, is_text, text_size, tokens, digest, last_used) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", pending)
+                    if touched:
+                        self._conn.executemany(
+                            "UPDATE files SET last_used = ? WHERE path = ? AND encoder = ?", touched)
+                    (total,) = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()
+                    excess = total - self.max_entries
+                    if excess > 0:
+                        self._conn.execute(
+                            "DELETE FROM files WHERE rowid IN "
+                            "(SELECT rowid FROM files ORDER BY last_used ASC LIMIT ?)", (excess,))
+            except sqlite3.Error:
+                self._disable()
+
+    def close(self):
+        self.flush()
+        self._disable()
+
+    def stats(self) -> Dict[str, int]:
+        """Estatísticas de uso do cache nesta sessão."""
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'hash_hits': self.hash_hits,
+            'misses': self.misses,
+            'skipped': self.skipped,
+        }
+
+
+class ContentLRU:
+    """
+    LRU em memória de conteúdos lidos sob demanda do disco (prévia/exportação),
+    limitada pelo tamanho total em caracteres. Usada quando o scan não retém file_contents.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_CONTENT_LRU_BYTES):
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[str, str]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, loader: Callable[[str], str]) -> str:
+        """Retorna o conteúdo em cache ou o carrega com loader(path)."""
+        with self._lock:
+            content = self._items.get(path)
+            if content is not None:
+                self._items.move_to_end(path)
+                return content
+
+        content = loader(path)
+        size = len(content)
+        if size > self.max_bytes:
+            return content
+
+        with self._lock:
+            old = self._items.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[path] = content
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+        return content
+
+    def invalidate(self, path: str):
+        with self._lock:
+            old = self._items.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
@@ -1,55 +1,197 @@
-import tiktoken
-from typing import Optional, Tuple, Dict, Any, List
+import importlib.util
+import threading
+from typing import Callable, NamedTuple, Optional, Tuple, Dict, Any, Iterable, List
+
+from .estimator import CHAR_CLASSES, DEFAULT_ESTIMATOR, char_class_counts, estimate_text_tokens
 
 # --- TIKTOKEN e Configurações Globais ---
-try:
-    TOKEN_ENCODER = tiktoken.encoding_for_model("gpt-4o")
-    TIKTOKEN_AVAILABLE = True
-    MODEL_NAME = "gpt-4o"
-    CONTEXT_INFO = f"{MODEL_NAME} (Tokenização real)"
-except ImportError:
-    TOKEN_ENCODER = None
-    TIKTOKEN_AVAILABLE = False
-    MODEL_NAME = "N/A"
-    CONTEXT_INFO = "gpt-4o (tiktoken AUSENTE, usando bytes/4 como FALLBACK)"
-
-def count_tokens(text: str) -> Tuple[int, str]:
-    if not text: return 0, CONTEXT_INFO
-    
+# Cada encoder é carregado sob demanda (1º uso ou warm_up_encoder) e mantido em
+# cache: o parse do arquivo BPE (e um eventual download) não atrasa a abertura
+# da janela/CLI, e encoders que ninguém usa nunca são carregados.
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+HEURISTIC_NAME = "bytes/4"
+# Fallback de um encoder do tiktoken indisponível: estimativa por classe de
+# caractere (core.estimator), bem mais próxima que bytes/4 em código/HTML/português
+FALLBACK_NAME = "estimate/v1"
+
+class EncoderSpec(NamedTuple):
+    """Entrada do registro: tiktoken_name=None indica o estimador bytes/4."""
+    label: str
+    tiktoken_name: Optional[str]
+
+# Registro de encoders (a chave é o que a UI/CLI/scanner usam)
+ENCODERS: Dict[str, EncoderSpec] = {
+    'o200k_base': EncoderSpec("gpt-4o / gpt-4o-mini (o200k_base)", "o200k_base"),
+    'cl100k_base': EncoderSpec("gpt-4 / gpt-3.5-turbo (cl100k_base)", "cl100k_base"),
+    'heuristic': EncoderSpec("Estimativa rápida (bytes/4)", None),
+}
+DEFAULT_ENCODER = 'o200k_base'
+
+_encoders: Dict[str, Any] = {}
+_failed: set = set()
+_encoder_lock = threading.Lock()
+
+def register_encoder(key: str, label: str, tiktoken_name: Optional[str]):
+    """Adiciona (ou substitui) um encoder do tiktoken no registro."""
+    with _encoder_lock:
+        ENCODERS[key] = EncoderSpec(label, tiktoken_name)
+        _encoders.pop(key, None)
+        _failed.discard(key)
+
+def list_encoders() -> List[Tuple[str, str]]:
+    """[(chave, rótulo)] na ordem do registro."""
+    return [(key, spec.label) for key, spec in ENCODERS.items()]
+
+def get_encoder(key: str = DEFAULT_ENCODER):
+    """
+    Retorna o encoder do tiktoken da chave, carregando-o na primeira chamada
+    (thread-safe). Retorna None para o estimador, se o tiktoken estiver ausente
+    ou se o encoder não puder ser carregado (ex: sem rede para baixar o BPE);
+    nesses casos a contagem usa bytes/4 (estimador) ou a estimativa calibrada (fallback).
+    """
+    encoder = _encoders.get(key)
+    if encoder is not None or key in _failed:
+        return encoder
+    spec = ENCODERS.get(key)
+    if spec is None:
+        raise KeyError(f"Encoder desconhecido: {key}")
+    if spec.tiktoken_name is None:
+        return None
+    with _encoder_lock:
+        if key not in _encoders and key not in _failed:
+            try:
+                if not TIKTOKEN_AVAILABLE:
+                    raise ImportError("tiktoken")
+                import tiktoken
+                _encoders[key] = tiktoken.get_encoding(spec.tiktoken_name)
+            except Exception:
+                _failed.add(key)
+    return _encoders.get(key)
+
+def is_encoder_loaded(key: str = DEFAULT_ENCODER) -> bool:
+    """True se o encoder já foi carregado (ou se o carregamento já falhou)."""
+    return key in _encoders or key in _failed or ENCODERS[key].tiktoken_name is None
+
+def warm_up_encoder(on_ready: Optional[Callable[[], None]] = None, key: str = DEFAULT_ENCODER) -> threading.Thread:
+    """Carrega o encoder numa thread em segundo plano; on_ready() é chamado (nessa thread) ao terminar."""
+    def run():
+        get_encoder(key)
+        if on_ready:
+            on_ready()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def _context_info(key: str = DEFAULT_ENCODER) -> str:
+    spec = ENCODERS[key]
+    if spec.tiktoken_name is None:
+        return spec.label
+    if not TIKTOKEN_AVAILABLE:
+        return f"{spec.label} (tiktoken AUSENTE, usando estimativa por classe de caractere como FALLBACK)"
+    if key in _encoders:
+        return f"{spec.label} (Tokenização real)"
+    if key in _failed:
+        return f"{spec.label} (falha ao carregar o encoder, usando estimativa como FALLBACK)"
+    return f"{spec.label} (carregando encoder...)"
+
+def _estimate(byte_size: int) -> int:
+    return max(1, byte_size // 4) if byte_size else 0
+
+def _fallback_count(text: str, encoder_key: str) -> int:
+    """Contagem sem tokenizador: bytes/4 para o estimador, estimativa calibrada para encoders indisponíveis."""
+    if ENCODERS[encoder_key].tiktoken_name is None:
+        return _estimate(len(text.encode('utf-8')))
+    return estimate_text_tokens(text)
+
+def count_tokens(text: str, encoder_key: str = DEFAULT_ENCODER) -> Tuple[int, str]:
+    if not text: return 0, _context_info(encoder_key)
+
     try:
-        if TIKTOKEN_AVAILABLE and TOKEN_ENCODER:
-            tokens = TOKEN_ENCODER.encode(text)
-            return len(tokens), MODEL_NAME
+        encoder = get_encoder(encoder_key)
+        if encoder:
+            tokens = encoder.encode(text)
+            return len(tokens), ENCODERS[encoder_key].label
         else:
-            byte_size = len(text.encode('utf-8'))
-            estimated_tokens = max(1, byte_size // 4)
-            return estimated_tokens, CONTEXT_INFO
-            
+            return _fallback_count(text, encoder_key), _context_info(encoder_key)
+
     except Exception:
-        byte_size = len(text.encode('utf-8'))
-        estimated_tokens = max(1, byte_size // 4)
-        return estimated_tokens, CONTEXT_INFO
+        return _fallback_count(text, encoder_key), _context_info(encoder_key)
+
+def count_tokens_multi(text: str, encoder_keys: Iterable[str]) -> Dict[str, int]:
+    """Conta o mesmo texto para vários encoders (o texto é lido/decodificado uma vez só)."""
+    return {key: count_tokens(text, key)[0] for key in encoder_keys}
 
-def get_encoder_info() -> str:
-    return CONTEXT_INFO
+def count_tokens_chunks_multi(chunks: Iterable[str], encoder_keys: Iterable[str]) -> Dict[str, int]:
+    """
+    Conta, numa única passada, os tokens de um texto entregue em pedaços
+    consecutivos (cortados em fronteiras que não alteram a pré-tokenização,
+    ver scanner._iter_safe_chunks) para cada encoder. As estimativas usam os
+    totais (bytes e classes de caractere), como se o texto fosse contado inteiro.
+    """
+    keys = list(encoder_keys)
+    encoders = {key: get_encoder(key) for key in keys}
+    counts = {key: 0 for key in keys}
+    byte_size = 0
+    class_counts = [0] * len(CHAR_CLASSES)
+    needs_classes = any(not encoder and ENCODERS[key].tiktoken_name for key, encoder in encoders.items())
+    for chunk in chunks:
+        if not chunk:
+            continue
+        raw = chunk.encode('utf-8')
+        byte_size += len(raw)
+        if needs_classes:
+            class_counts = [a + b for a, b in zip(class_counts, char_class_counts(raw))]
+        for key, encoder in encoders.items():
+            if encoder:
+                counts[key] += count_tokens(chunk, key)[0]
+    for key, encoder in encoders.items():
+        if not encoder:
+            if ENCODERS[key].tiktoken_name is None:
+                counts[key] = _estimate(byte_size)
+            else:
+                counts[key] = DEFAULT_ESTIMATOR.estimate_counts(class_counts)
+    return counts
 
-def get_tokenization_details(text: str) -> Dict[str, Any]:
-    token_count, encoder_info = count_tokens(text)
+def count_tokens_chunks(chunks: Iterable[str], encoder_key: str = DEFAULT_ENCODER) -> int:
+    """Versão de um encoder só de count_tokens_chunks_multi."""
+    return count_tokens_chunks_multi(chunks, [encoder_key])[encoder_key]
+
+def get_encoder_info(encoder_key: str = DEFAULT_ENCODER) -> str:
+    """Descrição do encoder para a UI (não força o carregamento)."""
+    return _context_info(encoder_key)
+
+def get_encoder_name(encoder_key: str = DEFAULT_ENCODER) -> str:
+    """Identificador estável do encoder em uso (chave do cache persistente)."""
+    encoder = get_encoder(encoder_key)
+    if encoder:
+        return encoder.name
+    if ENCODERS[encoder_key].tiktoken_name is None:
+        return HEURISTIC_NAME
+    return FALLBACK_NAME
+
+def get_tokenization_details(text: str, encoder_key: str = DEFAULT_ENCODER,
+                             include_token_list: bool = False) -> Dict[str, Any]:
+    """
+    Contagem e metadados de um texto. include_token_list=True também decodifica
+    cada token (caro em textos grandes; só para quem for exibir a lista).
+    """
+    token_count, encoder_info = count_tokens(text, encoder_key)
     byte_size = len(text.encode('utf-8'))
-    
+
     details = {
         'tokens': token_count,
         'byte_size': byte_size,
         'encoder_info': encoder_info,
         'token_list': None
     }
-    
-    if TIKTOKEN_AVAILABLE and TOKEN_ENCODER:
+
+    encoder = get_encoder(encoder_key) if include_token_list else None
+    if encoder:
         try:
-            tokens = [TOKEN_ENCODER.decode_single_token_bytes(t).decode('utf-8', errors='ignore') 
-                      for t in TOKEN_ENCODER.encode(text)]
+            tokens = [encoder.decode_single_token_bytes(t).decode('utf-8', errors='ignore')
+                      for t in encoder.encode(text)]
             details['token_list'] = tokens
         except Exception:
             pass
 
-    return details
\ No newline at end of file
+    return details
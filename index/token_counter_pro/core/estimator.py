@@ -0,0 +1,225 @@
+import math
+import string
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+# Classes de caracteres medidas sobre os bytes UTF-8 do texto
+CHAR_CLASSES = ('letters', 'digits', 'spaces', 'punct', 'non_ascii')
+
+# Tokens por byte de cada classe (priors aproximados para o200k/cl100k em código
+# e texto; substituídos pela calibração com as contagens exatas da amostra)
+DEFAULT_WEIGHTS: Tuple[float, ...] = (0.24, 0.34, 0.06, 0.55, 0.28)
+
+DEFAULT_RELATIVE_ERROR = 0.30   # Desvio relativo por arquivo assumido sem amostras
+PRIOR_SAMPLES = 3               # Peso (em arquivos) dos priors na suavização por extensão
+CONFIDENCE_Z = 1.96             # Banda de erro ~95%
+RIDGE_STRENGTH = 0.05           # Regularização do ajuste dos pesos em direção aos priors
+DEFAULT_RATIO = 0.25            # Tokens/byte assumido antes de qualquer amostra
+
+_LETTERS = string.ascii_letters.encode()
+_DIGITS = string.digits.encode()
+_SPACES = string.whitespace.encode()
+_ASCII = bytes(range(128))
+
+def char_class_counts(data: bytes) -> Tuple[int, ...]:
+    """Contagem de bytes por classe (letras, dígitos, espaços, pontuação, não-ASCII), em velocidade de C."""
+    total = len(data)
+    letters = total - len(data.translate(None, _LETTERS))
+    digits = total - len(data.translate(None, _DIGITS))
+    spaces = total - len(data.translate(None, _SPACES))
+    non_ascii = len(data.translate(None, _ASCII))
+    punct = total - letters - digits - spaces - non_ascii
+    return letters, digits, spaces, punct, non_ascii
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> Optional[List[float]]:
+    """Eliminação de Gauss com pivô parcial (sistema pequeno, sem numpy)."""
+    n = len(vector)
+    a = [row[:] + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(col + 1, n):
+            factor = a[r][col] / a[col][col]
+            for c in range(col, n + 1):
+                a[r][c] -= factor * a[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (a[r][n] - sum(a[r][c] * x[c] for c in range(r + 1, n))) / a[r][r]
+    return x
+
+
+class _ExtStats:
+    __slots__ = ('tokens', 'size', 'ratios', 'text', 'binary', 'features', 'feature_tokens')
+
+    def __init__(self):
+        self.tokens = 0
+        self.size = 0
+        self.ratios: List[float] = []
+        self.text = 0
+        self.binary = 0
+        # Soma das classes de caractere (e tokens) das amostras que trouxeram conteúdo
+        self.features = [0] * len(CHAR_CLASSES)
+        self.feature_tokens = 0
+
+
+class TokenEstimator:
+    """
+    Estimador aproximado de tokens calibrado com uma amostra de contagens exatas.
+
+    - estimate_content(bytes, ext): modelo por classe de caractere (pesos
+      ajustados por mínimos quadrados com regularização nos priors) corrigido
+      pela razão observada da extensão.
+    - estimate_size(tamanho, ext): tokens/byte da extensão × tamanho, sem ler o
+      arquivo (pré-passe de árvores enormes).
+    - error_band(...): banda de erro (~95%) de um total estimado.
+
+    Sem amostras, usa os priors (DEFAULT_WEIGHTS), melhores que bytes/4 para
+    código, HTML e texto em português.
+    """
+    def __init__(self, weights: Sequence[float] = DEFAULT_WEIGHTS):
+        self.prior_weights = tuple(weights)
+        self.weights = tuple(weights)
+        self._ext: Dict[str, _ExtStats] = {}
+        self._features: List[Tuple[Tuple[int, ...], int]] = []
+        self._ratio_cache: Dict[str, float] = {}
+
+    # --- Amostragem ---
+
+    def add_sample(self, ext: str, size: int, tokens: int, is_text: bool = True, data: Optional[bytes] = None):
+        """Registra uma contagem exata. data (bytes UTF-8) permite calibrar também os pesos por classe."""
+        stats = self._ext.setdefault(ext, _ExtStats())
+        self._ratio_cache.clear()
+        if not is_text:
+            stats.binary += 1
+            return
+        stats.text += 1
+        if size <= 0:
+            return
+        stats.tokens += tokens
+        stats.size += size
+        stats.ratios.append(tokens / size)
+        if data is not None:
+            counts = char_class_counts(data)
+            self._features.append((counts, tokens))
+            stats.features = [a + b for a, b in zip(stats.features, counts)]
+            stats.feature_tokens += tokens
+
+    @property
+    def sample_count(self) -> int:
+        return sum(stats.text + stats.binary for stats in self._ext.values())
+
+    def calibrate(self):
+        """Reajusta os pesos por classe com as amostras que trouxeram conteúdo."""
+        self._ratio_cache.clear()
+        if len(self._features) < len(CHAR_CLASSES):
+            return
+        n = len(CHAR_CLASSES)
+        xtx = [[0.0] * n for _ in range(n)]
+        xty = [0.0] * n
+        for features, tokens in self._features:
+            for i in range(n):
+                xty[i] += features[i] * tokens
+                for j in range(n):
+                    xtx[i][j] += features[i] * features[j]
+        # Ridge em direção aos priors: classes raras na amostra ficam perto do prior
+        ridge = RIDGE_STRENGTH * max(1.0, sum(xtx[i][i] for i in range(n)) / n)
+        for i in range(n):
+            xtx[i][i] += ridge
+            xty[i] += ridge * self.prior_weights[i]
+        solved = _solve(xtx, xty)
+        if solved is not None:
+            self.weights = tuple(max(0.0, w) for w in solved)
+
+    # --- Estimativas ---
+
+    def _global_ratio(self) -> float:
+        tokens = sum(stats.tokens for stats in self._ext.values())
+        size = sum(stats.size for stats in self._ext.values())
+        return (tokens + PRIOR_SAMPLES * 1024 * DEFAULT_RATIO) / (size + PRIOR_SAMPLES * 1024)
+
+    def ratio(self, ext: str) -> float:
+        """Tokens por byte da extensão, suavizado em direção à razão global."""
+        cached = self._ratio_cache.get(ext)
+        if cached is not None:
+            return cached
+        global_ratio = self._global_ratio()
+        stats = self._ext.get(ext)
+        if stats is None or not stats.size:
+            value = global_ratio
+        else:
+            weight = PRIOR_SAMPLES * max(1, stats.size // max(1, len(stats.ratios)))
+            value = (stats.tokens + weight * global_ratio) / (stats.size + weight)
+        self._ratio_cache[ext] = value
+        return value
+
+    def is_text_ext(self, ext: str) -> Optional[bool]:
+        """Classificação texto/binário observada na amostra da extensão (None se não houve amostra)."""
+        stats = self._ext.get(ext)
+        if stats is None or not (stats.text or stats.binary):
+            return None
+        return stats.text >= stats.binary
+
+    def estimate_size(self, size: int, ext: str) -> int:
+        if size <= 0:
+            return 0
+        return max(1, round(size * self.ratio(ext)))
+
+    def estimate_counts(self, counts: Iterable[int], ext: Optional[str] = None) -> int:
+        counts = tuple(counts)
+        size = sum(counts)
+        if size <= 0:
+            return 0
+        estimate = sum(w * c for w, c in zip(self.weights, counts))
+        if ext is not None:
+            estimate *= self._ext_correction(ext)
+        return max(1, round(estimate))
+
+    def estimate_content(self, data: bytes, ext: Optional[str] = None) -> int:
+        return self.estimate_counts(char_class_counts(data), ext)
+
+    def _ext_correction(self, ext: str) -> float:
+        """Tokens exatos / previstos pelo modelo de classes nas amostras da extensão (suavizado para 1)."""
+        stats = self._ext.get(ext)
+        if stats is None or not stats.feature_tokens:
+            return 1.0
+        predicted = sum(w * c for w, c in zip(self.weights, stats.features))
+        prior = PRIOR_SAMPLES * stats.feature_tokens / max(1, len(stats.ratios))
+        return (stats.feature_tokens + prior) / (predicted + prior)
+
+    # --- Erro ---
+
+    def relative_error(self, ext: str) -> float:
+        """Desvio relativo por arquivo (tokens/byte) da extensão, suavizado pelo prior."""
+        stats = self._ext.get(ext)
+        ratios = stats.ratios if stats else []
+        mean = self.ratio(ext)
+        squares = sum((r / mean - 1.0) ** 2 for r in ratios) if mean > 0 else 0.0
+        return math.sqrt((squares + PRIOR_SAMPLES * DEFAULT_RELATIVE_ERROR ** 2) / (len(ratios) + PRIOR_SAMPLES))
+
+    def error_band(self, estimates_by_ext: Dict[str, List[int]]) -> int:
+        """
+        Banda de erro (~95%) do total de várias estimativas agrupadas por extensão:
+        erro da razão da extensão (cai com o nº de amostras) + variação por arquivo.
+        """
+        variance = 0.0
+        for ext, estimates in estimates_by_ext.items():
+            if not estimates:
+                continue
+            sigma = self.relative_error(ext)
+            stats = self._ext.get(ext)
+            samples = len(stats.ratios) if stats else 0
+            total = sum(estimates)
+            bias = sigma * total / math.sqrt(samples + PRIOR_SAMPLES)
+            variance += bias ** 2 + sigma ** 2 * sum(e * e for e in estimates)
+        return round(CONFIDENCE_Z * math.sqrt(variance))
+
+
+# Estimador com os priors, usado como fallback quando o tiktoken não está disponível
+DEFAULT_ESTIMATOR = TokenEstimator()
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimativa rápida de tokens de um texto sem tokenizador (priors por classe de caractere)."""
+    return DEFAULT_ESTIMATOR.estimate_content(text.encode('utf-8')) if text else 0
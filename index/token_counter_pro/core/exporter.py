@@ -0,0 +1,264 @@
+import codecs
+import io
+import os
+import re
+import threading
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from .ascii_tree import format_tree_line, iter_ascii_tree, token_label
+from .counter import DEFAULT_ENCODER, count_tokens
+from .tree import TreeNode
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+EXPORT_FORMATS = ('markdown', 'xml', 'plain')
+EXPORT_EXTENSIONS = {'markdown': '.md', 'xml': '.xml', 'plain': '.txt'}
+
+# Buffer fixo de leitura (bytes por read) e de escrita do arquivo de saída:
+# a memória usada não depende do tamanho dos arquivos nem do pacote
+EXPORT_BUFFER = 1024 * 1024
+
+# Caracteres fora do Char do XML 1.0 (controles C0 como os de cor ANSI em .log):
+# viram U+FFFD no XML, senão o pacote não é um documento bem-formado
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_XML_INVALID_C0 = tuple(bytes([c]) for c in range(0x20) if c not in (0x09, 0x0a, 0x0d))  # Em UTF-8, 1 byte cada
+
+def _xml_safe(text: str) -> str:
+    return _XML_INVALID_CHARS.sub('\ufffd', text)
+
+# Cabeçalho de cada arquivo no formato plain (também usado pelo core.packer)
+PLAIN_HEADER = "===== {path} =====\n"
+
+
+class ExportStats(NamedTuple):
+    files: int
+    tokens: int        # Contagens do scan dos arquivos + tokens exatos de cabeçalhos e árvore
+    characters: int    # Caracteres escritos
+    elapsed_s: float
+    cancelled: bool
+
+
+def relative_path(node: TreeNode, root_path: str) -> str:
+    """Caminho exibido no cabeçalho: relativo à raiz, sempre com '/'."""
+    rel = os.path.relpath(node.full_path, root_path) if root_path else node.name
+    return rel.replace(os.sep, '/')
+
+def iter_selected_files(root_node: TreeNode) -> Iterator[TreeNode]:
+    """Arquivos de texto selecionados (selection_state == 2), na ordem da árvore ASCII."""
+    root_node.resolve_selection()
+    for node, _ in iter_ascii_tree(root_node):
+        if node.is_dir:
+            # A pasta aparece antes dos filhos: recebem aqui a seleção pendente
+            node.push_selection()
+        elif node.is_text and node.selection_state == 2:
+            yield node
+
+def iter_tree_lines(root_node: TreeNode) -> Iterator[str]:
+    """Linhas da árvore ASCII do pacote (com '\\n'), antes do escape do formato."""
+    for node, left in iter_ascii_tree(root_node):
+        yield format_tree_line(left, token_label(node)) + "\n"
+
+def _iter_blocks(f: BinaryIO, head: bytes = b"") -> Iterator[bytes]:
+    if head:
+        yield head
+    while True:
+        chunk = f.read(EXPORT_BUFFER)
+        if not chunk:
+            return
+        yield chunk
+
+def _markdown_fence(file_path: str) -> Tuple[str, Optional[bytes]]:
+    """
+    Cerca de código maior que qualquer sequência de crases do arquivo (leitura
+    em blocos). Um arquivo de até EXPORT_BUFFER bytes é lido uma vez só: o
+    conteúdo volta junto com a cerca e o copy_file o reaproveita (None: arquivo
+    maior, relido na cópia).
+    """
+    longest = carry = 0
+    data = None
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(EXPORT_BUFFER)
+            if not f.read(1):
+                data = head
+            f.seek(len(head))
+            for chunk in _iter_blocks(f, head) if data is None else (head,):
+                lead = len(chunk) - len(chunk.lstrip(b'`'))
+                if lead == len(chunk):
+                    carry += lead
+                    continue
+                # Sequência que atravessa a fronteira entre blocos
+                longest = max(longest, carry + lead)
+                # Só procura (bytes.find, sem regex) sequências maiores que a maior já vista
+                needle = b'`' * max(3, longest + 1)
+                position = chunk.find(needle)
+                while position != -1:
+                    end = position + len(needle)
+                    while end < len(chunk) and chunk[end] == 0x60:
+                        end += 1
+                    longest = end - position
+                    needle = b'`' * (longest + 1)
+                    position = chunk.find(needle, end)
+                carry = len(chunk) - len(chunk.rstrip(b'`'))
+    except OSError:
+        pass
+    return "`" * max(3, longest + 1, carry + 1), data
+
+def file_header(fmt: str, rel_path: str, tokens: int, fence: str = "```") -> str:
+    if fmt == 'markdown':
+        language = os.path.splitext(rel_path)[1].lstrip('.').lower()
+        return f"### `{rel_path}` ({tokens:,} tokens)\n\n{fence}{language}\n"
+    if fmt == 'xml':
+        return f"<file path={quoteattr(_xml_safe(rel_path))} tokens=\"{tokens}\">\n<![CDATA["
+    return PLAIN_HEADER.format(path=rel_path)
+
+def file_footer(fmt: str, ends_with_newline: bool, fence: str = "```") -> str:
+    """Fecha o arquivo; o conteúdo sem '\\n' final ganha um antes do fechamento."""
+    newline = "" if ends_with_newline else "\n"
+    if fmt == 'markdown':
+        return f"{newline}{fence}\n\n"
+    if fmt == 'xml':
+        return f"{newline}]]>\n</file>\n"
+    return f"{newline}\n"
+
+def bundle_wrapper(fmt: str, root_node: TreeNode, encoder_key: str) -> Tuple[str, str]:
+    """Abertura e fechamento do pacote inteiro."""
+    name = os.path.basename(root_node.full_path) or root_node.full_path
+    if fmt == 'markdown':
+        return f"# {name}\n\n", ""
+    if fmt == 'xml':
+        return (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<project name={quoteattr(_xml_safe(name))} "
+                f"encoder={quoteattr(encoder_key)}>\n", "</project>\n")
+    return "", ""
+
+def _tree_wrapper(fmt: str):
+    if fmt == 'markdown':
+        return "## Estrutura\n\n```text\n", "```\n\n## Arquivos\n\n"
+    if fmt == 'xml':
+        return "<tree>\n", "</tree>\n"
+    return "", "\n"
+
+
+class _BundleWriter:
+    """Escreve no destino somando caracteres e tokens (só dos textos gerados aqui)."""
+    def __init__(self, out: TextIO, encoder_key: str):
+        self.out = out
+        self.encoder_key = encoder_key
+        self.characters = 0
+        self.tokens = 0
+
+    def write(self, text: str, count: bool = True):
+        if not text:
+            return
+        self.out.write(text)
+        self.characters += len(text)
+        if count:
+            self.tokens += count_tokens(text, self.encoder_key)[0]
+
+    def copy_file(self, file_path: str, cdata: bool, data: Optional[bytes] = None) -> bool:
+        """
+        Copia o arquivo em blocos de EXPORT_BUFFER bytes, com a mesma
+        decodificação do scan (UTF-8, newlines universais). Retorna se o
+        conteúdo terminou em '\\n' (vazio conta como terminado).
+        cdata: dentro de uma seção CDATA, cada ']]>' é partido em duas seções e
+        os caracteres inválidos no XML viram U+FFFD.
+        data: conteúdo inteiro já lido (ex: pela _markdown_fence); o disco não é lido de novo.
+        """
+        last = "\n"
+        carry = ""
+        # Mesmo decodificador do open() em modo texto, mas a leitura é binária: os
+        # controles C0 são procurados nos bytes (memchr), sem recodificar o bloco
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')('replace'), translate=True)
+
+        def emit(raw: bytes, final: bool = False):
+            nonlocal last, carry
+            chunk = decoder.decode(raw, final=final)
+            if not chunk:
+                return
+            last = chunk[-1]
+            if not cdata:
+                self.write(chunk, count=False)
+                return
+            if any(control in raw for control in _XML_INVALID_C0) or '\ufffe' in chunk or '\uffff' in chunk:
+                chunk = _xml_safe(chunk)
+            # Até dois ']' finais ficam para o próximo bloco: um ']]>' nunca é cortado ao meio
+            text = carry + chunk
+            keep = 2 if text.endswith("]]") else 1 if text.endswith("]") else 0
+            carry = text[len(text) - keep:]
+            self.write(text[:len(text) - keep].replace("]]>", "]]]]><![CDATA[>"), count=False)
+
+        if data is not None:
+            emit(data)
+        else:
+            with open(file_path, 'rb') as f:
+                for raw in _iter_blocks(f):
+                    emit(raw)
+        emit(b"", final=True)
+        self.write(carry, count=False)
+        return last == "\n"
+
+
+def export_bundle(out: TextIO, root_node: TreeNode, files: Optional[Iterable[TreeNode]] = None,
+                  fmt: str = 'markdown', include_tree: bool = True, encoder_key: str = DEFAULT_ENCODER,
+                  tree_lines: Optional[Iterable[str]] = None,
+                  cancel_flag: Optional[threading.Event] = None,
+                  progress_callback: Optional[Callable[[int, int, int, str], None]] = None) -> ExportStats:
+    """
+    Exporta um pacote (Markdown, XML ou texto) com a árvore ASCII do projeto e
+    o conteúdo de cada arquivo precedido do caminho. Os arquivos são copiados
+    do disco um por vez em blocos de tamanho fixo, então a memória fica
+    constante mesmo para saídas de vários GB. files: padrão, os arquivos de
+    texto selecionados (iter_selected_files); tree_lines: padrão, iter_tree_lines.
+    Numa thread em segundo plano, passe files e tree_lines já montados na
+    thread dona da árvore: os dois padrões percorrem (e resolvem a seleção de)
+    nós que um rescan ou um clique podem estar alterando.
+    Os tokens acumulados usam as contagens do scan (nenhum conteúdo é
+    re-tokenizado); progress_callback(feitos, total, tokens, caminho) é chamado
+    após cada arquivo.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt!r} (use {', '.join(EXPORT_FORMATS)})")
+    start = time.perf_counter()
+    file_list = list(iter_selected_files(root_node) if files is None else files)
+    writer = _BundleWriter(out, encoder_key)
+    root_path = root_node.full_path
+
+    opening, closing = bundle_wrapper(fmt, root_node, encoder_key)
+    writer.write(opening)
+    if include_tree:
+        tree_opening, tree_closing = _tree_wrapper(fmt)
+        writer.write(tree_opening)
+        for line in iter_tree_lines(root_node) if tree_lines is None else tree_lines:
+            writer.write(escape(_xml_safe(line)) if fmt == 'xml' else line)
+        writer.write(tree_closing)
+
+    done = 0
+    cancelled = False
+    for node in file_list:
+        if cancel_flag is not None and cancel_flag.is_set():
+            cancelled = True
+            break
+        rel = relative_path(node, root_path)
+        fence, data = _markdown_fence(node.full_path) if fmt == 'markdown' else ("```", None)
+        writer.write(file_header(fmt, rel, node.token_count, fence))
+        try:
+            ends_with_newline = writer.copy_file(node.full_path, cdata=fmt == 'xml', data=data)
+            writer.tokens += node.token_count
+        except OSError as e:
+            error = f"[erro ao ler o arquivo: {e}]"
+            writer.write(_xml_safe(error).replace("]]>", "]]]]><![CDATA[>") if fmt == 'xml' else error)
+            ends_with_newline = False
+        writer.write(file_footer(fmt, ends_with_newline, fence))
+        done += 1
+        if progress_callback:
+            progress_callback(done, len(file_list), writer.tokens, rel)
+
+    writer.write(closing)
+    return ExportStats(done, writer.tokens, writer.characters, time.perf_counter() - start, cancelled)
+
+def export_to_file(output_path: str, root_node: TreeNode, **kwargs) -> ExportStats:
+    """export_bundle direto para um arquivo em UTF-8 (buffer de escrita de EXPORT_BUFFER)."""
+    with open(output_path, 'w', encoding='utf-8', newline='', buffering=EXPORT_BUFFER) as out:
+        return export_bundle(out, root_node, **kwargs)
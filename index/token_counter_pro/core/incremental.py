@@ -0,0 +1,126 @@
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .counter import DEFAULT_ENCODER, count_tokens, get_encoder
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+# Parágrafos maiores que isto são cortados também nas quebras de linha simples
+MAX_PARAGRAPH_CHUNK = 16 * 1024
+
+# Cortes que não mudam a pré-tokenização do cl100k/o200k (mesma regra de
+# scanner._find_safe_cut): logo após '\n' seguido de letra/dígito ASCII.
+# Por dependerem só do texto ao redor, uma edição não desloca os cortes do resto.
+_PARAGRAPH_CUT = re.compile(r'\n\n(?=[A-Za-z0-9])')
+_LINE_CUT = re.compile(r'\n(?=[A-Za-z0-9])')
+
+def _cuts(pattern: re.Pattern, text: str, start: int, end: int) -> List[int]:
+    return [match.end() for match in pattern.finditer(text, start, end)]
+
+def split_stable_chunks(text: str) -> List[str]:
+    """
+    Divide o texto em pedaços alinhados a parágrafos (linhas, se o parágrafo for
+    grande) cuja soma de tokens é igual à contagem do texto inteiro.
+    """
+    chunks: List[str] = []
+    start = 0
+    for cut in _cuts(_PARAGRAPH_CUT, text, 0, len(text)) + [len(text)]:
+        if cut - start > MAX_PARAGRAPH_CHUNK:
+            for line_cut in _cuts(_LINE_CUT, text, start, cut):
+                chunks.append(text[start:line_cut])
+                start = line_cut
+        if cut > start:
+            chunks.append(text[start:cut])
+        start = cut
+    return chunks
+
+
+class IncrementalTokenCounter:
+    """
+    Contagem de tokens de um texto editado repetidamente (ex: a aba de texto
+    direto): o texto é dividido em pedaços estáveis e a contagem de cada pedaço
+    fica em cache pelo próprio conteúdo; uma edição só re-tokeniza os pedaços
+    que ela tocou. Sem tokenizador (estimativas), conta o texto inteiro, que já
+    é uma operação linear barata.
+    """
+    def __init__(self):
+        # encoder -> {pedaço: tokens}, só com os pedaços da última contagem
+        self._chunk_counts: Dict[str, Dict[str, int]] = {}
+        self.last_encoded = 0  # Pedaços re-tokenizados na última contagem
+
+    def count(self, text: str, encoder_key: str = DEFAULT_ENCODER,
+              is_stale: Optional[Callable[[], bool]] = None) -> Optional[int]:
+        """Total de tokens do texto; None se is_stale() ficou verdadeiro no meio (pedido obsoleto)."""
+        self.last_encoded = 0
+        if not text:
+            return 0
+        if get_encoder(encoder_key) is None:
+            return count_tokens(text, encoder_key)[0]
+
+        previous = self._chunk_counts.get(encoder_key, {})
+        current: Dict[str, int] = {}
+        total = 0
+        for chunk in split_stable_chunks(text):
+            tokens = current.get(chunk)
+            if tokens is None:
+                tokens = previous.get(chunk)
+            if tokens is None:
+                if is_stale is not None and is_stale():
+                    # Guarda o que já foi contado: o próximo pedido reaproveita
+                    previous.update(current)
+                    return None
+                tokens = count_tokens(chunk, encoder_key)[0]
+                self.last_encoded += 1
+            current[chunk] = tokens
+            total += tokens
+        self._chunk_counts[encoder_key] = current
+        return total
+
+    def clear(self):
+        self._chunk_counts.clear()
+
+
+class CountWorker:
+    """
+    Thread única e reutilizável para a contagem ao vivo: submit() substitui o
+    pedido pendente (só o mais recente importa) e interrompe a contagem em
+    andamento de um texto que já ficou obsoleto. on_result(texto, encoder, tokens)
+    é chamado na thread do worker.
+    """
+    def __init__(self, on_result: Callable[[str, str, int], None],
+                 counter: Optional[IncrementalTokenCounter] = None):
+        self.counter = counter or IncrementalTokenCounter()
+        self.on_result = on_result
+        self._cond = threading.Condition()
+        self._pending: Optional[Tuple[int, str, str]] = None
+        self._generation = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name='text-token-counter')
+        self._thread.start()
+
+    def submit(self, text: str, encoder_key: str = DEFAULT_ENCODER):
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, text, encoder_key)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._generation += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                generation, text, encoder_key = self._pending
+                self._pending = None
+
+            tokens = self.counter.count(text, encoder_key, is_stale=lambda: self._generation != generation)
+            if tokens is not None and self._generation == generation:
+                self.on_result(text, encoder_key, tokens)
@@ -0,0 +1,142 @@
+import fnmatch
+import os
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, TextIO
+
+from .counter import DEFAULT_ENCODER, count_tokens
+from .exporter import ExportStats, bundle_wrapper, export_bundle, file_footer, file_header, relative_path
+from .scanner import natural_sort_key
+from .tree import TreeNode
+
+
+class PackRules(NamedTuple):
+    """
+    Regras do empacotamento. Globs casam (sem diferenciar maiúsculas) com o
+    caminho relativo à raiz, com '/', ou com o nome do arquivo. A prioridade de
+    um arquivo é o produto dos fatores: peso da extensão (0 exclui), recência
+    (1 + recency_weight no mais recente, 1 no mais antigo) e profundidade
+    (1 / (1 + depth_weight * nível)).
+    """
+    include: Sequence[str] = ()
+    exclude: Sequence[str] = ()
+    recency_weight: float = 1.0
+    depth_weight: float = 0.5
+    extension_weights: Optional[Dict[str, float]] = None  # '.py' -> peso (padrão 1.0)
+    selected_only: bool = True  # Só arquivos com selection_state == 2
+
+
+class PackItem(NamedTuple):
+    node: TreeNode
+    rel_path: str
+    tokens: int      # Conteúdo + cabeçalho e fechamento do formato
+    priority: float
+
+
+class PackPlan(NamedTuple):
+    items: List[PackItem]   # Na ordem da árvore (caminho natural)
+    total_tokens: int
+    budget: int
+    candidates: int         # Arquivos que passaram pelos filtros
+    encoder: str
+    root_node: Optional[TreeNode]
+    fmt: str                # Formato do exporter usado no custo dos cabeçalhos
+
+
+def _matches(patterns: Sequence[str], rel_lower: str, name_lower: str) -> bool:
+    return any(fnmatch.fnmatchcase(rel_lower, p) or fnmatch.fnmatchcase(name_lower, p) for p in patterns)
+
+def _recency_ranks(paths: List[str], snapshot: Dict[str, Any]) -> Dict[str, float]:
+    """Posição normalizada por mtime (0 = mais antigo, 1 = mais recente)."""
+    mtimes = {}
+    for path in paths:
+        meta = snapshot.get(path)
+        mtime = meta[0] if meta and meta[0] >= 0 else None
+        if mtime is None:
+            # Arquivos estimados ficam sem mtime no snapshot
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = 0
+        mtimes[path] = mtime
+    ordered = sorted(paths, key=mtimes.__getitem__)
+    last = max(len(ordered) - 1, 1)
+    return {path: position / last for position, path in enumerate(ordered)}
+
+def plan_pack(results: Dict[str, Any], budget: int, rules: PackRules = PackRules(),
+              encoder_key: Optional[str] = None, fmt: str = 'plain') -> PackPlan:
+    """
+    Escolhe os arquivos do pacote dentro do orçamento de tokens (mochila com
+    heurística gulosa): o valor de um arquivo é prioridade × tokens, então a
+    razão valor/peso é a própria prioridade. Os candidatos são percorridos da
+    maior prioridade para a menor (menores primeiro no empate) e cada um entra
+    se ainda couber; os que estouram são pulados, e os menores seguintes
+    completam o orçamento. Usa as contagens do scan (token_count): nenhum
+    arquivo é lido aqui. fmt: formato do core.exporter usado na escrita.
+    """
+    encoder_key = encoder_key or (results.get('encoders') or [DEFAULT_ENCODER])[0]
+    root_path = results.get('root_path') or ""
+    include = [p.lower() for p in rules.include]
+    exclude = [p.lower() for p in rules.exclude]
+    weights = {ext.lower(): weight for ext, weight in (rules.extension_weights or {}).items()}
+
+    root_node = results.get('root_node')
+    if rules.selected_only and root_node is not None:
+        root_node.resolve_subtree_selection()
+
+    candidates = []
+    for node in results.get('node_map', {}).values():
+        if node.is_dir or not node.is_text:
+            continue
+        if rules.selected_only and node.selection_state != 2:
+            continue
+        rel = relative_path(node, root_path)
+        rel_lower, name_lower = rel.lower(), node.name.lower()
+        if include and not _matches(include, rel_lower, name_lower):
+            continue
+        if exclude and _matches(exclude, rel_lower, name_lower):
+            continue
+        ext_weight = weights.get(os.path.splitext(name_lower)[1], 1.0)
+        if ext_weight <= 0:
+            continue
+        candidates.append((node, rel, ext_weight))
+
+    ranks = _recency_ranks([node.full_path for node, _, _ in candidates], results.get('snapshot') or {}) \
+        if rules.recency_weight else {}
+    scored = []
+    for node, rel, ext_weight in candidates:
+        priority = ext_weight / (1.0 + rules.depth_weight * rel.count('/'))
+        priority *= 1.0 + rules.recency_weight * ranks.get(node.full_path, 0.0)
+        scored.append((node, rel, priority))
+    scored.sort(key=lambda item: (-item[2], item[0].token_count, item[1]))
+
+    chosen: List[PackItem] = []
+    # Abertura/fechamento do pacote também consomem o orçamento
+    remaining = budget - (count_tokens("".join(bundle_wrapper(fmt, root_node, encoder_key)), encoder_key)[0]
+                          if root_node is not None else 0)
+    for node, rel, priority in scored:
+        if node.token_count >= remaining:
+            # Só o conteúdo já não cabe: pula sem contar o cabeçalho
+            continue
+        # Cabeçalho + fechamento sem '\n' final (o caso mais longo) + 1 token de folga
+        # para a fusão de tokens na fronteira com o conteúdo: nunca subestima
+        wrapper = file_header(fmt, rel, node.token_count) + file_footer(fmt, False)
+        cost = node.token_count + count_tokens(wrapper, encoder_key)[0] + 1
+        if cost <= remaining:
+            chosen.append(PackItem(node, rel, cost, priority))
+            remaining -= cost
+            if remaining <= 0:
+                break
+
+    chosen.sort(key=lambda item: [natural_sort_key(part) for part in item.rel_path.split('/')])
+    return PackPlan(chosen, budget - remaining, budget, len(candidates), encoder_key, root_node, fmt)
+
+def write_pack(plan: PackPlan, out: TextIO, cancel_flag: Optional[threading.Event] = None,
+               progress_callback: Optional[Callable[[int, int, int, str], None]] = None) -> ExportStats:
+    """
+    Escreve o pacote em out com o core.exporter (formato do plano, sem a
+    árvore): cada arquivo é copiado do disco em blocos, sem montar o pacote
+    inteiro em memória.
+    """
+    return export_bundle(out, plan.root_node, [item.node for item in plan.items], fmt=plan.fmt,
+                         include_tree=False, encoder_key=plan.encoder, cancel_flag=cancel_flag,
+                         progress_callback=progress_callback)
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+# Leitura é I/O (libera o GIL): mais threads que núcleos escondem a latência do disco/rede
+DEFAULT_READ_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_MAX_BYTES_IN_FLIGHT = 64 * 1024 * 1024
+DEFAULT_MAX_ITEMS_IN_FLIGHT = 256
+CANCEL_POLL_INTERVAL = 0.01  # Segundos: latência máxima para perceber o cancel_flag
+
+# job = (função, argumentos, finish): o worker executa finish(resultado_da_leitura, função(*argumentos))
+Job = Tuple[Callable[..., Any], tuple, Callable[[Any, Any], Any]]
+
+
+class ByteBudget:
+    """
+    Limite de read-ahead: bytes e itens em voo (lidos e ainda não processados).
+    Um item maior que o limite passa sozinho quando não há nada em voo.
+    """
+    def __init__(self, max_bytes: int, max_items: int):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.bytes_in_flight = 0
+        self.items_in_flight = 0
+        self._cond = threading.Condition()
+
+    def _fits(self, size: int) -> bool:
+        if self.items_in_flight == 0:
+            return True
+        return self.items_in_flight < self.max_items and self.bytes_in_flight + size <= self.max_bytes
+
+    def try_acquire(self, size: int, timeout: float) -> bool:
+        """Reserva size bytes, esperando no máximo timeout segundos por espaço."""
+        with self._cond:
+            if not self._fits(size):
+                self._cond.wait(timeout)
+                if not self._fits(size):
+                    return False
+            self.bytes_in_flight += size
+            self.items_in_flight += 1
+            return True
+
+    def release(self, size: int):
+        with self._cond:
+            self.bytes_in_flight -= size
+            self.items_in_flight -= 1
+            self._cond.notify_all()
+
+
+def iter_pipeline(items: Iterable[Any], read: Callable[[Any], Tuple[Any, Optional[Job]]],
+                  cancel_flag: Optional[threading.Event] = None,
+                  readers: int = DEFAULT_READ_WORKERS, workers: int = 1,
+                  cost: Optional[Callable[[Any], int]] = None,
+                  max_bytes_in_flight: int = DEFAULT_MAX_BYTES_IN_FLIGHT,
+                  max_items_in_flight: int = DEFAULT_MAX_ITEMS_IN_FLIGHT) -> Iterator[Tuple[Any, Any]]:
+    """
+    Pipeline produtor/consumidor em dois estágios: um pool de leitores executa
+    read(item) -> (resultado, job) e, quando há job, um pool de workers executa a
+    parte de CPU (tokenização). Leitura e processamento se sobrepõem; o read-ahead
+    é limitado por bytes em voo (cost(item)) e por número de itens (backpressure).
+
+    Gera (item, resultado) na ordem de conclusão. cancel_flag é verificado a cada
+    CANCEL_POLL_INTERVAL: o gerador retorna sem esperar tarefas em andamento.
+    Exceções de read/job são repassadas ao consumidor.
+    Com readers <= 1 e workers <= 1 roda tudo em sequência na thread do chamador.
+    """
+    def cancelled() -> bool:
+        return cancel_flag is not None and cancel_flag.is_set()
+
+    if readers <= 1 and workers <= 1:
+        for item in items:
+            if cancelled(): return
+            result, job = read(item)
+            if job is not None:
+                func, args, finish = job
+                result = finish(result, func(*args))
+            yield item, result
+        return
+
+    budget = ByteBudget(max_bytes_in_flight, max_items_in_flight)
+    done_queue: 'queue.SimpleQueue[Tuple[Any, Any, Optional[BaseException]]]' = queue.SimpleQueue()
+    stop = threading.Event()
+    read_pool = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix='scan-read')
+    work_pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='scan-token')
+
+    def complete(item, size: int, result=None, error: Optional[BaseException] = None):
+        budget.release(size)
+        done_queue.put((item, result, error))
+
+    def run_job(item, size: int, result, job: Job):
+        func, args, finish = job
+        try:
+            complete(item, size, finish(result, func(*args)))
+        except BaseException as e:
+            complete(item, size, error=e)
+
+    def run_read(item, size: int):
+        if stop.is_set():
+            complete(item, size)
+            return
+        try:
+            result, job = read(item)
+        except BaseException as e:
+            complete(item, size, error=e)
+            return
+        if job is None:
+            complete(item, size, result)
+            return
+        try:
+            work_pool.submit(run_job, item, size, result, job)
+        except RuntimeError:
+            # Pool já encerrado (cancelamento)
+            complete(item, size)
+
+    submitted = 0
+    finished = 0
+
+    def drain(timeout: float) -> Iterator[Tuple[Any, Any]]:
+        nonlocal finished
+        try:
+            entry = done_queue.get(timeout=timeout) if timeout else done_queue.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            item, result, error = entry
+            finished += 1
+            if error is not None:
+                raise error
+            yield item, result
+            try:
+                entry = done_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    try:
+        for item in items:
+            size = cost(item) if cost else 0
+            while not budget.try_acquire(size, CANCEL_POLL_INTERVAL):
+                if cancelled(): return
+                yield from drain(0)
+            if cancelled():
+                budget.release(size)
+                return
+            read_pool.submit(run_read, item, size)
+            submitted += 1
+            yield from drain(0)
+
+        while finished < submitted:
+            if cancelled(): return
+            yield from drain(CANCEL_POLL_INTERVAL)
+    finally:
+        stop.set()
+        read_pool.shutdown(wait=False, cancel_futures=True)
+        work_pool.shutdown(wait=False, cancel_futures=True)
@@ -1,10 +1,18 @@
 import os
+import hashlib
+import mmap
 import threading
 import re
-from typing import Dict, Any, List, Optional, Set, Tuple
+import stat
+from typing import Dict, Any, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 # Importar count_tokens do core corretamente
-from .counter import count_tokens 
+from .counter import count_tokens_multi, count_tokens_chunks_multi, get_encoder_name, DEFAULT_ENCODER, ENCODERS
+from .cache import TokenCache
+from .tree import TreeNode
+from .pipeline import iter_pipeline, DEFAULT_READ_WORKERS
+from .estimator import TokenEstimator
+from .search import SearchIndex
 
 # === CONSTANTES DE CONFIGURAÇÃO ===
 # ... (CONSTANTES DE CONFIGURAÇÃO MANTIDAS) ...
@@ -24,20 +32,58 @@ IGNORED_BINARIES: Set[str] = {
     '.pdf', '.exe', '.dll', '.so', '.dylib', '.obj', '.bin', '.db', '.dat'
 }
 
-MAX_FILE_SIZE = 10 * 1024 * 1024 
+MAX_FILE_SIZE = 64 * 1024 * 1024 
 BINARY_CHECK_BYTES = 1024 
 NULL_BYTE_THRESHOLD = 5 
 
+# Arquivos grandes: mmap + tokenização em pedaços com cortes seguros
+LARGE_FILE_THRESHOLD = 1 * 1024 * 1024
+LARGE_FILE_CHUNK = 256 * 1024
+
+# Contagem paralela de tokens
+# O encode do tiktoken (Rust) libera o GIL, então threads usam todos os núcleos
+# sem o custo de serializar o conteúdo dos arquivos para outros processos.
+# A leitura roda num pool próprio (core.pipeline) sobreposto à tokenização.
+DEFAULT_TOKEN_WORKERS = min(8, os.cpu_count() or 1)
+MAX_PENDING_PER_WORKER = 4
+
+# Modo estimativa: uma amostra por extensão é contada de verdade e calibra o
+# TokenEstimator; os demais arquivos são estimados só pelo stat (sem leitura).
+ESTIMATE_SAMPLES_PER_EXT = 16
+ESTIMATE_SAMPLE_MAX_FILE = 256 * 1024
+ESTIMATE_MAX_SAMPLES = 2000
+ESTIMATED_MTIME = -1  # mtime_ns no snapshot dos estimados: o próximo rescan conta todos de verdade
+
+IGNORED_DIRS: Set[str] = {'__pycache__', 'node_modules', 'dist', 'build', 'target', 'venv', 'env'}
+
+
+class ScanProfile(NamedTuple):
+    """
+    Regras de seleção e leitura de uma varredura. O padrão é o comportamento do
+    app; ferramentas com regras próprias (ex: contar_tokens_arvore.py) usam o
+    mesmo pipeline, pool e cache com outro perfil.
+    """
+    text_extensions: Optional[FrozenSet[str]] = None  # None: TEXT_EXTENSIONS + checagem de conteúdo; conjunto: só essas são texto
+    ignored_dirs: FrozenSet[str] = frozenset(IGNORED_DIRS)
+    ignored_files: FrozenSet[str] = frozenset()
+    casefold_names: bool = False      # Compara ignored_dirs/ignored_files em minúsculas
+    skip_hidden_files: bool = False   # Pastas ocultas são sempre puladas; arquivos ocultos só com esta opção
+    follow_dir_links: bool = False    # Entra em links de diretório (exceto os que apontam para um ancestral)
+    decode_errors: str = 'strict'     # 'strict': não-UTF-8 é binário; 'ignore': bytes inválidos são descartados
+    max_file_size: Optional[int] = MAX_FILE_SIZE
+
+DEFAULT_PROFILE = ScanProfile()
+
 # === FUNÇÕES AUXILIARES ===
 
 def natural_sort_key(s: str) -> List[Any]:
     """Chave de ordenação natural."""
     return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
 
-def is_binary_by_content_check(file_path: str) -> bool:
-    """Heurística: Checa por bytes nulos."""
+def is_binary_by_content_check(file_path: str, size: Optional[int] = None) -> bool:
+    """Heurística: Checa por bytes nulos. size: tamanho já conhecido (evita um stat extra)."""
     try:
-        if os.path.getsize(file_path) == 0:
+        if (os.path.getsize(file_path) if size is None else size) == 0:
             return False 
         
         with open(file_path, 'rb') as f:
@@ -52,6 +98,100 @@ def is_binary_by_content_check(file_path: str) -> bool:
 
     except IOError:
         return True
+
+def _decode_text(raw: bytes, errors: str = 'strict') -> str:
+    """
+    Decodifica bytes como UTF-8 (estrito por padrão) com newlines universais, o
+    mesmo resultado de open(path, 'r', encoding='utf-8', errors=errors).read().
+    """
+    text = raw.decode('utf-8', errors)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _text_size(raw: bytes, text: str, errors: str = 'strict') -> int:
+    """
+    Tamanho UTF-8 do texto decodificado. No modo estrito não recodifica: a
+    conversão de newlines só encurta o texto em 1 byte por '\\r\\n'. Com outro
+    errors (ex: 'ignore'), bytes inválidos somem ou são trocados, então o
+    tamanho vem do próprio texto.
+    """
+    if errors == 'strict':
+        return len(raw) - raw.count(b'\r\n')
+    return len(text.encode('utf-8', 'surrogateescape'))
+
+def _find_safe_cut(buf, start: int, end: int) -> int:
+    """
+    Procura, a partir de start, uma posição de corte que não muda a pré-tokenização
+    (regex do cl100k/o200k): logo após um '\\n' seguido de letra/dígito ASCII ou,
+    em textos sem quebras de linha (minificados), antes de um espaço entre um
+    caractere visível e uma letra ASCII. Retorna -1 se não houver corte.
+    """
+    pos = buf.find(b'\n', start, end - 1)
+    while pos != -1:
+        if chr(buf[pos + 1]).isalnum() and buf[pos + 1] < 0x80:
+            return pos + 1
+        pos = buf.find(b'\n', pos + 1, end - 1)
+
+    pos = buf.find(b' ', max(start, 1), end - 1)
+    while pos != -1:
+        if buf[pos + 1] < 0x80 and chr(buf[pos + 1]).isalpha() and not chr(buf[pos - 1]).isspace():
+            return pos
+        pos = buf.find(b' ', pos + 1, end - 1)
+    return -1
+
+def _iter_safe_chunks(buf, chunk_size: int = LARGE_FILE_CHUNK) -> Iterator[bytes]:
+    """Divide um buffer (ex: mmap) em pedaços de ~chunk_size bytes com cortes seguros."""
+    start = 0
+    total = len(buf)
+    while start < total:
+        cut = -1
+        if start + chunk_size < total:
+            # Procura o corte numa janela após o tamanho alvo; sem corte, avança o pedaço inteiro
+            cut = _find_safe_cut(buf, start + chunk_size, min(total, start + 2 * chunk_size))
+            if cut == -1:
+                cut = _find_safe_cut(buf, start + 2 * chunk_size, total)
+        if cut == -1:
+            yield buf[start:total]
+            return
+        yield buf[start:cut]
+        start = cut
+
+def _content_digest(raw: bytes) -> str:
+    """Hash do conteúdo bruto (fallback do cache quando os metadados mudam)."""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _count_content(content: str, text_size: int, encoder_keys: List[str]) -> Optional[Tuple[Dict[str, int], int]]:
+    """Tarefa do pool: conta um conteúdo já lido. Retorna ({encoder: tokens}, tamanho do texto)."""
+    return count_tokens_multi(content, encoder_keys), text_size
+
+def _count_large_file(file_path: str, encoder_keys: List[str], errors: str = 'strict') -> Optional[Tuple[Dict[str, int], int]]:
+    """
+    Tarefa do pool para arquivos grandes: mapeia o arquivo (mmap) e tokeniza em
+    pedaços com cortes seguros, sem manter o texto inteiro na memória. Cada pedaço
+    é decodificado uma vez e contado para todos os encoders.
+    Retorna ({encoder: tokens}, tamanho do texto) ou None se o arquivo não for UTF-8 válido.
+    """
+    try:
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text_size = 0
+
+            def decoded_chunks() -> Iterator[str]:
+                nonlocal text_size
+                for raw in _iter_safe_chunks(mm):
+                    text = _decode_text(raw, errors)
+                    text_size += _text_size(raw, text, errors)
+                    yield text
+
+            counts = count_tokens_chunks_multi(decoded_chunks(), encoder_keys)
+        return counts, text_size
+    except (UnicodeDecodeError, OSError, ValueError):
+        return None
+
+def read_text_file(file_path: str) -> str:
+    """Lê um arquivo de texto do disco com a mesma decodificação usada no scan."""
+    with open(file_path, 'rb') as f:
+        return _decode_text(f.read())
     
 
 def _get_common_root(paths: List[str]) -> str:
@@ -93,8 +233,11 @@ def _get_common_root(paths: List[str]) -> str:
         else:
             root_path = common_prefix_list[0] + os.path.sep + os.path.join(*common_prefix_list[1:])
     else:
-        # Unix/Linux ou outros caminhos que os.path.join trata corretamente
+        # Unix/Linux ou outros caminhos que os.path.join trata corretamente.
+        # Caminho absoluto começa com componente vazio ('/tmp' -> ['', 'tmp']): recoloca a barra inicial.
         root_path = os.path.join(*common_prefix_list)
+        if common_prefix_list[0] == '' and not root_path.startswith(os.path.sep):
+            root_path = os.path.sep + root_path
 
     # Garante que o root_path seja o diretório pai se o LCA for um arquivo
     if os.path.isfile(root_path):
@@ -105,184 +248,861 @@ def _get_common_root(paths: List[str]) -> str:
 
     return root_path
 
-# === TreeNode Definition ===
-class TreeNode:
-    """Classe para representar um nó na estrutura de diretórios do projeto."""
-    def __init__(self, name, full_path, is_dir, size_bytes=0, is_text=False, token_count=0, total_recursive_tokens=0, selection_state=0):
-        self.name = name
-        self.full_path = full_path
-        self.is_dir = is_dir
-        self.size_bytes = size_bytes
-        self.is_text = is_text
-        self.token_count = token_count
-        self.total_recursive_tokens = total_recursive_tokens
-        self.selection_state = selection_state # 0: ignorado, 1: parcial, 2: selecionado
-        self.children: List['TreeNode'] = []
-        self.parent: Optional['TreeNode'] = None
-
-    def add_child(self, child: 'TreeNode'):
-        self.children.append(child)
-        child.parent = self
-        
-    def calculate_recursive_tokens(self) -> int:
-        """Calcula e atualiza o total de tokens do nó e seus filhos."""
-        total_tokens = self.token_count if not self.is_dir and self.is_text else 0
-        for child in self.children:
-            total_tokens += child.calculate_recursive_tokens()
-        self.total_recursive_tokens = total_tokens
-        return total_tokens
 
-# ===============================================
+class ScanRecord(NamedTuple):
+    """Registro por arquivo produzido por iter_scan assim que o arquivo é processado."""
+    path: str
+    size: int                  # Bytes (texto: tamanho UTF-8 do conteúdo decodificado, sem os bytes descartados por decode_errors)
+    is_text: bool
+    tokens: int
+    ext: str
+    content: Optional[str]     # Conteúdo lido nesta varredura (None: binário ou servido pelo cache)
+    mtime_ns: int = 0          # Metadados do stat (snapshot para o rescan incremental)
+    file_size: int = 0
+    token_counts: Optional[Dict[str, int]] = None  # {encoder: tokens}; tokens é a do 1º encoder
+    estimated: bool = False    # tokens estimados (modo estimativa), ainda não contados
+    digest: Optional[str] = None  # Hash do conteúdo (texto), base da deduplicação
 
-def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_callback: callable) -> Dict[str, Any]:
+def _walk_stats(paths: List[str], profile: ScanProfile = DEFAULT_PROFILE) -> Iterator[Tuple[str, os.stat_result]]:
     """
-    Escaneia múltiplos arquivos e diretórios (suporte a D&D e seleção múltipla),
-    tratando-os como um projeto composto.
+    Walk em passagem única com os.scandir: gera (caminho, stat) por arquivo,
+    reaproveitando o stat do DirEntry (sem getsize/exists/isfile por arquivo).
+    Mesma ordem do os.walk top-down; pastas ocultas/ignoradas (profile) e links de
+    diretório não são percorridos. Arquivos que não podem ser consultados são pulados.
     """
-    if not paths:
-        return {'root_node': None, 'file_contents': {}, 'text_file_paths': set(), 'all_extensions': set(), 'total_files': 0, 'root_path': "", 'node_map': {}}
-
-    file_contents: Dict[str, str] = {}
-    text_file_paths: List[str] = []
-    all_extensions: Set[str] = set()
-    
-    # 1. Determina a Raiz do Projeto Composto (LCA)
-    root_path = _get_common_root(paths)
-    
-    # Define o nome da raiz. 
-    # Se root_path for a raiz do SO (ex: '/' ou 'C:\'), usa um nome descritivo.
-    if root_path == os.path.abspath(os.path.sep) or (os.name == 'nt' and len(root_path) == 3 and root_path[1] == ':'):
-        root_node_name = "Projeto Composto (Raiz)"
-    else:
-        root_node_name = os.path.basename(root_path) 
-        
-    root_node = TreeNode(root_node_name, root_path, True, selection_state=2)
-    node_map: Dict[str, TreeNode] = {root_path: root_node}
-    
-    # 2. Coleta todos os arquivos recursivamente
-    all_items: List[str] = []
-    
+    fold = str.lower if profile.casefold_names else None
     for input_path in paths:
         input_path = os.path.abspath(input_path)
-        
-        if not os.path.exists(input_path):
+
+        try:
+            st = os.stat(input_path)
+        except OSError:
             continue
 
-        if os.path.isdir(input_path):
-            # Escaneia pastas recursivamente
-            for dirpath, dirnames, filenames in os.walk(input_path):
-                # Exclui pastas irrelevantes
-                dirnames[:] = [d for d in dirnames if not (d.startswith('.') or d in ('__pycache__', 'node_modules', 'dist', 'build', 'target', 'venv', 'env'))]
-                for f in filenames:
-                    all_items.append(os.path.join(dirpath, f))
-        
-        elif os.path.isfile(input_path):
-            # Adiciona arquivos diretamente
-            all_items.append(input_path)
+        if not stat.S_ISDIR(st.st_mode):
+            yield input_path, st
+            continue
 
-    total_files = len(all_items)
-    
-    # 3. Segunda Passagem: Criar a árvore, ler o conteúdo e preencher node_map
-    current_scanned_count = 0
-    
-    for full_path in all_items:
-        if cancel_flag.is_set(): break
-            
-        current_scanned_count += 1
-        is_text_file = False
-        size = 0 
-        child_node_size = 0 
-        
-        try:
-            size = os.path.getsize(full_path)
-            item_name = os.path.basename(full_path)
-            
-            _, ext = os.path.splitext(item_name)
-            ext = ext.lower()
-            all_extensions.add(ext)
-            
-            # Checagens de Binário e Leitura de Conteúdo (Lógica mantida)
-            is_known_text = ext in TEXT_EXTENSIONS
-            is_known_binary = ext in IGNORED_BINARIES or size > MAX_FILE_SIZE
-            
-            if not is_known_binary:
-                if is_known_text or not is_binary_by_content_check(full_path):
+        # (pasta, caminho real): o real só é usado para detectar ciclos de links
+        stack = [(input_path, os.path.realpath(input_path) if profile.follow_dir_links else input_path)]
+        while stack:
+            dir_path, real_dir = stack.pop()
+            try:
+                it = os.scandir(dir_path)
+            except OSError:
+                continue
+            subdirs = []
+            with it:
+                for entry in it:
+                    name = fold(entry.name) if fold else entry.name
                     try:
-                        with open(full_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        is_text_file = True
-                        file_contents[full_path] = content
-                        text_file_paths.append(full_path)
-                        child_node_size = len(content.encode('utf-8'))
-                        
-                    except UnicodeDecodeError:
-                        is_text_file = False 
-                    except Exception:
-                        is_text_file = False 
-
-            # Cria o nó do arquivo
-            child_node = TreeNode(item_name, full_path, False, 
-                                  size_bytes=size if not is_text_file else child_node_size, 
-                                  is_text=is_text_file, 
-                                  selection_state=2 if is_text_file else 0)
-            
-            # --- Criação da Hierarquia (Relativa à nova root_path) ---
-            # Determina o caminho relativo a partir da raiz comum
-            if full_path == root_path:
-                path_parts = [item_name]
-            elif root_path == os.path.dirname(full_path):
-                path_parts = [item_name]
+                        if entry.is_dir():
+                            if entry.name.startswith('.') or name in profile.ignored_dirs:
+                                continue
+                            if not entry.is_symlink():
+                                subdirs.append((entry.path, os.path.join(real_dir, entry.name)))
+                            elif profile.follow_dir_links:
+                                # Link para a própria pasta ou um ancestral seria um ciclo infinito
+                                target = os.path.realpath(entry.path)
+                                if not (real_dir == target or real_dir.startswith(target.rstrip(os.sep) + os.sep)):
+                                    subdirs.append((entry.path, target))
+                            continue
+                        if name in profile.ignored_files or (profile.skip_hidden_files and entry.name.startswith('.')):
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, st
+            # Pilha em ordem reversa: subpastas visitadas na ordem da listagem
+            stack.extend(reversed(subdirs))
+
+def _classify(ext: str, size: int, profile: ScanProfile) -> Optional[bool]:
+    """True: texto pela extensão; False: binário/ignorado sem ler; None: decidir pelo conteúdo."""
+    if profile.max_file_size is not None and size > profile.max_file_size:
+        return False
+    if profile.text_extensions is not None:
+        return ext in profile.text_extensions
+    if ext in IGNORED_BINARIES:
+        return False
+    return True if ext in TEXT_EXTENSIONS else None
+
+def _inspect_file(full_path: str, st: os.stat_result, cache: Optional[TokenCache], encoders: List[Tuple[str, str]],
+                  profile: ScanProfile = DEFAULT_PROFILE):
+    """
+    Lê (ou resolve pelo cache) um arquivo, usando o stat obtido no walk.
+    encoders: [(chave do registro, nome no cache)]; o 1º é a contagem principal.
+    Retorna (registro, job); job é None se o registro já está completo, ou
+    (função, argumentos, meta) com a contagem a executar no pool, sendo
+    meta = (mtime_ns, tamanho, hash, contagens já conhecidas pelo hash).
+    """
+    size = st.st_size
+    mtime_ns = st.st_mtime_ns
+    item_name = os.path.basename(full_path)
+    _, ext = os.path.splitext(item_name)
+    ext = ext.lower()
+
+    def make_record(size: int, is_text: bool, counts: Dict[str, int], content: Optional[str] = None,
+                    digest: Optional[str] = None) -> ScanRecord:
+        return ScanRecord(full_path, size, is_text, counts[encoders[0][0]], ext, content, mtime_ns, st.st_size, counts,
+                          digest=digest)
+
+    no_tokens = {key: 0 for key, _ in encoders}
+
+    # Checagens de Binário e Leitura de Conteúdo
+    known_kind = _classify(ext, size, profile)
+    is_known_text = known_kind is True
+    if known_kind is False:
+        if cache:
+            cache.record_skip()
+        return make_record(size, False, no_tokens), None
+
+    if cache:
+        cached = [cache.lookup(full_path, mtime_ns, size, name) for _, name in encoders]
+        if all(c is not None and c[0] == cached[0][0] for c in cached):
+            # Arquivo inalterado: dispensa leitura e tokenização
+            cache.record_hit()
+            is_text_file, text_size, _, digest = cached[0]
+            counts = {key: c[2] for (key, _), c in zip(encoders, cached)}
+            return make_record(text_size if is_text_file else size, is_text_file, counts, digest=digest), None
+
+    def known_by_digest(digest: str) -> Tuple[Dict[str, int], Optional[int]]:
+        # Contagens já feitas para o mesmo conteúdo (arquivo movido, touch, cópia)
+        known: Dict[str, int] = {}
+        text_size = None
+        if cache:
+            for key, name in encoders:
+                hashed = cache.lookup_digest(digest, name)
+                if hashed is not None:
+                    known[key], text_size = hashed
+        return known, text_size
+
+    if is_known_text or not is_binary_by_content_check(full_path, size):
+        if size >= LARGE_FILE_THRESHOLD:
+            # Arquivo grande: só o hash é calculado aqui (sobre o mmap, sem cópia);
+            # validação UTF-8 e contagem em pedaços acontecem no pool.
+            try:
+                with open(full_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest = _content_digest(mm)
+            except (OSError, ValueError):
+                digest = None
+            if digest is not None:
+                known, text_size = known_by_digest(digest)
+                missing = [key for key, _ in encoders if key not in known]
+                if not missing:
+                    cache.record_hash_hit()
+                    for key, name in encoders:
+                        cache.store(full_path, mtime_ns, size, name, True, text_size, known[key], digest)
+                    return make_record(text_size, True, known, digest=digest), None
+                record = make_record(size, True, no_tokens, digest=digest)
+                return record, (_count_large_file, (full_path, missing, profile.decode_errors), (mtime_ns, size, digest, known))
+        else:
+            try:
+                with open(full_path, 'rb') as f:
+                    raw = f.read()
+                content = _decode_text(raw, profile.decode_errors)
+            except (UnicodeDecodeError, OSError):
+                content = None
+
+            if content is not None:
+                text_size = _text_size(raw, content, profile.decode_errors)
+                digest = _content_digest(raw)
+                known, _ = known_by_digest(digest)
+                missing = [key for key, _ in encoders if key not in known]
+                if not missing:
+                    cache.record_hash_hit()
+                    for key, name in encoders:
+                        cache.store(full_path, mtime_ns, size, name, True, text_size, known[key], digest)
+                    return make_record(text_size, True, known, content, digest), None
+                record = make_record(text_size, True, no_tokens, content, digest)
+                return record, (_count_content, (content, text_size, missing), (mtime_ns, size, digest, known))
+
+    if cache:
+        cache.record_miss()
+        for _, name in encoders:
+            cache.store(full_path, mtime_ns, size, name, False, size, 0)
+    return make_record(size, False, no_tokens), None
+
+class _DedupIndex:
+    """
+    Deduplicação por conteúdo dentro de uma varredura: cada hash é tokenizado
+    uma única vez. O 1º arquivo com o hash vira o dono da contagem; cópias que
+    chegam enquanto ele está em voo esperam no consumidor (sem bloquear o pool).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counted: Dict[str, Optional[Tuple[Dict[str, int], int]]] = {}
+        self.pending: Set[str] = set()
+        self.hits = 0
+
+    def claim(self, digest: str) -> Tuple[str, Optional[Tuple[Dict[str, int], int]]]:
+        """
+        ('done', contagem) se o conteúdo já foi contado, ('wait', None) se está
+        em voo com outro dono, ou ('own', None): quem chama passa a ser o dono.
+        """
+        with self.lock:
+            if digest in self.counted:
+                self.hits += 1
+                return 'done', self.counted[digest]
+            if digest in self.pending:
+                self.hits += 1
+                return 'wait', None
+            self.pending.add(digest)
+            return 'own', None
+
+    def result(self, digest: str) -> Tuple[bool, Optional[Tuple[Dict[str, int], int]]]:
+        with self.lock:
+            return digest in self.counted, self.counted.get(digest)
+
+    def publish(self, digest: str, counted: Optional[Tuple[Dict[str, int], int]]):
+        with self.lock:
+            self.pending.discard(digest)
+            self.counted[digest] = counted
+
+
+class _Parked(NamedTuple):
+    """Cópia cujo conteúdo ainda está sendo contado por outro arquivo (dono)."""
+    record: ScanRecord
+    meta: Tuple[int, int, str, Dict[str, int]]
+
+
+def _iter_records(all_items: Iterable[Tuple[str, os.stat_result]], cancel_flag: Optional[threading.Event] = None,
+                  progress_callback: Optional[callable] = None, token_workers: Optional[int] = None,
+                  cache: Optional[TokenCache] = None, encoder_keys: Optional[List[str]] = None,
+                  dedup: Optional[_DedupIndex] = None, profile: ScanProfile = DEFAULT_PROFILE) -> Iterator[ScanRecord]:
+    """
+    Processa a lista de (arquivo, stat) e gera um ScanRecord por arquivo assim que a
+    contagem dele termina (um iterador sem len é consumido sob demanda; total = 0). Leitura (pool de I/O) e tokenização (pool de CPU) se
+    sobrepõem via core.pipeline, com read-ahead limitado por bytes em voo.
+    token_workers=1 processa tudo em sequência, sem threads.
+    encoder_keys: encoders do registro (core.counter) contados na mesma leitura.
+    dedup: índice de conteúdo da varredura; arquivos idênticos são tokenizados uma vez só.
+    profile: regras de leitura (ScanProfile); outra decodificação usa entradas próprias no cache.
+    """
+    total = len(all_items) if hasattr(all_items, '__len__') else 0
+    # Perfis não estritos têm chaves próprias no cache (v2: text_size sem os bytes descartados)
+    suffix = '' if profile.decode_errors == 'strict' else f"+{profile.decode_errors}.v2"
+    encoders = [(key, get_encoder_name(key) + suffix) for key in dict.fromkeys(encoder_keys or [DEFAULT_ENCODER])]
+    workers = max(1, token_workers or DEFAULT_TOKEN_WORKERS)
+    # Só token_workers=1 explícito desliga os pools; em máquinas de 1 núcleo a leitura ainda se sobrepõe
+    readers = 1 if token_workers == 1 else DEFAULT_READ_WORKERS
+    scanned = 0
+    dedup = dedup if dedup is not None else _DedupIndex()
+    parked: Dict[str, List[_Parked]] = {}
+
+    def finish(record: ScanRecord, counted: Optional[Tuple[Dict[str, int], int]],
+               meta: Tuple[int, int, str, Dict[str, int]], owner: bool = True) -> ScanRecord:
+        mtime_ns, size, digest, known = meta
+        if owner and digest is not None:
+            dedup.publish(digest, counted)
+        if cache:
+            # Um resultado por arquivo: o dono leu e contou; as cópias vieram pelo hash (nesta varredura)
+            if owner:
+                cache.record_miss()
             else:
-                # Usa relpath para obter a lista de diretórios intermediários
-                path_parts = os.path.relpath(full_path, root_path).split(os.path.sep)
-                
-            # Filtra componentes indesejados (como '.') que relpath pode gerar
-            path_parts = [p for p in path_parts if p and p != '.']
-            
-            current_path_segment = root_path
-            current_parent_node = root_node
-            
-            # Navega pelos diretórios intermediários e os cria se necessário
-            for part in path_parts[:-1]:
-                current_path_segment = os.path.join(current_path_segment, part)
-                # Garante que o path para o nó de diretório não é o path da raiz em si
-                if current_path_segment == root_path: 
-                    continue
-                    
-                if current_path_segment not in node_map:
-                    # Cria nó de diretório intermediário
-                    new_dir_node = TreeNode(part, current_path_segment, True, selection_state=2)
-                    current_parent_node.add_child(new_dir_node)
-                    node_map[current_path_segment] = new_dir_node
-                    current_parent_node = new_dir_node
-                else:
-                    current_parent_node = node_map[current_path_segment]
-                    
-            # Adiciona o nó do arquivo final
-            current_parent_node.add_child(child_node)
-            node_map[full_path] = child_node
+                cache.record_hash_hit()
+        if counted is None:
+            # Arquivo grande que não era UTF-8 válido
+            if cache:
+                for _, name in encoders:
+                    cache.store(record.path, mtime_ns, size, name, False, size, 0)
+            return record._replace(is_text=False, tokens=0, size=size)
+        counts, text_size = counted
+        counts = {**known, **counts}
+        if cache:
+            for key, name in encoders:
+                cache.store(record.path, mtime_ns, size, name, True, text_size, counts[key], digest)
+        return record._replace(tokens=counts[encoders[0][0]], size=text_size, token_counts=counts)
 
+    def read(item: Tuple[str, os.stat_result]):
+        # Estágio de I/O: cache, leitura e decodificação; a contagem vira um job do pool de CPU
+        full_path, st = item
+        try:
+            record, job = _inspect_file(full_path, st, cache, encoders, profile)
         except OSError:
-            pass 
+            return None, None
+        if job is None:
+            return record, None
+        func, args, meta = job
+        digest = meta[2]
+        if digest is not None:
+            state, counted = dedup.claim(digest)
+            if state == 'done':
+                return finish(record, counted, meta, owner=False), None
+            if state == 'wait':
+                return _Parked(record, meta), None
+        return record, (func, args, lambda record, counted: finish(record, counted, meta))
+
+    def read_cost(item: Tuple[str, os.stat_result]) -> int:
+        size = item[1].st_size
+        return size if profile.max_file_size is None or size <= profile.max_file_size else 0
+
+    for (full_path, _), record in iter_pipeline(all_items, read, cancel_flag, readers, workers, read_cost,
+                                                max_items_in_flight=workers * MAX_PENDING_PER_WORKER + readers):
+        scanned += 1
+        if progress_callback:
+            progress_callback(scanned, total, full_path)
+        if isinstance(record, _Parked):
+            done, counted = dedup.result(record.meta[2])
+            if not done:
+                parked.setdefault(record.meta[2], []).append(record)
+                continue
+            record = finish(record.record, counted, record.meta, owner=False)
+        if record is None:
+            continue
+        yield record
+        # Libera as cópias que esperavam a contagem deste conteúdo
+        if record.digest is not None and record.digest in parked:
+            _, counted = dedup.result(record.digest)
+            for waiting in parked.pop(record.digest):
+                yield finish(waiting.record, counted, waiting.meta, owner=False)
+
+def _split_estimate_sample(all_items: List[Tuple[str, os.stat_result]], profile: ScanProfile = DEFAULT_PROFILE):
+    """
+    Separa a amostra exata do modo estimativa: até ESTIMATE_SAMPLES_PER_EXT
+    arquivos por extensão, espaçados ao longo do walk (não só os da 1ª pasta).
+    Retorna (amostra, restante), ambos na ordem do walk.
+    """
+    by_ext: Dict[str, List[int]] = {}
+    for index, (path, st) in enumerate(all_items):
+        ext = os.path.splitext(path)[1].lower()
+        if _classify(ext, st.st_size, profile) is False or st.st_size > ESTIMATE_SAMPLE_MAX_FILE:
+            continue
+        by_ext.setdefault(ext, []).append(index)
+
+    chosen: List[int] = []
+    for indexes in by_ext.values():
+        stride = max(1, len(indexes) // ESTIMATE_SAMPLES_PER_EXT)
+        chosen.extend(indexes[::stride][:ESTIMATE_SAMPLES_PER_EXT])
+    chosen.sort()
+    if len(chosen) > ESTIMATE_MAX_SAMPLES:
+        step = len(chosen) / ESTIMATE_MAX_SAMPLES
+        chosen = [chosen[int(i * step)] for i in range(ESTIMATE_MAX_SAMPLES)]
+
+    sampled = set(chosen)
+    sample = [all_items[i] for i in chosen]
+    rest = [item for i, item in enumerate(all_items) if i not in sampled]
+    return sample, rest
+
+def _estimate_record(full_path: str, st: os.stat_result, estimators: Dict[str, TokenEstimator],
+                     encoder_keys: List[str], profile: ScanProfile = DEFAULT_PROFILE) -> ScanRecord:
+    """Registro estimado só pelo stat: tamanho × tokens/byte calibrado da extensão."""
+    size = st.st_size
+    ext = os.path.splitext(full_path)[1].lower()
+    is_text = _classify(ext, size, profile)
+    if is_text is None:
+        # Extensão desconhecida: decide pelo que a amostra viu; sem amostra (ou maior
+        # que os arquivos amostrados, ex: libfoo.so.1.0), checa o conteúdo
+        is_text = estimators[encoder_keys[0]].is_text_ext(ext) if size <= ESTIMATE_SAMPLE_MAX_FILE else None
+        if is_text is None:
+            is_text = not is_binary_by_content_check(full_path, size)
+    counts = {key: estimators[key].estimate_size(size, ext) if is_text else 0 for key in encoder_keys}
+    return ScanRecord(full_path, size, is_text, counts[encoder_keys[0]], ext, None,
+                      st.st_mtime_ns, size, counts, estimated=True)
+
+def _iter_estimated_records(all_items: List[Tuple[str, os.stat_result]], estimators: Dict[str, TokenEstimator],
+                            cancel_flag: Optional[threading.Event] = None,
+                            progress_callback: Optional[callable] = None, token_workers: Optional[int] = None,
+                            cache: Optional[TokenCache] = None, dedup: Optional[_DedupIndex] = None,
+                            profile: ScanProfile = DEFAULT_PROFILE) -> Iterator[ScanRecord]:
+    """
+    Modo estimativa: conta de verdade a amostra (calibrando um TokenEstimator
+    por encoder) e depois estima o restante sem ler os arquivos.
+    """
+    total = len(all_items)
+    encoder_keys = list(estimators)
+    sample, rest = _split_estimate_sample(all_items, profile)
+
+    def sample_progress(scanned: int, _total: int, path: str):
+        if progress_callback:
+            progress_callback(scanned, total, path)
+
+    for record in _iter_records(sample, cancel_flag, sample_progress, token_workers, cache, encoder_keys, dedup, profile):
+        data = record.content.encode('utf-8') if record.content is not None else None
+        counts = record.token_counts or {encoder_keys[0]: record.tokens}
+        for key, estimator in estimators.items():
+            estimator.add_sample(record.ext, record.size, counts.get(key, 0), record.is_text, data)
+        yield record
+    for estimator in estimators.values():
+        estimator.calibrate()
+
+    scanned = len(sample)
+    for full_path, st in rest:
+        if cancel_flag is not None and cancel_flag.is_set():
+            return
+        scanned += 1
+        if cache:
+            cache.record_skip()
+        yield _estimate_record(full_path, st, estimators, encoder_keys, profile)
+        if progress_callback and (scanned % 1000 == 0 or scanned == total):
+            progress_callback(scanned, total, full_path)
+
+def iter_scan(paths: List[str], cancel_flag: Optional[threading.Event] = None,
+              progress_callback: Optional[callable] = None, token_workers: Optional[int] = None,
+              cache: Optional[TokenCache] = None, encoders: Optional[List[str]] = None,
+              profile: Optional[ScanProfile] = None) -> Iterator[ScanRecord]:
+    """
+    API de streaming: gera um ScanRecord (path, size, is_text, tokens, ...) por
+    arquivo, na ordem em que cada um fica pronto, sem montar a árvore.
+    progress_callback(processados, total, caminho) e cancel_flag seguem o contrato
+    de scan_directory; cache é um TokenCache aberto pelo chamador (opcional).
+    encoders: chaves do registro de encoders; record.token_counts traz todas as contagens.
+    Sem progress_callback o walk não é materializado antes (não há total a
+    informar): o 1º registro sai assim que o 1º arquivo é contado.
+    profile: regras de seleção/leitura (ScanProfile; None = as do app).
+    """
+    profile = profile or DEFAULT_PROFILE
+    items = _walk_stats(paths, profile)
+    if progress_callback is not None:
+        items = list(items)
+    yield from _iter_records(items, cancel_flag, progress_callback, token_workers, cache, encoders, profile=profile)
+
+
+class ScanTreeBuilder:
+    """
+    Monta a árvore de TreeNode e o node_map incrementalmente a partir de ScanRecords.
+    keep_contents=False: modo de baixa memória, guarda só contagens e metadados.
+    encoders: encoders contados; o 1º é o ativo (token_count). Com mais de um,
+    cada nó guarda token_counts para a troca sem rescan (set_active_encoder).
+    """
+    def __init__(self, paths: List[str], keep_contents: bool = True, encoders: Optional[List[str]] = None,
+                 profile: Optional[ScanProfile] = None):
+        self.keep_contents = keep_contents
+        self.profile = profile or DEFAULT_PROFILE
+        self.encoders = list(dict.fromkeys(encoders or [DEFAULT_ENCODER]))
+        self.scan_paths = [os.path.abspath(p) for p in paths]
+        # Snapshot (mtime_ns, tamanho) por arquivo, base do rescan incremental
+        self.snapshot: Dict[str, Tuple[int, int]] = {}
+        # Modo estimativa: arquivos com contagem estimada e os estimadores calibrados
+        self.estimated_paths: Set[str] = set()
+        self.estimators: Dict[str, TokenEstimator] = {}
+        self.created_dirs: List[TreeNode] = []
+        self.file_contents: Dict[str, str] = {}
+        self.text_file_paths: Set[str] = set()
+        self.all_extensions: Set[str] = set()
+        # Busca por nome/caminho/conteúdo (core.search), alimentada a cada arquivo
+        self.search_index = SearchIndex()
+        self.total_files = 0
+        self.total_tokens = 0
+
+        # Determina a Raiz do Projeto Composto (LCA)
+        self.root_path = _get_common_root(paths)
+        
+        # Define o nome da raiz. 
+        # Se root_path for a raiz do SO (ex: '/' ou 'C:\'), usa um nome descritivo.
+        root_path = self.root_path
+        if root_path == os.path.abspath(os.path.sep) or (os.name == 'nt' and len(root_path) == 3 and root_path[1] == ':'):
+            root_node_name = "Projeto Composto (Raiz)"
+        else:
+            root_node_name = os.path.basename(root_path) 
+            
+        self.root_node = TreeNode(root_node_name, root_path, True, selection_state=2)
+        self.node_map: Dict[str, TreeNode] = {root_path: self.root_node}
+
+    @classmethod
+    def resume(cls, results: Dict[str, Any]) -> 'ScanTreeBuilder':
+        """Retoma um builder sobre um resultado já existente (usado pelo rescan incremental)."""
+        builder = cls.__new__(cls)
+        builder.keep_contents = results['keep_contents']
+        builder.profile = results['profile']
+        builder.encoders = results['encoders']
+        builder.scan_paths = results['scan_paths']
+        builder.snapshot = results['snapshot']
+        builder.estimated_paths = results['estimated_paths']
+        builder.estimators = results['estimators']
+        builder.created_dirs = []
+        builder.file_contents = results['file_contents']
+        builder.text_file_paths = results['text_file_paths']
+        builder.all_extensions = results['all_extensions']
+        builder.search_index = results['search_index']
+        builder.total_files = results['total_files']
+        builder.total_tokens = results['root_node'].total_recursive_tokens
+        builder.root_path = results['root_path']
+        builder.root_node = results['root_node']
+        builder.node_map = results['node_map']
+        return builder
+
+    def add(self, record: ScanRecord) -> TreeNode:
+        """Cria o nó do arquivo (e diretórios intermediários) para um registro."""
+        full_path = record.path
+        item_name = os.path.basename(full_path)
+        self.all_extensions.add(record.ext)
+        self._track_snapshot(record)
+
+        if record.is_text:
+            self.text_file_paths.add(full_path)
+            self.total_tokens += self.active_tokens(record)
+            if self.keep_contents and record.content is not None:
+                self.file_contents[full_path] = record.content
+
+        # Cria o nó do arquivo
+        child_node = TreeNode(item_name, full_path, False, 
+                              size_bytes=record.size, 
+                              is_text=record.is_text, 
+                              token_count=self.active_tokens(record),
+                              selection_state=2 if record.is_text else 0)
+        if len(self.encoders) > 1:
+            child_node.token_counts = record.token_counts
+        if record.is_text:
+            child_node.digest = record.digest
+        
+        # --- Criação da Hierarquia (Relativa à nova root_path) ---
+        # Um único lookup pela pasta do arquivo; pastas intermediárias só são
+        # criadas (uma vez) quando a primeira entrada delas aparece.
+        parent_node = self.root_node if full_path == self.root_path else self._dir_node(os.path.dirname(full_path))
+        parent_node.add_child(child_node)
+        self.node_map[full_path] = child_node
+        self.search_index.add(child_node)
+        return child_node
+
+    def _track_snapshot(self, record: ScanRecord):
+        if record.estimated:
+            self.estimated_paths.add(record.path)
+            self.snapshot[record.path] = (ESTIMATED_MTIME, record.file_size)
+        else:
+            self.estimated_paths.discard(record.path)
+            self.snapshot[record.path] = (record.mtime_ns, record.file_size)
+
+    def active_tokens(self, record: ScanRecord) -> int:
+        """Contagem do encoder ativo (o registro pode ter sido gerado antes de uma troca de encoder)."""
+        if record.token_counts:
+            return record.token_counts.get(self.encoders[0], record.tokens)
+        return record.tokens
+
+    def _dir_node(self, dir_path: str) -> TreeNode:
+        """Nó do diretório dir_path, criando-o (e os ancestrais que faltam) sob a raiz."""
+        node = self.node_map.get(dir_path)
+        if node is not None:
+            return node
+        parent_path = os.path.dirname(dir_path)
+        if parent_path == dir_path or len(dir_path) <= len(self.root_path):
+            # Fora da raiz comum (não deveria ocorrer): pendura na raiz
+            return self.root_node
+        parent_node = self._dir_node(parent_path)
+        node = TreeNode(os.path.basename(dir_path), dir_path, True, selection_state=2)
+        parent_node.add_child(node)
+        self.node_map[dir_path] = node
+        self.created_dirs.append(node)
+        return node
+
+    def result(self, cache_stats: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        # Totais recursivos válidos desde o início: o rescan incremental só aplica deltas
+        self.root_node.calculate_recursive_tokens()
+        return {
+            'root_node': self.root_node,
+            'file_contents': self.file_contents,
+            'text_file_paths': self.text_file_paths,
+            'all_extensions': self.all_extensions,
+            'total_files': self.total_files,
+            'root_path': self.root_path, 
+            'node_map': self.node_map,
+            'cache_stats': cache_stats,
+            'scan_paths': self.scan_paths,
+            'snapshot': self.snapshot,
+            'keep_contents': self.keep_contents,
+            'profile': self.profile,
+            'encoders': self.encoders,
+            'estimated_paths': self.estimated_paths,
+            'estimators': self.estimators,
+            'dedup_hits': 0,
+            'duplicate_groups': None,
+            'search_index': self.search_index
+        }
+
+def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_callback: callable,
+                   token_workers: Optional[int] = None, use_cache: bool = True,
+                   record_callback: Optional[callable] = None, keep_contents: bool = True,
+                   encoders: Optional[List[str]] = None, estimate: bool = False,
+                   profile: Optional[ScanProfile] = None) -> Dict[str, Any]:
+    """
+    Escaneia múltiplos arquivos e diretórios (suporte a D&D e seleção múltipla),
+    tratando-os como um projeto composto. Consome iter_scan e monta a árvore.
+    token_workers: número de threads da contagem de tokens (None = DEFAULT_TOKEN_WORKERS).
+    use_cache: consulta/atualiza o cache persistente de contagens (core.cache).
+    Arquivos servidos pelo cache não são lidos, logo não aparecem em file_contents.
+    record_callback(record, builder): chamado a cada arquivo processado (atualização incremental da UI).
+    keep_contents=False: não retém file_contents (o conteúdo deve ser relido do disco com read_text_file).
+    encoders: chaves do registro (core.counter.ENCODERS) contadas na mesma leitura; o 1º fica ativo.
+    estimate=True: pré-passe rápido; só uma amostra por extensão é lida e o resto
+    é estimado pelo tamanho (results['estimated_paths'], banda em
+    estimate_error_band). Um rescan incremental (compute_rescan/apply_rescan)
+    substitui as estimativas pelas contagens exatas.
+    profile: regras de seleção/leitura (ScanProfile; None = as do app), mantidas pelo rescan.
+    """
+    unknown = [key for key in encoders or () if key not in ENCODERS]
+    if unknown:
+        raise ValueError(f"Encoder desconhecido: {', '.join(unknown)} (use {', '.join(ENCODERS)})")
+    profile = profile or DEFAULT_PROFILE
+    if not paths:
+        return {'root_node': None, 'file_contents': {}, 'text_file_paths': set(), 'all_extensions': set(), 'total_files': 0, 'root_path': "", 'node_map': {}, 'cache_stats': None,
+                'scan_paths': [], 'snapshot': {}, 'keep_contents': keep_contents, 'profile': profile,
+                'encoders': list(dict.fromkeys(encoders or [DEFAULT_ENCODER])),
+                'estimated_paths': set(), 'estimators': {}, 'dedup_hits': 0, 'duplicate_groups': None,
+                'search_index': SearchIndex()}
+
+    builder = ScanTreeBuilder(paths, keep_contents=keep_contents, encoders=encoders, profile=profile)
+    all_items = list(_walk_stats(paths, profile))
+    builder.total_files = len(all_items)
+
+    cache = TokenCache() if use_cache else None
+    # Conteúdos idênticos (cópias vendorizadas, snapshots de HTML) são tokenizados uma vez por scan
+    dedup = _DedupIndex()
+    try:
+        if estimate:
+            builder.estimators = {key: TokenEstimator() for key in builder.encoders}
+            records = _iter_estimated_records(all_items, builder.estimators, cancel_flag, progress_callback,
+                                              token_workers, cache, dedup, profile)
+        else:
+            records = _iter_records(all_items, cancel_flag, progress_callback, token_workers, cache, builder.encoders,
+                                    dedup, profile)
+        for record in records:
+            builder.add(record)
+            if record_callback:
+                record_callback(record, builder)
+    finally:
+        cache_stats = None
+        if cache:
+            cache.flush()
+            cache_stats = cache.stats()
+            cache.close()
+
+    results = builder.result(cache_stats)
+    results['dedup_hits'] = dedup.hits
+    return results
+
+
+# === RESCAN INCREMENTAL ===
+
+def take_snapshot(paths: List[str], profile: Optional[ScanProfile] = None) -> Dict[str, Tuple[int, int]]:
+    """Snapshot atual {caminho: (mtime_ns, tamanho)} dos arquivos sob as raízes (só stat)."""
+    return {path: (st.st_mtime_ns, st.st_size) for path, st in _walk_stats(paths, profile or DEFAULT_PROFILE)}
+
+def compute_rescan(results: Dict[str, Any], cancel_flag: Optional[threading.Event] = None,
+                   progress_callback: Optional[callable] = None, token_workers: Optional[int] = None,
+                   use_cache: bool = True) -> Dict[str, Any]:
+    """
+    1ª fase do rescan incremental (não altera a árvore; pode rodar em thread):
+    compara o snapshot (mtime_ns, tamanho) do último scan com um walk novo via
+    os.scandir e re-tokeniza apenas os arquivos novos ou alterados.
+    Retorna {'records': [ScanRecord], 'removed': [caminhos]} para apply_rescan.
+    """
+    if not results.get('root_node'):
+        return {'records': [], 'removed': []}
+
+    old_snapshot = results['snapshot']
+    profile = results['profile']
+    stats = dict(_walk_stats(results['scan_paths'], profile))
+    fresh = {path: (st.st_mtime_ns, st.st_size) for path, st in stats.items()}
+
+    to_process = [(path, stats[path]) for path, meta in fresh.items() if old_snapshot.get(path) != meta]
+    removed = [path for path in old_snapshot if path not in fresh]
+
+    records: List[ScanRecord] = []
+    if to_process:
+        cache = TokenCache() if use_cache else None
+        try:
+            records = list(_iter_records(to_process, cancel_flag, progress_callback, token_workers, cache, results['encoders'],
+                                         profile=profile))
         finally:
-            progress_callback(current_scanned_count, total_files, full_path)
+            if cache:
+                cache.close()
+
+        # Alterados que não puderam mais ser lidos saem da árvore
+        processed = {record.path for record in records}
+        if cancel_flag is None or not cancel_flag.is_set():
+            removed.extend(path for path, _ in to_process if path in old_snapshot and path not in processed)
+
+    return {'records': records, 'removed': removed}
+
+def apply_rescan(results: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, List[TreeNode]]:
+    """
+    2ª fase do rescan incremental (altera a árvore; rodar na thread dona dos dados):
+    atualiza/cria/remove nós e propaga a diferença de tokens (e da seleção) só
+    pelos ancestrais afetados, sem recalcular a árvore inteira. Retorna os nós afetados por tipo.
+    """
+    affected: Dict[str, List[TreeNode]] = {'added': [], 'changed': [], 'removed': [], 'created_dirs': [], 'pruned_dirs': []}
+    if not results.get('root_node'):
+        return affected
+
+    builder = ScanTreeBuilder.resume(results)
+    node_map = builder.node_map
+
+    # Remoções primeiro: um caminho que trocou de arquivo para pasta é recriado como diretório
+    for path in delta['removed']:
+        node = node_map.pop(path, None)
+        builder.snapshot.pop(path, None)
+        builder.estimated_paths.discard(path)
+        if node is None or node.is_dir:
+            continue
+        builder.file_contents.pop(path, None)
+        builder.text_file_paths.discard(path)
+        builder.search_index.remove(node)
+        builder.total_files -= 1
+
+        # Tira o arquivo dos totais (e da seleção) dos ancestrais
+        node.resolve_selection()
+        parent = node.parent
+        if parent is not None:
+            parent.propagate_totals(-node.total_recursive_tokens, -node.selected_tokens,
+                                    -node.text_file_count, -node.selected_file_count)
+            parent.children.remove(node)
+        affected['removed'].append(node)
+
+        # Remove diretórios que ficaram vazios (o scan só cria pastas com arquivos)
+        while parent is not None and parent is not builder.root_node and not parent.children:
+            grandparent = parent.parent
+            node_map.pop(parent.full_path, None)
+            if grandparent is not None:
+                grandparent.children.remove(parent)
+            affected['pruned_dirs'].append(parent)
+            parent = grandparent
+
+    for record in delta['records']:
+        node = node_map.get(record.path)
+
+        if node is None:
+            # Arquivos novos entram selecionados, como no scan: a seleção pendente da
+            # pasta existente mais próxima desce antes, para não sobrescrevê-los
+            anchor_path = os.path.dirname(record.path)
+            while anchor_path not in node_map and len(anchor_path) > len(builder.root_path):
+                anchor_path = os.path.dirname(anchor_path)
+            anchor = node_map.get(anchor_path, builder.root_node)
+            anchor.resolve_selection()
+            anchor.push_selection()
+            node = builder.add(record)
+            node.parent.propagate_totals(*node.refresh_file_totals())
+            builder.total_files += 1
+            affected['added'].append(node)
+            continue
+
+        node.resolve_selection()
+        if node.is_text != record.is_text:
+            node.selection_state = 2 if record.is_text else 0
+        node.size_bytes = record.size
+        node.is_text = record.is_text
+        node.token_count = builder.active_tokens(record)
+        if len(builder.encoders) > 1:
+            node.token_counts = record.token_counts
+        node.digest = record.digest if record.is_text else None
+        node.parent.propagate_totals(*node.refresh_file_totals())
+
+        builder.all_extensions.add(record.ext)
+        builder._track_snapshot(record)
+        if record.is_text:
+            builder.text_file_paths.add(record.path)
+        else:
+            builder.text_file_paths.discard(record.path)
+        if builder.keep_contents and record.content is not None:
+            builder.file_contents[record.path] = record.content
+        else:
+            builder.file_contents.pop(record.path, None)
+        builder.search_index.touch(node)
+        affected['changed'].append(node)
+
+    affected['created_dirs'] = builder.created_dirs
 
-    # 4. Contagem Inicial de Tokens
-    for path, content in file_contents.items():
+    results['total_files'] = builder.total_files
+    if delta['records'] or delta['removed']:
+        results['duplicate_groups'] = None
+    return affected
+
+def find_duplicate_groups(results: Dict[str, Any]) -> List[List[TreeNode]]:
+    """
+    Grupos de arquivos de texto com conteúdo idêntico (mesmo hash), do que mais
+    desperdiça tokens (cópias × tokens) ao que menos. Calculado sob demanda e
+    guardado em results['duplicate_groups'] até o próximo apply_rescan.
+    """
+    groups = results.get('duplicate_groups')
+    if groups is not None:
+        return groups
+    by_digest: Dict[str, List[TreeNode]] = {}
+    for node in results.get('node_map', {}).values():
+        # Arquivos vazios não desperdiçam contexto: ficam fora dos grupos
+        if not node.is_dir and node.is_text and node.digest is not None and node.size_bytes:
+            by_digest.setdefault(node.digest, []).append(node)
+    groups = [nodes for nodes in by_digest.values() if len(nodes) > 1]
+    for nodes in groups:
+        nodes.sort(key=lambda n: n.full_path)
+    groups.sort(key=lambda nodes: (len(nodes) - 1) * nodes[0].token_count, reverse=True)
+    results['duplicate_groups'] = groups
+    return groups
+
+def search_files(results: Dict[str, Any], term: str, field: str = 'name',
+                 is_stale: Optional[callable] = None) -> List[TreeNode]:
+    """
+    Busca arquivos do scan cujo nome, caminho ou conteúdo (field) contém term.
+    A busca de conteúdo nunca espera o índice de trigramas: sem ele (ainda em
+    montagem, ou numa busca avulsa da CLI) verifica todos os textos, lidos de
+    file_contents ou do disco (read_text_file). is_stale: ver SearchIndex.search.
+    """
+    index: Optional[SearchIndex] = results.get('search_index')
+    if index is None:
+        return []
+    get_text = (lambda node: _search_text(results, node)) if field == 'content' else None
+    return index.search(term, field, get_text, is_stale)
+
+def start_content_indexing(results: Dict[str, Any],
+                           cancel_flag: Optional[threading.Event] = None) -> Optional[threading.Thread]:
+    """
+    Monta o índice de trigramas do conteúdo numa thread em segundo plano (após
+    o scan); até terminar, search_files faz a busca linear. Retorna a thread
+    (None se o scan não tem índice).
+    """
+    index: Optional[SearchIndex] = results.get('search_index')
+    if index is None or index.has_content_index:
+        return None
+    thread = threading.Thread(target=index.build_content_index,
+                              args=(lambda node: _search_text(results, node), cancel_flag),
+                              daemon=True, name='content-index')
+    thread.start()
+    return thread
+
+def _search_text(results: Dict[str, Any], node: TreeNode) -> Optional[str]:
+    text = results['file_contents'].get(node.full_path)
+    if text is not None:
+        return text
+    try:
+        return read_text_file(node.full_path)
+    except OSError:
+        return None
+
+def estimate_error_band(results: Dict[str, Any]) -> int:
+    """
+    Banda de erro (~95%, em tokens) do total atual devida aos arquivos ainda
+    estimados. 0 quando todas as contagens são exatas.
+    """
+    estimated_paths = results.get('estimated_paths')
+    estimator = (results.get('estimators') or {}).get((results.get('encoders') or [None])[0])
+    if not estimated_paths or estimator is None:
+        return 0
+    by_ext: Dict[str, List[int]] = {}
+    node_map = results['node_map']
+    for path in estimated_paths:
         node = node_map.get(path)
-        if node and node.is_text:
-            tokens, _ = count_tokens(content)
-            node.token_count = tokens
-            
-    text_file_paths_set = {path for path in file_contents.keys() if node_map.get(path) and node_map.get(path).is_text}
-    
-    return {
-        'root_node': root_node,
-        'file_contents': file_contents,
-        'text_file_paths': text_file_paths_set,
-        'all_extensions': all_extensions,
-        'total_files': total_files,
-        'root_path': root_path, 
-        'node_map': node_map
-    }
\ No newline at end of file
+        if node is not None and node.is_text:
+            by_ext.setdefault(os.path.splitext(path)[1].lower(), []).append(node.token_count)
+    return estimator.error_band(by_ext)
+
+def set_active_encoder(results: Dict[str, Any], encoder_key: str) -> bool:
+    """
+    Troca o encoder ativo (token_count e totais) para outro já contado no scan,
+    sem reler nenhum arquivo. Retorna False se o encoder não fez parte do scan.
+    """
+    encoders = results.get('encoders') or []
+    if not results.get('root_node') or encoder_key not in encoders:
+        return False
+    if encoders[0] == encoder_key:
+        return True
+    for node in results['node_map'].values():
+        if not node.is_dir and node.token_counts is not None:
+            node.token_count = node.token_counts.get(encoder_key, 0)
+    # O ativo fica em 1º: rescans incrementais passam a gerar registros com a contagem dele
+    results['encoders'] = [encoder_key] + [key for key in encoders if key != encoder_key]
+    results['root_node'].calculate_recursive_tokens()
+    return True
+
+def rescan_incremental(results: Dict[str, Any], cancel_flag: Optional[threading.Event] = None,
+                       progress_callback: Optional[callable] = None, token_workers: Optional[int] = None,
+                       use_cache: bool = True) -> Dict[str, List[TreeNode]]:
+    """Atalho: compute_rescan + apply_rescan na mesma thread."""
+    delta = compute_rescan(results, cancel_flag, progress_callback, token_workers, use_cache)
+    return apply_rescan(results, delta)
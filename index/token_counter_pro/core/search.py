@@ -0,0 +1,278 @@
+import threading
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .tree import TreeNode
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+SEARCH_FIELDS = ('name', 'path', 'content')
+
+# Índice de conteúdo: arquivos maiores (ou além do orçamento total) não entram nos
+# trigramas e são sempre verificados direto no texto (busca linear, estilo grep)
+CONTENT_INDEX_MAX_FILE = 1 * 1024 * 1024
+CONTENT_INDEX_MAX_BYTES = 64 * 1024 * 1024
+# Trigramas extraídos em janelas: a montagem (em segundo plano) solta o GIL a cada poucos ms
+CONTENT_INDEX_WINDOW = 16 * 1024
+
+def _trigrams(text: str) -> Set[str]:
+    # zip de três fatias roda em C: ~1,6x mais rápido que fatiar por índice
+    return set(map(''.join, zip(text, text[1:], text[2:])))
+
+
+class SearchIndex:
+    """
+    Índice em memória dos arquivos de um scan para busca por substring.
+
+    - Nome e caminho: arrays em minúsculas concatenados num "blob" (uma linha
+      por arquivo) onde str.find roda em velocidade de C; o offset do acerto é
+      convertido em arquivo por bisect. Milissegundos em 100k arquivos.
+    - Conteúdo: índice de trigramas (trigrama -> ids de arquivos) montado em
+      segundo plano após o scan (scanner.start_content_indexing); os
+      candidatos da interseção são confirmados no texto, então o resultado é
+      sempre exato. Enquanto o índice não fica pronto, a busca é linear.
+
+    Alimentado pelo ScanTreeBuilder durante o scan e mantido pelo apply_rescan
+    (add/remove/touch). Ids são posições estáveis: arquivos removidos deixam
+    um buraco (None) até o próximo scan completo.
+    """
+    def __init__(self):
+        self.nodes: List[Optional[TreeNode]] = []
+        self.names_lower: List[str] = []
+        self.paths_lower: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._blobs: Dict[str, tuple] = {}  # campo -> (blob, offsets de início das linhas)
+        # Conteúdo: trigrama -> ids (listas crescentes); ids fora do índice são sempre verificados
+        self._content_postings: Optional[Dict[str, List[int]]] = None
+        self._unindexed: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- Manutenção ---
+
+    def add(self, node: TreeNode):
+        if node.full_path in self.ids:
+            self.touch(node)
+            return
+        with self._lock:
+            file_id = len(self.nodes)
+            self.ids[node.full_path] = file_id
+            self.nodes.append(node)
+            self.names_lower.append(node.name.lower())
+            self.paths_lower.append(node.full_path.lower())
+            self._blobs.clear()
+            self._unindexed.add(file_id)
+
+    def remove(self, node: TreeNode):
+        with self._lock:
+            file_id = self.ids.pop(node.full_path, None)
+            if file_id is None:
+                return
+            # Linha vazia no blob: não casa com nenhum termo (termos vazios não são buscados)
+            self.nodes[file_id] = None
+            self.names_lower[file_id] = ""
+            self.paths_lower[file_id] = ""
+            self._blobs.clear()
+            self._unindexed.discard(file_id)
+
+    def touch(self, node: TreeNode):
+        """Conteúdo do arquivo mudou: os trigramas antigos deixam de valer para ele."""
+        file_id = self.ids.get(node.full_path)
+        if file_id is not None:
+            with self._lock:
+                self._unindexed.add(file_id)
+
+    # --- Nome e caminho ---
+
+    def _blob(self, field: str):
+        cached = self._blobs.get(field)
+        if cached is not None:
+            return cached
+        values = self.names_lower if field == 'name' else self.paths_lower
+        starts = []
+        position = 0
+        for value in values:
+            starts.append(position)
+            position += len(value) + 1
+        # "\n" separa as linhas: nomes e caminhos não contêm quebra de linha
+        cached = ("\n".join(values), starts)
+        self._blobs[field] = cached
+        return cached
+
+    def _search_blob(self, term: str, field: str) -> List[int]:
+        if len(term) < 3:
+            # Termos curtos casam com boa parte dos arquivos: um teste por linha sai mais barato
+            values = self.names_lower if field == 'name' else self.paths_lower
+            return [i for i, value in enumerate(values) if term in value]
+        blob, starts = self._blob(field)
+        hits = []
+        position = blob.find(term)
+        while position != -1:
+            file_id = bisect_right(starts, position) - 1
+            hits.append(file_id)
+            # Um acerto por arquivo: continua a partir da próxima linha
+            if file_id + 1 >= len(starts):
+                break
+            position = blob.find(term, starts[file_id + 1])
+        return hits
+
+    # --- Conteúdo ---
+
+    @property
+    def has_content_index(self) -> bool:
+        return self._content_postings is not None
+
+    def build_content_index(self, get_text: Callable[[TreeNode], Optional[str]],
+                            cancel_flag: Optional[threading.Event] = None,
+                            max_bytes: int = CONTENT_INDEX_MAX_BYTES):
+        """Monta o índice de trigramas do conteúdo dos arquivos de texto (até max_bytes no total)."""
+        postings: Dict[str, List[int]] = {}
+        unindexed: Set[int] = set()
+        # Tudo é relido agora; o que for adicionado/alterado durante a montagem volta a ser marcado
+        with self._lock:
+            previous, self._unindexed = self._unindexed, set()
+        budget = max_bytes
+        for file_id, node in enumerate(self.nodes):
+            if node is None or not node.is_text:
+                continue
+            if cancel_flag is not None and cancel_flag.is_set():
+                # O índice anterior (se houver) continua valendo com as marcas de antes
+                with self._lock:
+                    self._unindexed |= previous
+                return
+            if node.size_bytes > CONTENT_INDEX_MAX_FILE or node.size_bytes > budget:
+                unindexed.add(file_id)
+                continue
+            text = get_text(node)
+            if text is None:
+                unindexed.add(file_id)
+                continue
+            budget -= node.size_bytes
+            text = text.lower()
+            grams: Set[str] = set()
+            for start in range(0, max(len(text) - 2, 1), CONTENT_INDEX_WINDOW):
+                grams |= _trigrams(text[start:start + CONTENT_INDEX_WINDOW + 2])
+            for gram in grams:
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = [file_id]
+                else:
+                    ids.append(file_id)
+        with self._lock:
+            self._unindexed |= unindexed
+            self._content_postings = postings
+
+    def _content_candidates(self, term: str) -> List[int]:
+        postings = self._content_postings
+        if postings is None or len(term) < 3:
+            return [i for i, node in enumerate(self.nodes) if node is not None and node.is_text]
+        lists = []
+        for gram in _trigrams(term):
+            ids = postings.get(gram)
+            if not ids:
+                lists = []
+                break
+            lists.append(ids)
+        candidates: Set[int] = set()
+        if lists:
+            lists.sort(key=len)
+            candidates = set(lists[0])
+            for ids in lists[1:]:
+                candidates.intersection_update(ids)
+                if not candidates:
+                    break
+        candidates.update(self._unindexed)
+        return sorted(candidates)
+
+    def _search_content(self, term: str, get_text: Callable[[TreeNode], Optional[str]],
+                        is_stale: Optional[Callable[[], bool]] = None) -> List[int]:
+        hits = []
+        for file_id in self._content_candidates(term):
+            if is_stale is not None and is_stale():
+                return []
+            node = self.nodes[file_id]
+            if node is None or not node.is_text:
+                continue
+            text = get_text(node)
+            if text is not None and term in text.lower():
+                hits.append(file_id)
+        return hits
+
+    # --- Consulta ---
+
+    def search(self, term: str, field: str = 'name',
+               get_text: Optional[Callable[[TreeNode], Optional[str]]] = None,
+               is_stale: Optional[Callable[[], bool]] = None) -> List[TreeNode]:
+        """
+        Arquivos cujo nome/caminho/conteúdo contém term (sem diferenciar
+        maiúsculas), na ordem do scan. Busca de conteúdo exige get_text(nó);
+        is_stale() interrompe a verificação dos candidatos (o resultado é descartado).
+        """
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Campo de busca desconhecido: {field!r} (use {', '.join(SEARCH_FIELDS)})")
+        term = term.lower()
+        if not term:
+            return [node for node in self.nodes if node is not None]
+        if field == 'content':
+            if get_text is None:
+                raise ValueError("A busca por conteúdo precisa de get_text")
+            ids = self._search_content(term, get_text, is_stale)
+        elif "\n" in term:
+            ids = []
+        else:
+            ids = self._search_blob(term, field)
+        return [self.nodes[i] for i in ids if self.nodes[i] is not None]
+
+
+class SearchWorker:
+    """
+    Thread única e reutilizável para buscas fora da thread da UI (mesmo modelo
+    do CountWorker): submit() substitui o pedido pendente e interrompe a busca
+    em andamento que ficou obsoleta. search(is_stale) faz a busca;
+    on_result(geração, resultado) é chamado na thread do worker só para o
+    pedido mais recente.
+    """
+    def __init__(self, on_result: Callable[[int, Any], None]):
+        self.on_result = on_result
+        self._cond = threading.Condition()
+        self._pending: Optional[Tuple[int, Callable[[Callable[[], bool]], Any]]] = None
+        self._generation = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name='search-worker')
+        self._thread.start()
+
+    def submit(self, search: Callable[[Callable[[], bool]], Any]) -> int:
+        """Agenda a busca; retorna a geração do pedido (compare com a de on_result)."""
+        with self._cond:
+            self._generation += 1
+            self._pending = (self._generation, search)
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self):
+        """Descarta o pedido pendente e o resultado da busca em andamento."""
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._generation += 1
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                generation, search = self._pending
+                self._pending = None
+
+            result = search(lambda: self._generation != generation)
+            if self._generation == generation:
+                self.on_result(generation, result)
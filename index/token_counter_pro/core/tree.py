@@ -1,28 +1,165 @@
-import os
-from typing import List, Dict, Any, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Arquivos nunca recebem filhos: compartilham esta sequência vazia em vez de uma lista por nó
+_NO_CHILDREN: Sequence['TreeNode'] = ()
 
 class TreeNode:
-    """Representa um arquivo ou diretório na estrutura do projeto."""
-    
-    def __init__(self, name: str, full_path: str, is_dir: bool, size_bytes: int = 0):
-        self.name: str = name
-        # Caminho completo (chave única para o arquivo/conteúdo)
-        self.full_path: str = full_path 
-        self.is_dir: bool = is_dir
-        self.size_bytes: int = size_bytes
-        self.children: List['TreeNode'] = []
+    """
+    Classe para representar um nó na estrutura de diretórios do projeto.
+    Usa __slots__ (sem __dict__ por instância): em árvores com centenas de
+    milhares de arquivos, o custo por nó cai para menos da metade.
+
+    Seleção: cada nó guarda, para a sua subárvore, os tokens e a quantidade de
+    arquivos de texto no total e selecionados. Marcar/desmarcar (set_selected)
+    aplica só deltas na cadeia de ancestrais, em O(profundidade); numa pasta, o
+    novo estado fica pendente (pending_selection) e desce para os filhos só
+    quando eles são lidos (push_selection / resolve_selection), então marcar
+    uma pasta de 10 mil arquivos não percorre a subárvore.
+    """
+    __slots__ = ('name', 'full_path', 'is_dir', 'size_bytes', 'is_text', 'token_count',
+                 'total_recursive_tokens', 'selection_state', 'children', 'parent', 'token_counts', 'digest',
+                 'selected_tokens', 'text_file_count', 'selected_file_count', 'pending_selection')
+
+    def __init__(self, name: str, full_path: str, is_dir: bool, size_bytes: int = 0, is_text: bool = False,
+                 token_count: int = 0, total_recursive_tokens: int = 0, selection_state: int = 0):
+        self.name = name
+        # Caminho completo (chave única para o arquivo/conteúdo; mesmo objeto str da chave do node_map)
+        self.full_path = full_path
+        self.is_dir = is_dir
+        self.size_bytes = size_bytes
+        self.is_text = is_text
+        self.token_count = token_count
+        self.total_recursive_tokens = total_recursive_tokens
+        self.selection_state = selection_state # 0: ignorado, 1: parcial, 2: selecionado
+        self.children: List['TreeNode'] = [] if is_dir else _NO_CHILDREN
         self.parent: Optional['TreeNode'] = None
-        
-        # --- NOVOS ATRIBUTOS DE ESTADO (Para seleção na UI) ---
-        # 0: Não selecionado, 1: Parcialmente selecionado, 2: Totalmente selecionado
-        self.selection_state: int = 0 
-        self.is_text: bool = False # Se o arquivo é texto ou binário/ignorado
-        self.tokens: int = 0
-        self.extension: str = ""
+        # {encoder: tokens} quando o scan contou vários encoders (None: só o ativo)
+        self.token_counts: Optional[Dict[str, int]] = None
+        # Hash do conteúdo (arquivos de texto): agrupa duplicatas (scanner.find_duplicate_groups)
+        self.digest: Optional[str] = None
+        # Agregados da seleção na subárvore (válidos após calculate_recursive_tokens)
+        self.selected_tokens = 0
+        self.text_file_count = 0
+        self.selected_file_count = 0
+        # Pastas: estado (0/2) ainda não repassado aos filhos (None: nada pendente)
+        self.pending_selection: Optional[int] = None
 
     def add_child(self, child: 'TreeNode'):
         self.children.append(child)
         child.parent = self
 
+    def calculate_recursive_tokens(self) -> int:
+        """Calcula e atualiza o total de tokens do nó e seus filhos (e os agregados da seleção)."""
+        self.push_selection()
+        if not self.is_dir:
+            self.refresh_file_totals()
+            return self.total_recursive_tokens
+        total_tokens = selected_tokens = text_files = selected_files = 0
+        for child in self.children:
+            total_tokens += child.calculate_recursive_tokens()
+            selected_tokens += child.selected_tokens
+            text_files += child.text_file_count
+            selected_files += child.selected_file_count
+        self.total_recursive_tokens = total_tokens
+        self.selected_tokens = selected_tokens
+        self.text_file_count = text_files
+        self.selected_file_count = selected_files
+        self.selection_state = self._derived_state()
+        return total_tokens
+
+    # --- Seleção ---
+
+    def _derived_state(self) -> int:
+        if self.selected_file_count == 0:
+            return 0
+        return 2 if self.selected_file_count == self.text_file_count else 1
+
+    def refresh_file_totals(self) -> Tuple[int, int, int, int]:
+        """
+        Arquivo: recalcula os próprios agregados a partir de token_count, is_text
+        e selection_state. Retorna os deltas (tokens, selecionados, arquivos,
+        arquivos selecionados) para propagate_totals no pai.
+        """
+        old = (self.total_recursive_tokens, self.selected_tokens, self.text_file_count, self.selected_file_count)
+        if not self.is_text:
+            self.selection_state = 0
+        selected = self.selection_state == 2
+        self.total_recursive_tokens = self.token_count if self.is_text else 0
+        self.text_file_count = 1 if self.is_text else 0
+        self.selected_file_count = 1 if selected else 0
+        self.selected_tokens = self.total_recursive_tokens if selected else 0
+        return (self.total_recursive_tokens - old[0], self.selected_tokens - old[1],
+                self.text_file_count - old[2], self.selected_file_count - old[3])
+
+    def propagate_totals(self, d_tokens: int, d_selected: int = 0, d_files: int = 0, d_selected_files: int = 0):
+        """Aplica deltas neste nó e nos ancestrais (O(profundidade)), atualizando o estado das pastas."""
+        if not (d_tokens or d_selected or d_files or d_selected_files):
+            return
+        node = self
+        while node is not None:
+            node.total_recursive_tokens += d_tokens
+            node.selected_tokens += d_selected
+            node.text_file_count += d_files
+            node.selected_file_count += d_selected_files
+            if node.is_dir:
+                node.selection_state = node._derived_state()
+            node = node.parent
+
+    def _assign_selection(self, state: int):
+        """Aplica um estado (0/2) herdado do pai; os totais do pai já o consideram."""
+        selected = state == 2
+        self.selected_tokens = self.total_recursive_tokens if selected else 0
+        self.selected_file_count = self.text_file_count if selected else 0
+        self.selection_state = self._derived_state()
+        if self.is_dir and self.children:
+            self.pending_selection = state
+
+    def push_selection(self):
+        """Repassa o estado pendente aos filhos diretos (O(filhos)); os netos ficam pendentes."""
+        state = self.pending_selection
+        if state is None:
+            return
+        self.pending_selection = None
+        for child in self.children:
+            child._assign_selection(state)
+
+    def resolve_selection(self):
+        """Garante que o estado deste nó está atualizado: desce os pendentes da raiz até ele."""
+        chain = []
+        node = self.parent
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        for node in reversed(chain):
+            node.push_selection()
+
+    def resolve_subtree_selection(self):
+        """Desce todos os estados pendentes da subárvore (antes de ler a seleção de todos os arquivos)."""
+        self.resolve_selection()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.push_selection()
+            stack.extend(child for child in node.children if child.is_dir)
+
+    def set_selected(self, selected: bool):
+        """
+        Marca (ou desmarca) o nó; numa pasta, a subárvore inteira. Atualiza os
+        totais e os estados (inclusive parcial) dos ancestrais em O(profundidade).
+        """
+        self.resolve_selection()
+        if not self.is_dir and not self.is_text:
+            return
+        d_selected = (self.total_recursive_tokens if selected else 0) - self.selected_tokens
+        d_selected_files = (self.text_file_count if selected else 0) - self.selected_file_count
+        self._assign_selection(2 if selected else 0)
+        if self.parent is not None:
+            self.parent.propagate_totals(0, d_selected, 0, d_selected_files)
+
+    def toggle_selection(self):
+        """Seleção total -> nenhuma; parcial ou nenhuma -> total."""
+        self.resolve_selection()
+        self.set_selected(self.selection_state != 2)
+
     def __repr__(self) -> str:
-        return f"TreeNode(name='{self.name}', path='{self.full_path}', dir={self.is_dir}, state={self.selection_state})"
\ No newline at end of file
+        return f"TreeNode(name='{self.name}', path='{self.full_path}', dir={self.is_dir}, state={self.selection_state})"
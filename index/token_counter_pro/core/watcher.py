@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .scanner import TreeNode, take_snapshot, compute_rescan, apply_rescan
+
+# === CONSTANTES DE CONFIGURAÇÃO ===
+
+DEFAULT_POLL_INTERVAL = 1.5   # Segundos entre verificações do snapshot
+DEFAULT_DEBOUNCE = 0.5        # Espera até o snapshot estabilizar (salvamentos em rajada)
+
+
+class DirectoryWatcher:
+    """
+    Modo de observação: verifica periodicamente as raízes escaneadas (polling de
+    stat via os.scandir, sem serviços ou dependências extras) e aplica rescans
+    incrementais com debounce.
+
+    A re-tokenização (compute_rescan) roda na thread do watcher; a alteração da
+    árvore (apply_rescan) e o on_update rodam via dispatch, que deve executar a
+    função na thread dona dos dados (ex: wx.CallAfter na GUI). O watcher espera
+    cada atualização ser aplicada antes de voltar a comparar o snapshot.
+    """
+    def __init__(self, results: Dict[str, Any], on_update: Callable[[Dict[str, List[TreeNode]]], None],
+                 dispatch: Optional[Callable[[Callable[[], None]], None]] = None,
+                 interval: float = DEFAULT_POLL_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+                 token_workers: Optional[int] = None, use_cache: bool = True):
+        self.results = results
+        self.on_update = on_update
+        self.dispatch = dispatch or (lambda func: func())
+        self.interval = interval
+        self.debounce = debounce
+        self.token_workers = token_workers
+        self.use_cache = use_cache
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running or not self.results.get('root_node'):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _changed(self) -> bool:
+        return take_snapshot(self.results['scan_paths'], self.results['profile']) != self.results['snapshot']
+
+    def _wait_until_stable(self):
+        """Debounce: aguarda dois snapshots consecutivos iguais."""
+        previous = take_snapshot(self.results['scan_paths'], self.results['profile'])
+        while not self._stop.wait(self.debounce):
+            current = take_snapshot(self.results['scan_paths'], self.results['profile'])
+            if current == previous:
+                return
+            previous = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._changed():
+                continue
+            self._wait_until_stable()
+            if self._stop.is_set():
+                return
+
+            delta = compute_rescan(self.results, self._stop, None, self.token_workers, self.use_cache)
+            if self._stop.is_set() or not (delta['records'] or delta['removed']):
+                continue
+
+            applied = threading.Event()
+
+            def apply():
+                try:
+                    if not self._stop.is_set():
+                        self.on_update(apply_rescan(self.results, delta))
+                finally:
+                    applied.set()
+
+            self.dispatch(apply)
+            while not applied.wait(0.2):
+                if self._stop.is_set():
+                    return
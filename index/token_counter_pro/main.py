@@ -1,24 +1,116 @@
-import wx
 import sys
 import os
+import argparse
 
 # Adiciona o diretório raiz do projeto ao path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from ui.frame import TokenCounterFrame
-from core import TIKTOKEN_AVAILABLE
+# O wx só é importado no modo GUI: os comandos de CLI rodam em servidores sem display
 
-class TokenCounterApp(wx.App):
-    def OnInit(self):
-        # Informações de ambiente no console
-        print(f"Ambiente: wxpython_version={wx.version()} tiktoken={'disponível' if TIKTOKEN_AVAILABLE else 'ausente'}")
-        
-        # Cria a janela principal
-        frame = TokenCounterFrame(None, title="Token Counter Pro (v2)")
-        self.SetTopWindow(frame)
-        return True
+def run_gui():
+    import wx
+    from ui.frame import TokenCounterFrame
+    from core import TIKTOKEN_AVAILABLE
+
+    class TokenCounterApp(wx.App):
+        def OnInit(self):
+            # Informações de ambiente no console
+            print(f"Ambiente: wxpython_version={wx.version()} tiktoken={'disponível' if TIKTOKEN_AVAILABLE else 'ausente'}")
+
+            # Cria a janela principal
+            frame = TokenCounterFrame(None, title="Token Counter Pro (v2)")
+            self.SetTopWindow(frame)
+            return True
 
-if __name__ == '__main__':
     app = TokenCounterApp(False)
     print("Iniciando no Modo GUI...")
-    app.MainLoop()
\ No newline at end of file
+    app.MainLoop()
+
+def build_parser() -> argparse.ArgumentParser:
+    from core.counter import ENCODERS
+    parser = argparse.ArgumentParser(description="Token Counter Pro: sem argumentos abre a GUI; com um comando roda em modo CLI (sem wx).")
+    commands = parser.add_subparsers(dest='command')
+
+    scan = commands.add_parser('scan', help="Escaneia arquivos/pastas e conta tokens.")
+    scan.add_argument('paths', nargs='+', help="Arquivos e/ou pastas do projeto.")
+    scan.add_argument('--format', choices=('text', 'ndjson', 'json'), default='text',
+                      help="text: árvore e resumo; ndjson: um registro por arquivo (em streaming) + resumo; json: documento único.")
+    scan.add_argument('--encoder', action='append', dest='encoders', choices=list(ENCODERS), metavar='CHAVE',
+                      help="Encoder do registro (repetível; o 1º é o principal).")
+    scan.add_argument('--workers', type=int, default=None, help="Threads de tokenização (1 = sequencial).")
+    scan.add_argument('--no-cache', action='store_true', help="Não usa o cache persistente de contagens.")
+    scan.add_argument('--estimate', action='store_true', help="(text) Mostra uma estimativa rápida antes da contagem exata.")
+    scan.add_argument('--watch', action='store_true', help="(text) Continua observando alterações.")
+
+    search = commands.add_parser('search', help="Procura arquivos por nome, caminho ou conteúdo.")
+    search.add_argument('path', help="Pasta do projeto.")
+    search.add_argument('term', help="Termo (substring, sem diferenciar maiúsculas).")
+    search.add_argument('--field', choices=('name', 'path', 'content'), default='name')
+    search.add_argument('--encoder', action='append', dest='encoders', choices=list(ENCODERS), metavar='CHAVE')
+    search.add_argument('--workers', type=int, default=None, help="Threads de tokenização (1 = sequencial).")
+    search.add_argument('--no-cache', action='store_true', help="Não usa o cache persistente de contagens.")
+
+    pack = commands.add_parser('pack', help="Junta os arquivos mais relevantes que cabem num orçamento de tokens.")
+    pack.add_argument('path', help="Pasta do projeto.")
+    pack.add_argument('--budget', type=int, required=True, help="Orçamento de tokens do pacote (cabeçalhos incluídos).")
+    pack.add_argument('-o', '--output', help="Arquivo de saída (padrão: saída padrão).")
+    pack.add_argument('--format', choices=('plain', 'markdown', 'xml'), default='plain')
+    pack.add_argument('--include', action='append', default=[], metavar='GLOB', help="Só arquivos que casam (repetível).")
+    pack.add_argument('--exclude', action='append', default=[], metavar='GLOB', help="Descarta arquivos que casam (repetível).")
+    pack.add_argument('--ext-weight', action='append', default=[], type=_extension_weight, metavar='.EXT=PESO',
+                      help="Peso de prioridade por extensão (repetível; 0 exclui).")
+    pack.add_argument('--recency-weight', type=float, default=1.0, help="Bônus dos arquivos modificados mais recentemente.")
+    pack.add_argument('--depth-weight', type=float, default=0.5, help="Penalidade por nível de pasta.")
+    pack.add_argument('--encoder', action='append', dest='encoders', choices=list(ENCODERS), metavar='CHAVE')
+    pack.add_argument('--workers', type=int, default=None, help="Threads de tokenização (1 = sequencial).")
+    pack.add_argument('--no-cache', action='store_true', help="Não usa o cache persistente de contagens.")
+
+    export = commands.add_parser('export', help="Exporta os arquivos de texto e a árvore num pacote Markdown/XML/texto.")
+    export.add_argument('path', help="Pasta do projeto.")
+    export.add_argument('-o', '--output', help="Arquivo de saída (padrão: saída padrão).")
+    export.add_argument('--format', choices=('markdown', 'xml', 'plain'), default='markdown')
+    export.add_argument('--no-tree', action='store_true', help="Não inclui a árvore ASCII no início.")
+    export.add_argument('--encoder', action='append', dest='encoders', choices=list(ENCODERS), metavar='CHAVE')
+    export.add_argument('--workers', type=int, default=None, help="Threads de tokenização (1 = sequencial).")
+    export.add_argument('--no-cache', action='store_true', help="Não usa o cache persistente de contagens.")
+    return parser
+
+def _extension_weight(value: str):
+    ext, sep, weight = value.partition('=')
+    try:
+        return ('.' + ext.lstrip('.').lower(), float(weight))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"use .EXT=PESO (ex: .py=2), não {value!r}")
+
+def run_cli(args: argparse.Namespace) -> int:
+    from cli import cli_scan_only, cli_scan_stream, cli_search, cli_pack, cli_export
+
+    if args.command == 'pack':
+        from core import PackRules
+        rules = PackRules(include=args.include, exclude=args.exclude, recency_weight=args.recency_weight,
+                          depth_weight=args.depth_weight, extension_weights=dict(args.ext_weight))
+        return cli_pack(args.path, args.budget, rules, args.output, encoders=args.encoders,
+                        token_workers=args.workers, use_cache=not args.no_cache, output_format=args.format)
+    if args.command == 'export':
+        return cli_export(args.path, args.output, args.format, include_tree=not args.no_tree, encoders=args.encoders,
+                          token_workers=args.workers, use_cache=not args.no_cache)
+    if args.command == 'search':
+        cli_search(args.path, args.term, args.field, encoders=args.encoders, token_workers=args.workers,
+                   use_cache=not args.no_cache)
+        return 0
+    if args.format == 'text':
+        if len(args.paths) > 1:
+            print("O formato text aceita uma pasta só; use --format ndjson/json para vários caminhos.", file=sys.stderr)
+            return 2
+        cli_scan_only(args.paths[0], watch=args.watch, encoders=args.encoders, estimate=args.estimate,
+                      token_workers=args.workers, use_cache=not args.no_cache)
+        return 0
+    return cli_scan_stream(args.paths, args.format, encoders=args.encoders, token_workers=args.workers,
+                           use_cache=not args.no_cache)
+
+if __name__ == '__main__':
+    arguments = build_parser().parse_args()
+    if arguments.command is None:
+        run_gui()
+    else:
+        sys.exit(run_cli(arguments))
@@ -2,10 +2,11 @@ import wx
 import threading
 import sys
 import os
+import time
 from typing import Optional, List # Importa List
 from .project_panel import ProjectPanel
 from .text_panel import TextPanel
-from core import scan_directory, get_encoder_info, count_tokens 
+from core import scan_directory, compute_rescan, apply_rescan, get_encoder_info, DirectoryWatcher, warm_up_encoder, start_content_indexing
 
 class TokenCounterFrame(wx.Frame):
     def __init__(self, parent, title):
@@ -13,6 +14,12 @@ class TokenCounterFrame(wx.Frame):
         super().__init__(parent, title=title, size=(1200, 800))
         self.scanner_thread: Optional[threading.Thread] = None
         self.cancel_flag = threading.Event()
+        self.watcher: Optional[DirectoryWatcher] = None
+        self.upgrade_thread: Optional[threading.Thread] = None
+        # Índice de conteúdo da busca (montado em segundo plano após cada scan)
+        self.index_cancel_flag = threading.Event()
+        self._scan_tokens = 0
+        self._last_progress_update = 0.0
         self.CreateStatusBar(2)
         self.SetStatusText(f"Encoder: {get_encoder_info()}", 1)
 
@@ -29,6 +36,13 @@ class TokenCounterFrame(wx.Frame):
         self.Center()
         self.Show(True)
 
+        # Carrega o encoder em segundo plano: a janela já está interativa
+        warm_up_encoder(lambda: wx.CallAfter(self._on_encoder_ready))
+
+    def _on_encoder_ready(self):
+        if self:
+            self.SetStatusText(f"Encoder: {get_encoder_info()}", 1)
+
 
     # --- Lógica de Scan (1ª Fase: Estrutura) ---
     # MUDANÇA: Aceita LISTA de paths
@@ -37,31 +51,128 @@ class TokenCounterFrame(wx.Frame):
         if self.scanner_thread and self.scanner_thread.is_alive():
             return
             
+        self.stop_watching()
+        self.stop_exact_upgrade()
+        self.stop_content_indexing()
         self.cancel_flag.clear()
+        self._scan_tokens = 0
+        self._last_progress_update = 0.0
         self.SetStatusText("Escaneando estrutura...", 0)
         self.project_panel.progress_bar.SetValue(0)
         self.project_panel.status_text.SetLabel("Iniciando varredura...")
         
+        keep_contents = not self.project_panel.low_memory_mode
+        encoders = self.project_panel.scan_encoders
+        estimate = self.project_panel.estimate_mode
+
         # MUDANÇA: Passa a lista de paths para a thread
         def run():
-            # scan_directory agora recebe a lista de caminhos
-            results = scan_directory(paths, self.cancel_flag, self._update_scan_progress) 
+            # scan_directory agora recebe a lista de caminhos e repassa cada arquivo processado
+            results = scan_directory(paths, self.cancel_flag, self._update_scan_progress,
+                                     record_callback=self._on_scan_record, keep_contents=keep_contents,
+                                     encoders=encoders, estimate=estimate) 
             wx.CallAfter(self._finish_scan, results)
             
         self.scanner_thread = threading.Thread(target=run, daemon=True)
         self.scanner_thread.start()
 
+    def _on_scan_record(self, record, builder):
+        """Recebe cada arquivo assim que é contado (thread do scanner)."""
+        self._scan_tokens = builder.total_tokens
+
     def _update_scan_progress(self, scanned: int, total: int, current_path: str):
-        """Atualiza a barra de progresso de forma thread-safe."""
+        """Atualiza a barra de progresso de forma thread-safe (no máximo ~20x por segundo)."""
         if self.cancel_flag.is_set(): return
+        now = time.monotonic()
+        if scanned < total and now - self._last_progress_update < 0.05:
+            return
+        self._last_progress_update = now
         if total > 0:
             percent = int((scanned / total) * 100)
             wx.CallAfter(self.project_panel.progress_bar.SetValue, percent)
-            wx.CallAfter(self.project_panel.status_text.SetLabel, f"Estrutura: {scanned}/{total} arquivos lidos. Atual: {os.path.basename(current_path)}")
+            wx.CallAfter(self.project_panel.status_text.SetLabel, f"Estrutura: {scanned}/{total} arquivos lidos | {self._scan_tokens:,} tokens. Atual: {os.path.basename(current_path)}")
 
     def _finish_scan(self, results):
         self.SetStatusText("Estrutura carregada e contagem inicial concluída.", 0)
         self.project_panel.handle_scan_result(results)
+        self.start_content_indexing(results)
+        if results.get('estimated_paths') and not self.cancel_flag.is_set():
+            self.start_exact_upgrade()
+        elif self.project_panel.chk_watch.GetValue():
+            self.start_watching()
+
+    # --- Índice de conteúdo da busca ---
+    def start_content_indexing(self, results):
+        """Monta os trigramas em segundo plano; até lá a busca por conteúdo é linear (nunca espera)."""
+        self.stop_content_indexing()
+        if results.get('root_node') and not self.cancel_flag.is_set():
+            start_content_indexing(results, self.index_cancel_flag)
+
+    def stop_content_indexing(self):
+        # Cada montagem tem o próprio flag: cancelar uma não afeta a próxima
+        self.index_cancel_flag.set()
+        self.index_cancel_flag = threading.Event()
+
+    # --- Modo Estimativa (contagem exata em segundo plano) ---
+    def start_exact_upgrade(self):
+        """Troca as estimativas do último scan pelas contagens exatas (rescan incremental em thread)."""
+        results = self.project_panel.scan_results
+        self.SetStatusText("Estimativa pronta; contando tokens exatos em segundo plano...", 0)
+
+        def run():
+            delta = compute_rescan(results, self.cancel_flag, self._update_upgrade_progress)
+            if not self.cancel_flag.is_set():
+                wx.CallAfter(self._finish_exact_upgrade, results, delta)
+
+        self.upgrade_thread = threading.Thread(target=run, daemon=True)
+        self.upgrade_thread.start()
+
+    def stop_exact_upgrade(self):
+        if self.upgrade_thread and self.upgrade_thread.is_alive():
+            self.cancel_flag.set()
+            self.upgrade_thread.join()
+        self.upgrade_thread = None
+
+    def _update_upgrade_progress(self, scanned: int, total: int, current_path: str):
+        if self.cancel_flag.is_set(): return
+        now = time.monotonic()
+        if scanned < total and now - self._last_progress_update < 0.05:
+            return
+        self._last_progress_update = now
+        if total > 0:
+            wx.CallAfter(self.project_panel.progress_bar.SetValue, int((scanned / total) * 100))
+
+    def _finish_exact_upgrade(self, results, delta):
+        if results is not self.project_panel.scan_results:
+            return
+        self.project_panel.apply_incremental_update(apply_rescan(results, delta))
+        self.project_panel.progress_bar.SetValue(0)
+        self.SetStatusText("Contagem exata concluída.", 0)
+        if self.project_panel.chk_watch.GetValue():
+            self.start_watching()
+
+    # --- Modo Observação (rescan incremental ao vivo) ---
+    def start_watching(self):
+        """Inicia o watcher sobre o último scan; as atualizações são aplicadas na thread da GUI."""
+        self.stop_watching()
+        results = self.project_panel.scan_results
+        if not results or not results.get('root_node'):
+            return
+        self.watcher = DirectoryWatcher(results, self.project_panel.apply_incremental_update, dispatch=wx.CallAfter)
+        self.watcher.start()
+        self.SetStatusText("Observando alterações no disco...", 0)
+
+    def stop_watching(self):
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+
+    def on_toggle_watch(self, event):
+        if event.IsChecked():
+            self.start_watching()
+        else:
+            self.stop_watching()
+            self.SetStatusText("Observação desativada.", 0)
 
     # --- Lógica de Contagem (2ª Fase: Processamento/Atualização) ---
     def start_token_counting(self, event):
@@ -75,8 +186,8 @@ class TokenCounterFrame(wx.Frame):
         self.SetStatusText("Recalculando totais de tokens selecionados...", 0)
         self.project_panel.status_text.SetLabel("Recalculando e sincronizando painéis...")
         
-        # Assume que o ProjectPanel tem um método recalculate_selected_totals, 
-        # embora não tenha sido totalmente implementado aqui, mantemos a chamada.
+        # Os agregados da seleção já são mantidos nos nós (TreeNode.set_selected):
+        # o painel só sincroniza os rótulos.
         if hasattr(self.project_panel, 'recalculate_selected_totals'):
             self.project_panel.recalculate_selected_totals() 
             
@@ -109,11 +220,14 @@ class TokenCounterFrame(wx.Frame):
             self.start_initial_scan(paths)
 
     def on_stop_scanning(self, event):
-        if self.scanner_thread and self.scanner_thread.is_alive():
+        if any(t and t.is_alive() for t in (self.scanner_thread, self.upgrade_thread)):
             self.cancel_flag.set()
             self.SetStatusText("Cancelando...", 0)
             self.project_panel.status_text.SetLabel("Processo Cancelado.")
 
     def on_clear_all(self, event):
+        self.stop_watching()
+        self.stop_exact_upgrade()
+        self.stop_content_indexing()
         self.SetStatusText("Projeto Limpo.", 0)
         self.project_panel.clear_all_project_data()
\ No newline at end of file
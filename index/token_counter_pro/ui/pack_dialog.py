@@ -0,0 +1,76 @@
+import re
+import wx
+from typing import Dict, List
+from core import PackRules
+
+DEFAULT_PACK_BUDGET = 100_000
+
+def _split_list(value: str) -> List[str]:
+    """Lista digitada com ';', ',' ou espaços."""
+    return [item for item in re.split(r'[;,\s]+', value.strip()) if item]
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """'.py=2 md=0.5' -> {'.py': 2.0, '.md': 0.5}; itens malformados são ignorados."""
+    weights = {}
+    for item in _split_list(value):
+        ext, _, weight = item.partition('=')
+        try:
+            weights['.' + ext.lstrip('.').lower()] = float(weight)
+        except ValueError:
+            continue
+    return weights
+
+
+class PackDialog(wx.Dialog):
+    """
+    Diálogo do empacotamento (core.packer): orçamento de tokens, filtros por
+    glob, pesos de prioridade e destino (arquivo ou área de transferência).
+    """
+    def __init__(self, parent, budget: int = DEFAULT_PACK_BUDGET):
+        super().__init__(parent, title="Empacotar Arquivos por Orçamento de Tokens")
+        grid = wx.FlexGridSizer(cols=2, vgap=5, hgap=8)
+        grid.AddGrowableCol(1)
+
+        self.spin_budget = wx.SpinCtrl(self, min=1, max=2_000_000_000, initial=budget)
+        self.txt_include = wx.TextCtrl(self)
+        self.txt_include.SetHint("ex: src/* *.py")
+        self.txt_exclude = wx.TextCtrl(self)
+        self.txt_exclude.SetHint("ex: *.lock tests/*")
+        self.txt_weights = wx.TextCtrl(self)
+        self.txt_weights.SetHint("ex: .py=2 .md=0.5 .json=0")
+        defaults = PackRules()
+        self.spin_recency = wx.SpinCtrlDouble(self, min=0, max=100, initial=defaults.recency_weight, inc=0.1)
+        self.spin_depth = wx.SpinCtrlDouble(self, min=0, max=100, initial=defaults.depth_weight, inc=0.1)
+
+        for label, control in (("Orçamento (tokens):", self.spin_budget),
+                               ("Incluir (globs):", self.txt_include),
+                               ("Excluir (globs):", self.txt_exclude),
+                               ("Pesos por extensão:", self.txt_weights),
+                               ("Peso da recência:", self.spin_recency),
+                               ("Penalidade por nível:", self.spin_depth)):
+            grid.Add(wx.StaticText(self, label=label), 0, wx.ALIGN_CENTER_VERTICAL)
+            grid.Add(control, 1, wx.EXPAND)
+
+        self.radio_target = wx.RadioBox(self, label="Destino", choices=["Arquivo", "Área de transferência"])
+
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        main_sizer.Add(grid, 0, wx.EXPAND | wx.ALL, 10)
+        main_sizer.Add(self.radio_target, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        main_sizer.Add(self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL), 0, wx.EXPAND | wx.ALL, 10)
+        self.SetSizerAndFit(main_sizer)
+        self.SetMinSize((420, -1))
+
+    @property
+    def budget(self) -> int:
+        return self.spin_budget.GetValue()
+
+    @property
+    def to_clipboard(self) -> bool:
+        return self.radio_target.GetSelection() == 1
+
+    def get_rules(self) -> PackRules:
+        return PackRules(include=_split_list(self.txt_include.GetValue()),
+                         exclude=_split_list(self.txt_exclude.GetValue()),
+                         recency_weight=self.spin_recency.GetValue(),
+                         depth_weight=self.spin_depth.GetValue(),
+                         extension_weights=_parse_weights(self.txt_weights.GetValue()))
@@ -1,9 +1,12 @@
 import wx
+import io
 import os
 import threading
-from typing import Optional, Dict, Any, TYPE_CHECKING, List, Tuple
-from core import natural_sort_key 
+import time
+from typing import Optional, Dict, Any, TYPE_CHECKING, List, Set, Tuple
+from core import natural_sort_key, read_text_file, AsciiTreeIndex, ContentLRU, list_encoders, set_active_encoder, get_encoder_info, estimate_error_band, find_duplicate_groups, search_files, SearchWorker, plan_pack, write_pack, export_to_file, iter_selected_files, iter_tree_lines, EXPORT_FORMATS, EXPORT_EXTENSIONS, DEFAULT_ENCODER
 from core.scanner import TreeNode 
+from .pack_dialog import PackDialog
 
 if TYPE_CHECKING:
     from .frame import TokenCounterFrame
@@ -11,6 +14,10 @@ if TYPE_CHECKING:
 # Constante para arquivos sem extensão (substitui o antigo IGNORED_EXT_KEY para esta função)
 NO_EXT_KEY = "<sem_extensão>" 
 
+# Campos da busca da aba de arquivos (core.search) e rótulos exibidos
+SEARCH_FIELD_CHOICES = [('name', "Nome"), ('path', "Caminho"), ('content', "Conteúdo")]
+MIN_CONTENT_TERM = 3  # Busca por conteúdo só a partir de 3 caracteres (um trigrama)
+
 # ----------------------------------------
 # Classes de Abas (Visualização e Análise)
 # ----------------------------------------
@@ -35,139 +42,108 @@ class ConsolidatedTreeTab(wx.Panel):
         self.text_output.SetForegroundColour(self.DEFAULT_FG_COLOR)
         
         self.highlight_range = (0, 0) 
+        self.highlight_path: Optional[str] = None
+        # Texto da árvore com o índice caminho -> (início, fim) de cada linha
+        self.index: Optional[AsciiTreeIndex] = None
         
         sizer.Add(self.text_output, 1, wx.EXPAND | wx.ALL, 0)
         self.SetSizer(sizer)
 
     def update_data(self, root_node: Optional[TreeNode]):
-        """Gera a árvore ASCII completa."""
-        self.text_output.Clear()
-        
+        """
+        Gera a árvore ASCII completa (core.ascii_tree) numa passada só e entrega
+        o texto ao controle com um único SetValue, sem um AppendText/repaint por linha.
+        O destaque atual, se o caminho ainda existir, é reaplicado.
+        """
         if not root_node:
+            self.index = None
+            self.highlight_path = None
             self.text_output.SetValue("Nenhum projeto carregado.")
             return
 
-        # 1. Cabeçalho (Raiz)
-        root_tokens_str = f"[ {root_node.total_recursive_tokens:>6,} tokens ]"
-        root_line = self._format_line(f"{os.path.basename(root_node.full_path)}:.", root_tokens_str)
-        self.text_output.AppendText(root_line + "\n")
-
-        # 2. Gera o corpo da árvore recursivamente
-        self._write_ascii_tree(root_node, prefix="")
+        self.index = AsciiTreeIndex(root_node)
+        self.text_output.Freeze()
+        try:
+            self.text_output.SetValue(self.index.text)
+        finally:
+            self.text_output.Thaw()
 
-        # Rola para o topo e reseta o destaque
-        self.text_output.ShowPosition(0)
+        # O SetValue já descartou os estilos: reaplica o destaque ou rola para o topo
         self.highlight_range = (0, 0)
+        if self.highlight_path and self.index.line_range(self.highlight_path):
+            self._apply_highlight(self.highlight_path)
+        else:
+            self.highlight_path = None
+            self.text_output.ShowPosition(0)
 
-    def _write_ascii_tree(self, node: TreeNode, prefix: str):
-        """Função recursiva para desenhar linhas no estilo tree /f."""
-        children = sorted(node.children, key=lambda n: (not n.is_dir, natural_sort_key(n.name)))
-        
-        count = len(children)
-        for i, child in enumerate(children):
-            is_last = (i == count - 1)
-            
-            t_val = child.total_recursive_tokens if child.is_dir else child.token_count
-            token_str = f"[ {t_val:>6,} tokens ]"
-
-            if child.is_dir:
-                connector = "\\---" if is_last else "+---"
-                tree_part = f"{prefix}{connector}{child.name}"
-                
-                line = self._format_line(tree_part, token_str)
-                self.text_output.AppendText(line + "\n")
-                
-                child_prefix = prefix + ("    " if is_last else "|   ")
-                self._write_ascii_tree(child, child_prefix)
-                
-            else:
-                # Arquivos
-                if node.parent is None:
-                    marker = "|   " if not is_last else "    "
-                    tree_part = f"{marker}{child.name}"
-                else:
-                    tree_part = f"{prefix}    {child.name}"
-                
-                # ADIÇÃO: Marca arquivos que foram ignorados na visualização da árvore
-                display_name = child.name
-                if not child.is_text:
-                    size_str = f"({child.size_bytes:,} bytes)"
-                    display_name = f"{child.name} [IGNORADO {size_str}]"
-
-
-                line = self._format_line(tree_part, token_str, name_override=display_name)
-                self.text_output.AppendText(line + "\n")
-
-    def _format_line(self, left_text: str, right_text: str, name_override: str = None) -> str:
-        """Cria uma linha com padding de espaços para alinhar os tokens à direita."""
-        TARGET_WIDTH = 100 
-        
-        if name_override:
-            original_name = os.path.basename(left_text.split()[-1])
-            temp_left_text = left_text.replace(original_name, name_override)
-            left_text = temp_left_text
+    def refresh_nodes(self, nodes: List[TreeNode]):
+        """
+        Atualização incremental: reescreve só as linhas dos nós informados
+        (arquivos alterados e suas pastas ancestrais) com Replace, mantendo o
+        índice de offsets válido. Mudanças estruturais usam update_data.
+        """
+        if not self.index:
+            return
+        edits = self.index.update_lines(nodes)
+        if not edits:
+            return
+        self.text_output.Freeze()
+        try:
+            for start, end, line in edits:
+                self.text_output.Replace(start, end, line)
+        finally:
+            self.text_output.Thaw()
+        self.highlight_range = (0, 0)
+        if self.highlight_path:
+            self._apply_highlight(self.highlight_path, scroll=False)
 
-        len_left = len(left_text)
-        len_right = len(right_text)
-        
-        padding_size = max(2, TARGET_WIDTH - len_left - len_right)
-        
-        padding = " " * padding_size
-        
-        return f"{left_text}{padding}{right_text}"
-        
     def select_path_in_tree(self, path: str, node_map: Dict[str, TreeNode]):
         """Remove o destaque anterior e aplica um novo para o path fornecido."""
-        node = node_map.get(path)
-        if not node: return
+        if path not in node_map: return
+        self._apply_highlight(path)
 
+    def _apply_highlight(self, path: str, scroll: bool = True):
+        """Destaca a linha do caminho: lookup O(1) no índice de offsets, sem busca no texto."""
         # 1. Remove o destaque anterior 
         if self.highlight_range[1] > self.highlight_range[0]:
             self.text_output.SetStyle(self.highlight_range[0], self.highlight_range[1], wx.TextAttr(self.DEFAULT_FG_COLOR, self.DEFAULT_BG_COLOR))
-        
-        # 2. Encontra o texto a ser procurado (Nome do item + Tag de Tokens)
-        if node.is_dir:
-            t_val = node.total_recursive_tokens
-        else:
-            t_val = node.token_count
-            
-        token_str = f"[ {t_val:>6,} tokens ]"
-        
-        # A busca precisa incluir a tag [IGNORADO] se o arquivo não for de texto
-        search_name = node.name
-        if not node.is_text and not node.is_dir:
-            search_name = f"{node.name} [IGNORADO ({node.size_bytes:,} bytes)]"
-        
-        search_target = f"{search_name}{token_str}" 
-        full_text = self.text_output.GetValue()
-        
-        # Encontra a posição do início da substring (nome+tokens)
-        content_start_pos = full_text.find(search_name)
-        
-        if content_start_pos == -1:
-            self.highlight_range = (0, 0) 
-            return 
 
-        # Encontra o início real da linha (depois do '\n' anterior)
-        line_start = full_text.rfind('\n', 0, content_start_pos) + 1
-        
-        # Encontra o fim da linha (próximo '\n' ou fim do texto)
-        line_end = full_text.find('\n', content_start_pos)
-        if line_end == -1: 
-            line_end = len(full_text)
-            
+        # 2. Posição exata da linha pelo full_path
+        line_range = self.index.line_range(path) if self.index else None
+        if line_range is None:
+            self.highlight_range = (0, 0)
+            self.highlight_path = None
+            return
+        line_start, line_end = line_range
+
         # 3. Aplica o novo destaque
-        self.highlight_range = (line_start, line_end)
+        self.highlight_range = line_range
+        self.highlight_path = path
         
         attr = wx.TextAttr(self.DEFAULT_FG_COLOR, self.HIGHLIGHT_BG_COLOR)
         self.text_output.SetStyle(line_start, line_end, attr)
         
         # 4. Rola para a posição
-        self.text_output.ShowPosition(line_start)
+        if scroll:
+            self.text_output.ShowPosition(line_start)
+
+
+class VirtualFileList(wx.ListCtrl):
+    """ListCtrl virtual (LC_VIRTUAL): as linhas não existem no controle; o texto é pedido sob demanda."""
+    def __init__(self, parent, tab: 'SelectedFilesTab'):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.BORDER_SUNKEN | wx.LC_HRULES | wx.LC_VRULES | wx.LC_SINGLE_SEL)
+        self.tab = tab
+
+    def OnGetItemText(self, item: int, column: int) -> str:
+        return self.tab.cell_text(item, column)
 
 
 class SelectedFilesTab(wx.Panel):
-    """Aba 2: Lista de Arquivos (Filtro e Detalhes) com ordenação por coluna. Inclui Ignorados por Extensão real."""
+    """
+    Aba 2: Lista de Arquivos (Filtro e Detalhes) com ordenação por coluna. Inclui Ignorados por Extensão real.
+    A lista é virtual: busca e ordenação só reconstroem o índice de linhas (self.view);
+    a ordem de cada coluna é calculada uma vez por conjunto de dados e reaproveitada.
+    """
     def __init__(self, parent, project_panel):
         super().__init__(parent)
         self.project_panel = project_panel
@@ -179,15 +155,25 @@ class SelectedFilesTab(wx.Panel):
         self.search_ctrl = wx.TextCtrl(self)
         self.search_ctrl.Bind(wx.EVT_TEXT, self.on_search)
         search_sizer.Add(self.search_ctrl, 1, wx.EXPAND)
+        self.choice_search_field = wx.Choice(self, choices=[label for _, label in SEARCH_FIELD_CHOICES])
+        self.choice_search_field.SetSelection(0)
+        self.choice_search_field.SetToolTip("Onde procurar o termo (a busca por conteúdo roda em segundo plano).")
+        self.choice_search_field.Bind(wx.EVT_CHOICE, self.on_search)
+        search_sizer.Add(self.choice_search_field, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
+        self.chk_duplicates = wx.CheckBox(self, label="Só duplicatas")
+        self.chk_duplicates.SetToolTip("Mostra apenas arquivos com conteúdo idêntico a outro (candidatos a sair do contexto).")
+        self.chk_duplicates.Bind(wx.EVT_CHECKBOX, self.on_search)
+        search_sizer.Add(self.chk_duplicates, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
         sizer.Add(search_sizer, 0, wx.EXPAND | wx.ALL, 5)
 
-        # ListCtrl com colunas 
-        self.list_ctrl = wx.ListCtrl(self, style=wx.LC_REPORT | wx.BORDER_SUNKEN | wx.LC_HRULES | wx.LC_VRULES | wx.LC_SINGLE_SEL) 
+        # ListCtrl virtual com colunas 
+        self.list_ctrl = VirtualFileList(self, self)
         
         self.list_ctrl.InsertColumn(0, "Nome do Arquivo", width=250)
         self.list_ctrl.InsertColumn(1, "Extensão", width=120) # Aumenta a largura para caber <sem_extensão>
         self.list_ctrl.InsertColumn(2, "Tokens / Status", width=150) 
-        self.list_ctrl.InsertColumn(3, "Caminho Completo", width=300)
+        self.list_ctrl.InsertColumn(3, "Cópias", width=70)
+        self.list_ctrl.InsertColumn(4, "Caminho Completo", width=300)
         
         sizer.Add(self.list_ctrl, 1, wx.EXPAND | wx.ALL, 5)
         
@@ -199,11 +185,26 @@ class SelectedFilesTab(wx.Panel):
         self.sort_column = 2 
         self.sort_ascending = False 
         self.all_nodes_cache: List[TreeNode] = []
+        self.total_proj_tokens = 0
         self.num_text_files = 0
         self.num_ignored_files = 0
+        # Caminho -> nº de cópias do conteúdo (só arquivos duplicados)
+        self.duplicate_counts: Dict[str, int] = {}
+        self.duplicate_groups: List[List[TreeNode]] = []
+
+        # Índices da lista virtual
+        self._sort_orders: Dict[Tuple[int, bool], List[int]] = {}  # (coluna, ascendente) -> índices ordenados
+        self._last_filter: Optional[Tuple[Tuple[int, bool], bool, str, str]] = None
+        self.view: List[int] = []  # Linha -> índice em all_nodes_cache
+
+        # Busca por conteúdo fora da thread da UI: só o resultado do último pedido é aplicado
+        self.search_worker = SearchWorker(self._on_content_hits)
+        self._content_request: Optional[Tuple[int, List[int], bool, bool, tuple]] = None
+        self.Bind(wx.EVT_WINDOW_DESTROY, self._on_destroy)
 
         self.list_ctrl.Bind(wx.EVT_LIST_COL_CLICK, self.on_col_click)
         self.list_ctrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.on_item_activated) 
+        self.list_ctrl.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_item_selected)
         
     def on_col_click(self, event: wx.ListEvent):
         """Lida com o clique no cabeçalho da coluna para ordenar."""
@@ -213,88 +214,169 @@ class SelectedFilesTab(wx.Panel):
             self.sort_ascending = not self.sort_ascending
         else:
             self.sort_column = col
-            self.sort_ascending = (col != 2)
+            self.sort_ascending = col not in (2, 3)
             
         self._refresh_list()
 
     def on_item_activated(self, event):
         """Dispara a prévia ao dar duplo clique/Enter no item da lista."""
         idx = event.GetIndex()
-        if idx >= 0 and idx < self.list_ctrl.GetItemCount():
-            path = self.current_map[idx]
+        if 0 <= idx < len(self.view):
+            path = self.all_nodes_cache[self.view[idx]].full_path
             self.project_panel.on_file_selected_for_preview(path)
 
-    def update_data(self, all_file_nodes: List[TreeNode], total_proj_tokens: int):
+    def on_item_selected(self, event):
+        """Mostra o arquivo selecionado na árvore lateral (expande só o caminho até ele)."""
+        idx = event.GetIndex()
+        if 0 <= idx < len(self.view):
+            self.project_panel.reveal_in_tree(self.all_nodes_cache[self.view[idx]].full_path)
+
+    def update_data(self, all_file_nodes: List[TreeNode], total_proj_tokens: int,
+                    duplicate_groups: Optional[List[List[TreeNode]]] = None):
         """Atualiza a lista com base no filtro de busca (Sincronização). Recebe todos os arquivos."""
         self.all_nodes_cache = all_file_nodes 
         self.total_proj_tokens = total_proj_tokens
+        self.duplicate_groups = duplicate_groups or []
+        self.duplicate_counts = {node.full_path: len(group) for group in self.duplicate_groups for node in group}
         
         self.num_text_files = sum(1 for n in all_file_nodes if n.is_text)
-        self.num_ignored_files = sum(1 for n in all_file_nodes if not n.is_text)
+        self.num_ignored_files = len(all_file_nodes) - self.num_text_files
+
+        # Dados novos: invalida as ordens e filtros em cache
+        self._sort_orders = {}
+        self._last_filter = None
         
         self._refresh_list()
+        self._update_total_label()
 
     def _get_ext_display(self, node: TreeNode) -> str:
         """Retorna a extensão ou a chave <sem_extensão>."""
         _, ext = os.path.splitext(node.name)
         return ext.lower() if ext else NO_EXT_KEY
 
-    def _refresh_list(self):
-        term = self.search_ctrl.GetValue().lower()
-        self.list_ctrl.Freeze()
-        self.list_ctrl.DeleteAllItems()
-        
-        displayed_nodes = []
-
-        for node in self.all_nodes_cache:
-            if term and term not in node.name.lower():
-                continue
-            displayed_nodes.append(node)
+    def _sort_order(self, column: int, ascending: bool) -> List[int]:
+        """Índices de all_nodes_cache ordenados pela coluna (calculado uma vez por coluna/sentido)."""
+        key = (column, ascending)
+        order = self._sort_orders.get(key)
+        if order is not None:
+            return order
 
-        # --- Lógica de Ordenação ---
         col_map = {
             0: lambda n: natural_sort_key(n.name),
             1: lambda n: self._get_ext_display(n), # Usa a extensão real
             # ORDENAÇÃO DE STATUS: Textos (contagem de tokens) primeiro, depois Ignorados (tamanho)
             2: lambda n: (0 if n.is_text else 1, n.token_count if n.is_text else n.size_bytes),                     
-            3: lambda n: n.full_path.lower(),               
+            3: lambda n: (self.duplicate_counts.get(n.full_path, 0), n.token_count),
+            4: lambda n: n.full_path.lower(),               
         }
-        
-        sort_key_func = col_map.get(self.sort_column)
+        nodes = self.all_nodes_cache
+        order = list(range(len(nodes)))
+        sort_key_func = col_map.get(column)
         if sort_key_func:
-            displayed_nodes.sort(key=sort_key_func, reverse=not self.sort_ascending)
-        
-        # --- Fim da Lógica de Ordenação ---
-
-        self.current_map = {} 
-        for i, node in enumerate(displayed_nodes):
-            
-            ext_display = self._get_ext_display(node)
+            keys = [sort_key_func(n) for n in nodes]
+            order.sort(key=keys.__getitem__, reverse=not ascending)
+        self._sort_orders[key] = order
+        return order
 
-            idx = self.list_ctrl.InsertItem(i, node.name) 
-            self.list_ctrl.SetItem(idx, 1, ext_display) # Exibe a extensão real ou <sem_extensão>
-            
-            # MUDANÇA: Exibe tokens OU status de ignorado/binário
+    def _refresh_list(self):
+        """Refaz só o índice de linhas (filtro + ordem em cache) e avisa o controle virtual."""
+        term = self.search_ctrl.GetValue().lower()
+        field = SEARCH_FIELD_CHOICES[max(0, self.choice_search_field.GetSelection())][0]
+        if field == 'content' and len(term) < MIN_CONTENT_TERM:
+            term = ""
+        only_duplicates = self.chk_duplicates.GetValue()
+        order_key = (self.sort_column, self.sort_ascending)
+        filter_key = (order_key, only_duplicates, term, field)
+
+        # Pedido novo: um resultado de conteúdo ainda em andamento fica obsoleto
+        self._content_request = None
+        self.search_worker.cancel()
+
+        # Digitação que só estende o termo anterior filtra o resultado anterior (menor)
+        last = self._last_filter
+        narrowing = (last is not None and last[0] == order_key and last[1] == only_duplicates
+                     and last[3] == field and term.startswith(last[2]))
+        candidates = self.view if narrowing else self._sort_order(*order_key)
+
+        results = self.project_panel.scan_results
+        hits = None
+        if term and results:
+            if field == 'content':
+                # Lê os textos: roda no SearchWorker e a lista atual fica até o resultado chegar
+                generation = self.search_worker.submit(
+                    lambda is_stale: set(search_files(results, term, field, is_stale)))
+                self._content_request = (generation, candidates, only_duplicates, narrowing, filter_key)
+                return
+            # Índice do scan (core.search): o custo não depende de testar cada nome
+            hits = set(search_files(results, term, field))
+        self._apply_view(candidates, hits, only_duplicates, narrowing, filter_key)
+
+    def _on_content_hits(self, generation: int, hits: Set[TreeNode]):
+        """Thread do SearchWorker: entrega o resultado à thread da UI."""
+        wx.CallAfter(self._apply_content_hits, generation, hits)
+
+    def _apply_content_hits(self, generation: int, hits: Set[TreeNode]):
+        if not self:
+            return
+        request = self._content_request
+        if request is None or request[0] != generation:
+            return
+        self._content_request = None
+        _, candidates, only_duplicates, narrowing, filter_key = request
+        self._apply_view(candidates, hits, only_duplicates, narrowing, filter_key)
+
+    def _apply_view(self, candidates: List[int], hits: Optional[Set[TreeNode]], only_duplicates: bool,
+                    narrowing: bool, filter_key: tuple):
+        nodes = self.all_nodes_cache
+        if hits is not None:
+            candidates = [i for i in candidates if nodes[i] in hits]
+        if only_duplicates and not narrowing:
+            candidates = [i for i in candidates if nodes[i].full_path in self.duplicate_counts]
+        # A view nunca é alterada no lugar: pode compartilhar a lista de ordem em cache
+        self.view = candidates
+        self._last_filter = filter_key
+
+        self.list_ctrl.SetItemCount(len(self.view))
+        self.list_ctrl.Refresh()
+
+    def _on_destroy(self, event):
+        if event.GetEventObject() is self:
+            self.search_worker.stop()
+        event.Skip()
+
+    def cell_text(self, row: int, column: int) -> str:
+        """Texto de uma célula (chamado pelo controle virtual só para as linhas visíveis)."""
+        if row >= len(self.view):
+            return ""
+        node = self.all_nodes_cache[self.view[row]]
+        if column == 0:
+            return node.name
+        if column == 1:
+            return self._get_ext_display(node) # Exibe a extensão real ou <sem_extensão>
+        if column == 2:
+            # Exibe tokens OU status de ignorado/binário
             if node.is_text:
-                token_display = f"{node.token_count:,}"
-                
-            else:
-                # Exibe o tamanho em bytes para arquivos ignorados/binários
-                size_str = f"({node.size_bytes:,} bytes)"
-                if node.size_bytes > 1024 * 1024:
-                    size_str = f"({(node.size_bytes / (1024 * 1024)):.2f} MB)"
-                token_display = f"IGNORADO {size_str}"
-                
-            self.list_ctrl.SetItem(idx, 2, token_display)
-            self.list_ctrl.SetItem(idx, 3, node.full_path)
-            self.current_map[i] = node.full_path
-
-        self.list_ctrl.Thaw()
-        
+                return f"{node.token_count:,}"
+            # Exibe o tamanho em bytes para arquivos ignorados/binários
+            size_str = f"({node.size_bytes:,} bytes)"
+            if node.size_bytes > 1024 * 1024:
+                size_str = f"({(node.size_bytes / (1024 * 1024)):.2f} MB)"
+            return f"IGNORADO {size_str}"
+        if column == 3:
+            copies = self.duplicate_counts.get(node.full_path)
+            return f"{copies}×" if copies else ""
+        return node.full_path
+
+    def _update_total_label(self):
         # Atualiza o label com as contagens
         total_files = len(self.all_nodes_cache)
         total_tokens = self.total_proj_tokens
-        self.lbl_total.SetLabel(f"Total Arquivos: {total_files:,} ({self.num_text_files:,} Texto + {self.num_ignored_files:,} Ignorados) | Total Tokens: {total_tokens:,}")
+        label = f"Total Arquivos: {total_files:,} ({self.num_text_files:,} Texto + {self.num_ignored_files:,} Ignorados) | Total Tokens: {total_tokens:,}"
+        if self.duplicate_groups:
+            # Tokens economizáveis mantendo uma cópia de cada conteúdo
+            wasted = sum((len(group) - 1) * group[0].token_count for group in self.duplicate_groups)
+            label += f" | Duplicatas: {len(self.duplicate_counts):,} arquivos em {len(self.duplicate_groups):,} grupos ({wasted:,} tokens repetidos)"
+        self.lbl_total.SetLabel(label)
 
     def on_search(self, event):
         self._refresh_list()
@@ -448,10 +530,18 @@ class ProjectPanel(wx.Panel):
         self.root_path: Optional[str] = None
         self.root_node: Optional[TreeNode] = None
         self.file_contents: Dict[str, str] = {} 
+        # Conteúdos relidos do disco sob demanda (modo de baixa memória / arquivos vindos do cache)
+        self.content_lru = ContentLRU()
         self.node_map: Dict[str, TreeNode] = {} 
         self.all_files: List[TreeNode] = [] 
         self.all_text_files: List[TreeNode] = [] 
         self.extension_map: Dict[str, List[TreeNode]] = {} 
+        # Resultado completo do último scan (snapshot usado pelo modo observação)
+        self.scan_results: Optional[Dict[str, Any]] = None
+        # Itens já criados na árvore lateral (a árvore é populada sob demanda, ao expandir)
+        self.tree_items: Dict[str, wx.TreeItemId] = {}
+        self.populated_dirs: Set[str] = set()
+        self._revealing = False
         
         self._setup_ui()
         self._setup_bindings()
@@ -469,15 +559,50 @@ class ProjectPanel(wx.Panel):
         # O botão agora deve disparar um diálogo que suporta MULTI-SELEÇÃO de arquivos/pastas (a ser implementado em frame.py)
         self.btn_open = wx.Button(left_panel, label="Abrir Arquivo(s)/Pasta") 
         self.btn_clear = wx.Button(left_panel, label="Limpar")
+        self.btn_pack = wx.Button(left_panel, label="Empacotar...")
+        self.btn_pack.SetToolTip("Junta os arquivos mais relevantes que cabem num orçamento de tokens.")
         btn_sizer.Add(self.btn_open, 1, wx.RIGHT, 2)
+        self.btn_export = wx.Button(left_panel, label="Exportar...")
+        self.btn_export.SetToolTip("Exporta a árvore e os arquivos selecionados em Markdown, XML ou texto.")
+        btn_sizer.Add(self.btn_pack, 0, wx.RIGHT, 2)
+        btn_sizer.Add(self.btn_export, 0, wx.RIGHT, 2)
         btn_sizer.Add(self.btn_clear, 0)
         left_sizer.Add(btn_sizer, 0, wx.EXPAND | wx.ALL, 5)
+
+        self.chk_low_memory = wx.CheckBox(left_panel, label="Baixa memória (não manter conteúdos)")
+        self.chk_low_memory.SetToolTip("Guarda apenas contagens e metadados; a prévia relê o arquivo do disco.")
+        left_sizer.Add(self.chk_low_memory, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+
+        self.chk_watch = wx.CheckBox(left_panel, label="Observar alterações (ao vivo)")
+        self.chk_watch.SetToolTip("Recontagem incremental automática dos arquivos alterados no disco.")
+        left_sizer.Add(self.chk_watch, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+
+        self.chk_estimate = wx.CheckBox(left_panel, label="Estimativa rápida (contagem exata em segundo plano)")
+        self.chk_estimate.SetToolTip("Conta uma amostra por extensão e estima o resto pelo tamanho; os totais exatos chegam depois.")
+        left_sizer.Add(self.chk_estimate, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+
+        # Modelo / encoder ativo (registro em core.counter)
+        model_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.encoder_keys = [key for key, _ in list_encoders()]
+        self.choice_encoder = wx.Choice(left_panel, choices=[label for _, label in list_encoders()])
+        self.choice_encoder.SetSelection(self.encoder_keys.index(DEFAULT_ENCODER))
+        model_sizer.Add(wx.StaticText(left_panel, label="Modelo:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        model_sizer.Add(self.choice_encoder, 1)
+        left_sizer.Add(model_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+
+        self.chk_all_encoders = wx.CheckBox(left_panel, label="Contar todos os modelos (troca instantânea)")
+        self.chk_all_encoders.SetToolTip("Conta todos os encoders na mesma leitura; trocar de modelo não exige novo scan.")
+        left_sizer.Add(self.chk_all_encoders, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
         
         self.tree_ctrl = wx.TreeCtrl(left_panel, style=wx.TR_DEFAULT_STYLE | wx.TR_HAS_BUTTONS | wx.TR_LINES_AT_ROOT) 
         self.tree_ctrl.SetBackgroundColour(wx.Colour(30, 30, 30))
         self.tree_ctrl.SetForegroundColour(wx.Colour(220, 220, 220))
+        # Caixas de seleção como imagens de estado: índice = selection_state (0, 1 parcial, 2)
+        self.tree_ctrl.AssignStateImageList(self._make_check_images())
         
         left_sizer.Add(self.tree_ctrl, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+        self.lbl_selected = wx.StaticText(left_panel, label="Selecionados: 0 tokens")
+        left_sizer.Add(self.lbl_selected, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 5)
         
         # Status
         self.progress_bar = wx.Gauge(left_panel, range=100, style=wx.GA_HORIZONTAL)
@@ -516,8 +641,15 @@ class ProjectPanel(wx.Panel):
         # self.frame.on_open_folder (frame.py) agora deve lidar com a abertura multi-seleção
         self.btn_open.Bind(wx.EVT_BUTTON, self.frame.on_open_folder) 
         self.btn_clear.Bind(wx.EVT_BUTTON, self.frame.on_clear_all)
+        self.btn_pack.Bind(wx.EVT_BUTTON, self.on_pack)
+        self.btn_export.Bind(wx.EVT_BUTTON, self.on_export)
+        self.tree_ctrl.Bind(wx.EVT_LEFT_DOWN, self.on_tree_left_down)
+        self.tree_ctrl.Bind(wx.EVT_TREE_KEY_DOWN, self.on_tree_key_down)
+        self.chk_watch.Bind(wx.EVT_CHECKBOX, self.frame.on_toggle_watch)
+        self.choice_encoder.Bind(wx.EVT_CHOICE, self.on_encoder_changed)
         
         self.tree_ctrl.Bind(wx.EVT_TREE_SEL_CHANGED, self.on_tree_selection_changed)
+        self.tree_ctrl.Bind(wx.EVT_TREE_ITEM_EXPANDING, self.on_tree_item_expanding)
 
     def on_drop_path(self, paths: List[str]):
         """Lida com a entrada de caminhos múltiplos (arquivos e/ou pastas) por drag and drop."""
@@ -531,7 +663,7 @@ class ProjectPanel(wx.Panel):
         Ação: Mudar para a aba Resumo da Árvore e destacar o item selecionado.
         """
         item = event.GetItem()
-        if item.IsOk():
+        if item.IsOk() and not self._revealing:
             path = self.tree_ctrl.GetItemData(item)
             
             self.notebook.SetSelection(0) 
@@ -556,10 +688,166 @@ class ProjectPanel(wx.Panel):
 
     def _load_preview_async(self, path: str, tokens: int):
         """Função rodando em thread para carregar e truncar o preview de arquivos grandes."""
-        content = self.file_contents.get(path, "") 
+        content = self.get_file_content(path)
         
         wx.CallAfter(self.tab_prev.update_preview_content, path, content, tokens)
 
+    def get_file_content(self, path: str) -> str:
+        """
+        Conteúdo de um arquivo de texto do projeto. Usa file_contents quando o scan
+        reteve o texto; caso contrário relê do disco (com LRU dos recentes).
+        """
+        content = self.file_contents.get(path)
+        if content is not None:
+            return content
+        try:
+            return self.content_lru.get(path, read_text_file)
+        except (OSError, UnicodeDecodeError):
+            return ""
+
+    @property
+    def low_memory_mode(self) -> bool:
+        return self.chk_low_memory.GetValue()
+
+    @property
+    def estimate_mode(self) -> bool:
+        return self.chk_estimate.GetValue()
+
+    def _total_label(self) -> str:
+        """Total de tokens do projeto; com arquivos ainda estimados, mostra ~total ± banda de erro."""
+        total = self.root_node.total_recursive_tokens
+        band = estimate_error_band(self.scan_results) if self.scan_results else 0
+        if band or (self.scan_results and self.scan_results.get('estimated_paths')):
+            return f"~{total:,} ± {band:,} tokens (estimativa)"
+        return f"{total:,} tokens"
+
+    @property
+    def active_encoder(self) -> str:
+        return self.encoder_keys[self.choice_encoder.GetSelection()]
+
+    @property
+    def scan_encoders(self) -> List[str]:
+        """Encoders contados no próximo scan (o ativo primeiro)."""
+        active = self.active_encoder
+        if not self.chk_all_encoders.GetValue():
+            return [active]
+        return [active] + [key for key in self.encoder_keys if key != active]
+
+    def on_encoder_changed(self, event):
+        """Troca o modelo ativo: instantâneo se o scan já contou esse encoder; senão refaz o scan."""
+        key = self.active_encoder
+        self.frame.SetStatusText(f"Encoder: {get_encoder_info(key)}", 1)
+        self.frame.text_panel.on_text_change(None)
+        if not self.scan_results or not self.root_node:
+            return
+        if set_active_encoder(self.scan_results, key):
+            self._refresh_views(self.root_node.total_recursive_tokens)
+            self.recalculate_selected_totals()
+            self.status_text.SetLabel(f"Modelo alterado. Total: {self._total_label()}.")
+        else:
+            self.frame.start_initial_scan(self.scan_results['scan_paths'])
+
+    # --- Empacotamento por orçamento de tokens ---
+
+    def on_pack(self, event):
+        """Escolhe os arquivos que cabem no orçamento (core.plan_pack) e envia o pacote ao arquivo ou à área de transferência."""
+        if not self.scan_results or not self.root_node:
+            self.status_text.SetLabel("Abra um projeto antes de empacotar.")
+            return
+        dlg = PackDialog(self)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        budget, rules, to_clipboard = dlg.budget, dlg.get_rules(), dlg.to_clipboard
+        dlg.Destroy()
+
+        plan = plan_pack(self.scan_results, budget, rules, self.active_encoder)
+        if not plan.items:
+            self.status_text.SetLabel(f"Nenhum arquivo cabe em {budget:,} tokens com esses filtros.")
+            return
+        summary = f"{len(plan.items):,} de {plan.candidates:,} arquivo(s), {plan.total_tokens:,} / {budget:,} tokens"
+
+        if to_clipboard:
+            # O orçamento limita o tamanho do texto que vai para a área de transferência
+            buffer = io.StringIO()
+            write_pack(plan, buffer)
+            if wx.TheClipboard.Open():
+                wx.TheClipboard.SetData(wx.TextDataObject(buffer.getvalue()))
+                wx.TheClipboard.Close()
+                self.status_text.SetLabel(f"Pacote copiado: {summary}.")
+            else:
+                self.status_text.SetLabel("Não foi possível abrir a área de transferência.")
+            return
+
+        with wx.FileDialog(self, "Salvar pacote", defaultFile="pacote.txt", wildcard="Texto (*.txt)|*.txt|Todos (*.*)|*.*",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as save_dlg:
+            if save_dlg.ShowModal() != wx.ID_OK:
+                return
+            output = save_dlg.GetPath()
+        self.status_text.SetLabel(f"Empacotando {summary}...")
+        threading.Thread(target=self._write_pack_async, args=(plan, output, summary), daemon=True).start()
+
+    def _write_pack_async(self, plan, output: str, summary: str):
+        """Escreve o pacote em thread, um arquivo por vez (sem montar o texto inteiro em memória)."""
+        try:
+            with open(output, 'w', encoding='utf-8', newline='') as f:
+                write_pack(plan, f, progress_callback=self._export_progress_callback("Empacotando"))
+            message = f"Pacote salvo em {output}: {summary}."
+        except OSError as e:
+            message = f"Erro ao salvar o pacote: {e}"
+        wx.CallAfter(self.progress_bar.SetValue, 0)
+        wx.CallAfter(self.status_text.SetLabel, message)
+
+    def _export_progress_callback(self, action: str):
+        """Progresso de escrita (feitos, total, tokens, caminho) repassado à UI no máximo a cada 100 ms."""
+        last_update = [0.0]
+
+        def progress(done, total, tokens, path):
+            now = time.perf_counter()
+            if now - last_update[0] < 0.1 and done < total:
+                return
+            last_update[0] = now
+            wx.CallAfter(self.progress_bar.SetValue, int(done * 100 / total))
+            wx.CallAfter(self.status_text.SetLabel, f"{action}... {done:,}/{total:,} arquivos | {tokens:,} tokens")
+        return progress
+
+    # --- Exportação (árvore + arquivos selecionados) ---
+
+    def on_export(self, event):
+        """Exporta a árvore ASCII e os arquivos de texto selecionados (core.exporter) em Markdown, XML ou texto."""
+        if not self.root_node:
+            self.status_text.SetLabel("Abra um projeto antes de exportar.")
+            return
+        wildcard = "Markdown (*.md)|*.md|XML (*.xml)|*.xml|Texto (*.txt)|*.txt"
+        with wx.FileDialog(self, "Exportar projeto", defaultFile=os.path.basename(self.root_node.full_path) + ".md",
+                           wildcard=wildcard, style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as save_dlg:
+            if save_dlg.ShowModal() != wx.ID_OK:
+                return
+            output = save_dlg.GetPath()
+            fmt = EXPORT_FORMATS[save_dlg.GetFilterIndex()]
+        if not os.path.splitext(output)[1]:
+            output += EXPORT_EXTENSIONS[fmt]
+        self.btn_export.Disable()
+        self.status_text.SetLabel(f"Exportando para {output}...")
+        # Seleção e árvore são lidas aqui (thread da UI): o watcher e os cliques alteram os nós
+        files = list(iter_selected_files(self.root_node))
+        tree_lines = list(iter_tree_lines(self.root_node))
+        threading.Thread(target=self._export_async, args=(output, fmt, self.root_node, files, tree_lines), daemon=True).start()
+
+    def _export_async(self, output: str, fmt: str, root_node: TreeNode, files: List[TreeNode], tree_lines: List[str]):
+        """Roda a exportação em thread: os arquivos são copiados do disco em blocos (memória constante)."""
+        try:
+            stats = export_to_file(output, root_node, files=files, fmt=fmt, tree_lines=tree_lines,
+                                   encoder_key=self.active_encoder,
+                                   progress_callback=self._export_progress_callback("Exportando"))
+            message = (f"Exportados {stats.files:,} arquivo(s), {stats.tokens:,} tokens, "
+                       f"em {stats.elapsed_s:.1f} s para {output}.")
+        except OSError as e:
+            message = f"Erro ao exportar: {e}"
+        wx.CallAfter(self.progress_bar.SetValue, 0)
+        wx.CallAfter(self.status_text.SetLabel, message)
+        wx.CallAfter(self.btn_export.Enable)
+
     # --- Inicialização e Atualização de Dados ---
 
     def handle_scan_result(self, results: Dict[str, Any]):
@@ -567,9 +855,11 @@ class ProjectPanel(wx.Panel):
         Processa o resultado do scan e calcula os totais (Sincronização).
         MUDANÇA: Usa a extensão real ou NO_EXT_KEY para agrupamento, sem o [IGNORADO] global.
         """
+        self.scan_results = results
         self.root_path = results['root_path']
         self.root_node = results['root_node']
         self.file_contents = results['file_contents']
+        self.content_lru.clear()
         self.node_map = results['node_map']
         
         self.all_files = [] 
@@ -579,30 +869,285 @@ class ProjectPanel(wx.Panel):
         # Mapeia arquivos e extensões
         for path, node in self.node_map.items():
             if node.is_dir: continue 
-
-            self.all_files.append(node)
-            
-            file_name, ext = os.path.splitext(node.name)
-            ext = ext.lower()
-            
-            # NOVO: Usa a extensão real, ou <sem_extensão>
-            map_key = ext if ext else NO_EXT_KEY 
-
-            if map_key not in self.extension_map: self.extension_map[map_key] = []
-            self.extension_map[map_key].append(node)
-
-            if node.is_text: 
-                self.all_text_files.append(node)
+            self._register_file_node(node)
         
         self.build_visual_tree()
         self.update_all_views()
+        self.recalculate_selected_totals()
         
         self.progress_bar.SetValue(0)
-        self.status_text.SetLabel(f"Pronto. Projeto com {len(self.all_files):,} arquivos ({len(self.all_text_files):,} de texto).")
+        if results.get('estimated_paths'):
+            self.status_text.SetLabel(f"Estimativa: {self._total_label()}. Contando tokens exatos em segundo plano...")
+        else:
+            self.status_text.SetLabel(f"Pronto. Projeto com {len(self.all_files):,} arquivos ({len(self.all_text_files):,} de texto).")
+
+    def _register_file_node(self, node: TreeNode):
+        """Inclui um arquivo nas listas auxiliares (todos, texto, por extensão)."""
+        self.all_files.append(node)
+        
+        file_name, ext = os.path.splitext(node.name)
+        ext = ext.lower()
+        
+        # NOVO: Usa a extensão real, ou <sem_extensão>
+        map_key = ext if ext else NO_EXT_KEY 
+
+        if map_key not in self.extension_map: self.extension_map[map_key] = []
+        self.extension_map[map_key].append(node)
+
+        if node.is_text: 
+            self.all_text_files.append(node)
+
+    def _unregister_file_node(self, node: TreeNode):
+        """Remove um arquivo das listas auxiliares."""
+        _, ext = os.path.splitext(node.name)
+        map_key = ext.lower() if ext else NO_EXT_KEY
+        for nodes in (self.all_files, self.all_text_files, self.extension_map.get(map_key, [])):
+            if node in nodes:
+                nodes.remove(node)
+        if map_key in self.extension_map and not self.extension_map[map_key]:
+            del self.extension_map[map_key]
+
+    def apply_incremental_update(self, affected: Dict[str, List[TreeNode]]):
+        """
+        Aplica o resultado de um rescan incremental (core.apply_rescan) sem
+        reconstruir a árvore lateral: só os itens afetados são criados,
+        renomeados ou removidos; os totais já chegam atualizados pelos deltas.
+        """
+        if not self.root_node: return
+
+        for node in affected['removed']:
+            self._unregister_file_node(node)
+            self.content_lru.invalidate(node.full_path)
+        for node in affected['removed'] + affected['pruned_dirs']:
+            item = self.tree_items.get(node.full_path)
+            self._forget_tree_subtree(node)
+            if item is not None and item.IsOk():
+                self.tree_ctrl.Delete(item)
+
+        for node in affected['changed']:
+            self.content_lru.invalidate(node.full_path)
+            if node.is_text and node not in self.all_text_files:
+                self.all_text_files.append(node)
+            elif not node.is_text and node in self.all_text_files:
+                self.all_text_files.remove(node)
+            item = self.tree_items.get(node.full_path)
+            if item is not None:
+                self.tree_ctrl.SetItemText(item, self._tree_label(node))
+
+        # Pastas novas primeiro (na ordem pai -> filho), depois os arquivos
+        for node in affected['created_dirs'] + affected['added']:
+            if not node.is_dir:
+                self._register_file_node(node)
+            self._insert_tree_item(node)
+
+        # Só alterações de conteúdo: reescreve as linhas do arquivo e das pastas acima;
+        # arquivos/pastas novos ou removidos mudam a estrutura e pedem a árvore inteira
+        if any(affected[key] for key in ('added', 'removed', 'created_dirs', 'pruned_dirs')):
+            tree_nodes = None
+        else:
+            tree_nodes = {}
+            for node in affected['changed']:
+                while node is not None and node.full_path not in tree_nodes:
+                    tree_nodes[node.full_path] = node
+                    node = node.parent
+            tree_nodes = list(tree_nodes.values())
+        self._refresh_views(self.root_node.total_recursive_tokens, tree_nodes)
+        # Arquivos novos/removidos mudam o estado (parcial/total) das pastas acima
+        for node in affected['changed'] + affected['added']:
+            self._refresh_check_states(node)
+        for node in affected['removed'] + affected['pruned_dirs']:
+            if node.parent is not None:
+                self._refresh_check_states(node.parent)
+        self.recalculate_selected_totals()
+        self.status_text.SetLabel(
+            f"Atualizado: {len(affected['added'])} novo(s), {len(affected['changed'])} alterado(s), "
+            f"{len(affected['removed'])} removido(s). Total: {self._total_label()}.")
+
+    # --- Seleção (caixas na árvore lateral) ---
+
+    def _make_check_images(self) -> wx.ImageList:
+        """Caixas desenhadas pelo renderer nativo: desmarcada, parcial e marcada."""
+        size = 16
+        images = wx.ImageList(size, size)
+        renderer = wx.RendererNative.Get()
+        for flags in (0, wx.CONTROL_UNDETERMINED, wx.CONTROL_CHECKED):
+            bitmap = wx.Bitmap(size, size)
+            dc = wx.MemoryDC(bitmap)
+            dc.SetBackground(wx.Brush(self.tree_ctrl.GetBackgroundColour()))
+            dc.Clear()
+            renderer.DrawCheckBox(self.tree_ctrl, dc, wx.Rect(0, 0, size, size), flags)
+            dc.SelectObject(wx.NullBitmap)
+            images.Add(bitmap)
+        return images
+
+    def on_tree_left_down(self, event):
+        """Clique na caixa de seleção alterna o item; fora dela, segue o comportamento normal."""
+        item, flags = self.tree_ctrl.HitTest(event.GetPosition())
+        if item.IsOk() and flags & wx.TREE_HITTEST_ONITEMSTATEICON:
+            self.toggle_item_selection(item)
+            return
+        event.Skip()
+
+    def on_tree_key_down(self, event):
+        """Espaço alterna a seleção do item focado."""
+        if event.GetKeyCode() == wx.WXK_SPACE:
+            item = self.tree_ctrl.GetSelection()
+            if item.IsOk():
+                self.toggle_item_selection(item)
+                return
+        event.Skip()
+
+    def toggle_item_selection(self, item):
+        """
+        Marca/desmarca o nó do item: os totais sobem só pelos ancestrais (O(profundidade));
+        numa pasta, os descendentes recebem o estado ao serem exibidos.
+        """
+        path = self.tree_ctrl.GetItemData(item)
+        node = self.node_map.get(path) if path else None
+        if node is None and path == self.root_path:
+            node = self.root_node
+        if node is None:
+            return
+        node.toggle_selection()
+        self._refresh_check_states(node)
+        self.frame.start_token_counting(None)
+
+    def _refresh_check_states(self, node: TreeNode):
+        """Atualiza as caixas do nó, dos ancestrais e dos descendentes já criados na árvore lateral."""
+        ancestor = node.parent
+        while ancestor is not None:
+            item = self.tree_items.get(ancestor.full_path)
+            if item is not None:
+                self.tree_ctrl.SetItemState(item, ancestor.selection_state)
+            ancestor = ancestor.parent
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            item = self.tree_items.get(current.full_path)
+            if item is None:
+                continue
+            self.tree_ctrl.SetItemState(item, current.selection_state)
+            if current.full_path in self.populated_dirs:
+                current.push_selection()
+                stack.extend(current.children)
+
+    def recalculate_selected_totals(self):
+        """
+        Sincroniza os totais da seleção (chamado pelo frame após cada mudança).
+        Os agregados já estão em dia nos nós: ler a raiz é O(1).
+        """
+        if not self.root_node:
+            self.lbl_selected.SetLabel("Selecionados: 0 tokens")
+            return
+        root = self.root_node
+        self.lbl_selected.SetLabel(
+            f"Selecionados: {root.selected_tokens:,} de {root.total_recursive_tokens:,} tokens "
+            f"({root.selected_file_count:,}/{root.text_file_count:,} arquivos)")
+
+    def _tree_label(self, node: TreeNode) -> str:
+        """Texto do item na árvore lateral."""
+        if not node.is_dir and not node.is_text:
+            size_str = f"({(node.size_bytes / (1024 * 1024)):.2f}MB)" if node.size_bytes > 1024*1024 else f"({node.size_bytes:,}B)"
+            return f"{node.name} [IGNORADO {size_str}]"
+        return node.name
+
+    @staticmethod
+    def _tree_sort_key(node: TreeNode):
+        return (not node.is_dir, natural_sort_key(node.name))
+
+    def _insert_tree_item(self, node: TreeNode):
+        """
+        Insere o item de um nó novo na posição ordenada sob o item do pai. Se o pai
+        ainda não foi expandido, só garante o placeholder: o nó aparece ao expandir.
+        """
+        parent_item = self.tree_items.get(node.parent.full_path) if node.parent else None
+        if parent_item is None or node.full_path in self.tree_items:
+            return
+        if node.parent.full_path not in self.populated_dirs:
+            if not self.tree_ctrl.ItemHasChildren(parent_item):
+                self._add_placeholder(parent_item)
+            return
+        position = 0
+        for sibling in sorted(node.parent.children, key=self._tree_sort_key):
+            if sibling is node:
+                break
+            if sibling.full_path in self.tree_items:
+                position += 1
+        new_item = self.tree_ctrl.InsertItem(parent_item, position, self._tree_label(node))
+        self._init_tree_item(new_item, node)
+
+    def _add_placeholder(self, item):
+        # Filho provisório: faz o item mostrar o botão de expandir (sem ItemData)
+        self.tree_ctrl.AppendItem(item, "...")
+
+    def _init_tree_item(self, item, node: TreeNode):
+        self.tree_ctrl.SetItemData(item, node.full_path)
+        self.tree_ctrl.SetItemState(item, node.selection_state)
+        self.tree_items[node.full_path] = item
+        if node.is_dir and node.children:
+            self._add_placeholder(item)
+
+    def _populate_tree_item(self, item, node: TreeNode):
+        """Cria (uma vez) os itens dos filhos diretos de um diretório, ordenados."""
+        if node.full_path in self.populated_dirs:
+            return
+        self.populated_dirs.add(node.full_path)
+        self.tree_ctrl.DeleteChildren(item)
+        # Os filhos vão ser exibidos: recebem a seleção pendente da pasta
+        node.resolve_selection()
+        node.push_selection()
+        for child in sorted(node.children, key=self._tree_sort_key):
+            new_item = self.tree_ctrl.AppendItem(item, self._tree_label(child))
+            self._init_tree_item(new_item, child)
+
+    def _forget_tree_subtree(self, node: TreeNode):
+        """Esquece os itens de um nó removido e dos seus descendentes já criados."""
+        self.tree_items.pop(node.full_path, None)
+        if node.is_dir:
+            self.populated_dirs.discard(node.full_path)
+            for child in node.children:
+                self._forget_tree_subtree(child)
+
+    def on_tree_item_expanding(self, event):
+        """Popula os filhos do diretório na primeira expansão (troca o placeholder pelos itens reais)."""
+        item = event.GetItem()
+        path = self.tree_ctrl.GetItemData(item) if item.IsOk() else None
+        node = self.node_map.get(path) if path else None
+        if node is not None and node.is_dir:
+            self._populate_tree_item(item, node)
+
+    def reveal_in_tree(self, path: str, select: bool = True):
+        """Expande a árvore lateral até path (populando só os ancestrais) e, opcionalmente, seleciona o item."""
+        node = self.node_map.get(path)
+        if node is None or not self.root_node:
+            return None
+        chain = []
+        while node is not None:
+            chain.append(node)
+            node = node.parent
+        item = None
+        for node in reversed(chain):
+            item = self.tree_items.get(node.full_path)
+            if item is None:
+                return None
+            if node is not chain[0]:
+                self._populate_tree_item(item, node)
+                self.tree_ctrl.Expand(item)
+        if select:
+            # Seleção programática: não troca a aba como um clique do usuário
+            self._revealing = True
+            try:
+                self.tree_ctrl.SelectItem(item)
+            finally:
+                self._revealing = False
+        self.tree_ctrl.EnsureVisible(item)
+        return item
 
     def build_visual_tree(self):
-        """Constrói a árvore lateral baseada no root_node."""
+        """Constrói a árvore lateral baseada no root_node (só o 1º nível; o resto ao expandir)."""
         self.tree_ctrl.DeleteAllItems()
+        self.tree_items = {}
+        self.populated_dirs = set()
         if not self.root_node: return
         
         # MUDANÇA: Se o root_node for um diretório raiz virtual (quando há múltiplos inputs), 
@@ -610,31 +1155,23 @@ class ProjectPanel(wx.Panel):
         
         root_item = self.tree_ctrl.AddRoot(os.path.basename(self.root_path))
         self.tree_ctrl.SetItemData(root_item, self.root_path)
-        self._build_tree_recursive(root_item, self.root_node)
+        self.tree_ctrl.SetItemState(root_item, self.root_node.selection_state)
+        self.tree_items[self.root_path] = root_item
+        self._populate_tree_item(root_item, self.root_node)
         self.tree_ctrl.Expand(root_item)
 
-    def _build_tree_recursive(self, parent_item, node):
-        sorted_children = sorted(node.children, key=lambda n: (not n.is_dir, natural_sort_key(n.name)))
-        for child in sorted_children:
-            display_name = child.name
-            
-            if not child.is_dir and not child.is_text:
-                size_str = f"({(child.size_bytes / (1024 * 1024)):.2f}MB)" if child.size_bytes > 1024*1024 else f"({child.size_bytes:,}B)"
-                display_name = f"{child.name} [IGNORADO {size_str}]"
-            
-            new_item = self.tree_ctrl.AppendItem(parent_item, display_name)
-            self.tree_ctrl.SetItemData(new_item, child.full_path)
-            
-            if child.is_dir:
-                self._build_tree_recursive(new_item, child)
-
     def update_all_views(self):
         """Calcula a soma total e atualiza todas as abas."""
         if not self.root_node: return
         
         self.root_node.calculate_recursive_tokens() 
-        total_proj_tokens = self.root_node.total_recursive_tokens
+        self._refresh_views(self.root_node.total_recursive_tokens)
 
+    def _refresh_views(self, total_proj_tokens: int, tree_nodes: Optional[List[TreeNode]] = None):
+        """
+        Atualiza as abas a partir das listas já montadas (sem recalcular a árvore).
+        tree_nodes: só essas linhas do resumo ASCII são reescritas (None = texto inteiro).
+        """
         # 1. Resumo extensões
         ext_summary = {}
         for ext, nodes in self.extension_map.items():
@@ -643,15 +1180,23 @@ class ProjectPanel(wx.Panel):
             ext_summary[ext] = {'count': len(nodes), 'tokens': tot}
 
         # 2. Atualizar Abas
-        self.tab_tree.update_data(self.root_node)
-        self.tab_files.update_data(self.all_files, total_proj_tokens) 
+        if tree_nodes is None:
+            self.tab_tree.update_data(self.root_node)
+        else:
+            self.tab_tree.refresh_nodes(tree_nodes)
+        duplicate_groups = find_duplicate_groups(self.scan_results) if self.scan_results else []
+        self.tab_files.update_data(self.all_files, total_proj_tokens, duplicate_groups) 
         self.tab_exts.update_data(ext_summary)
 
     def clear_all_project_data(self):
         """Limpa todo o estado do projeto."""
         self.root_path = None
         self.root_node = None
+        self.scan_results = None
+        self.tree_items = {}
+        self.populated_dirs = set()
         self.file_contents.clear()
+        self.content_lru.clear()
         self.node_map.clear()
         self.all_files.clear() 
         self.all_text_files.clear()
@@ -663,5 +1208,6 @@ class ProjectPanel(wx.Panel):
         self.tab_exts.update_data({})
         self.tab_prev.preview_text.Clear()
         self.tab_prev.lbl_info.SetLabel("Selecione um arquivo para ver a prévia.")
+        self.recalculate_selected_totals()
         self.progress_bar.SetValue(0)
         self.status_text.SetLabel("Aguardando...")
\ No newline at end of file
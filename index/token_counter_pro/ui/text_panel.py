@@ -1,17 +1,20 @@
 import wx
-import threading
-from core import get_tokenization_details
+from core import CountWorker
 
 class TextPanel(wx.Panel):
     """
     UI para Contagem de Tokens em Texto Direto (Aba 2 do Notebook principal).
-    Implementa contagem automática com throttling (Timer).
+    Implementa contagem automática com throttling (Timer) e contagem incremental:
+    um único worker (core.incremental) re-tokeniza só os parágrafos editados e
+    descarta pedidos que ficaram obsoletos.
     """
     def __init__(self, parent, frame):
         super().__init__(parent)
         self.frame = frame
         self.throttling_timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self._on_timer_tick, self.throttling_timer)
+        self.count_worker = CountWorker(self._on_count_ready)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self._on_destroy)
         
         self._setup_ui()
         self.text_area.Bind(wx.EVT_TEXT, self.on_text_change)
@@ -34,8 +37,10 @@ class TextPanel(wx.Panel):
         results_sizer.Add(self.lbl_tokens_val, (0, 1), flag=wx.EXPAND | wx.LEFT, border=10)
         
         # Palavras, Caracteres, Custo
-        results_sizer.Add(wx.StaticText(results_panel, label="Palavras: 0"), (1, 0))
-        results_sizer.Add(wx.StaticText(results_panel, label="Caracteres: 0"), (2, 0))
+        self.lbl_words = wx.StaticText(results_panel, label="Palavras: 0")
+        results_sizer.Add(self.lbl_words, (1, 0))
+        self.lbl_chars = wx.StaticText(results_panel, label="Caracteres: 0")
+        results_sizer.Add(self.lbl_chars, (2, 0))
         self.lbl_cost_sim = wx.StaticText(results_panel, label="Custo Simulado: $0.00 (Estimativa)")
         results_sizer.Add(self.lbl_cost_sim, (3, 0), span=(1, 2), flag=wx.EXPAND)
         
@@ -60,19 +65,17 @@ class TextPanel(wx.Panel):
         self.throttling_timer.Start(500, oneShot=True)
 
     def _on_timer_tick(self, event):
-        """Executa a contagem real na thread principal para evitar travamento da GUI."""
+        """Entrega o texto atual ao worker de contagem (substitui qualquer pedido pendente)."""
         text = self.text_area.GetValue()
         if not text:
+            self.count_worker.submit("", self.frame.project_panel.active_encoder)
             self._update_results(0, 0, 0, 0)
             return
 
-        # Para manter a GUI responsiva, usamos threading, mas a contagem é rápida
-        threading.Thread(target=self._run_calc, args=(text,), daemon=True).start()
+        self.count_worker.submit(text, self.frame.project_panel.active_encoder)
 
-    def _run_calc(self, text):
-        res = get_tokenization_details(text)
-        
-        token_count = res['tokens']
+    def _on_count_ready(self, text: str, encoder_key: str, token_count: int):
+        """Thread do worker: só pedidos ainda atuais chegam aqui."""
         char_count = len(text)
         word_count = len(text.split())
         
@@ -82,12 +85,20 @@ class TextPanel(wx.Panel):
         wx.CallAfter(self._update_results, token_count, char_count, word_count, cost)
 
     def _update_results(self, tokens: int, chars: int, words: int, cost: float):
+        if not self:
+            return
         self.lbl_tokens_val.SetLabel(f"{tokens:,}")
-        self.lbl_tokens_val.GetParent().FindWindowByLabel("Palavras: 0").SetLabel(f"Palavras: {words:,}")
-        self.lbl_tokens_val.GetParent().FindWindowByLabel("Caracteres: 0").SetLabel(f"Caracteres: {chars:,}")
+        self.lbl_words.SetLabel(f"Palavras: {words:,}")
+        self.lbl_chars.SetLabel(f"Caracteres: {chars:,}")
         self.lbl_cost_sim.SetLabel(f"Custo Simulado: ${cost:.6f} (Estimativa)")
         self.Layout()
 
+    def _on_destroy(self, event):
+        if event.GetEventObject() is self:
+            self.count_worker.stop()
+        event.Skip()
+
     def on_clear(self, event):
         self.text_area.Clear()
+        self.count_worker.submit("", self.frame.project_panel.active_encoder)
         self._update_results(0, 0, 0, 0)
\ No newline at end of file